@@ -0,0 +1,152 @@
+"""
+Benchmarks ISync's Directory API paths against bench/fake_admin_sdk.py.
+
+Starts the stand-in server in-process, points isync_auth at it (set_directory_endpoint) and times:
+
+    client_pooled     ISyncAuthManager construction with the shared client pool
+    client_fresh      ISyncAuthManager construction after clearing the pool each time
+    list_cold         list_users with an empty listing cache (full pagination)
+    list_warm         list_users served from the listing cache
+    list_revalidate   list_users after TTL expiry (per-page If-None-Match -> 304)
+    check_batched     ISyncEngine.batch_check_suspension (batched users.get)
+    check_serial      one users.get per user (the pre-batching baseline)
+    unsuspend         ISyncEngine.batch_unsuspend_users
+    delete            ISyncAuthManager.delete_user, one call per user
+
+For each: wall time, HTTP requests and API calls seen by the server, and errors.
+
+Usage:
+    python bench/bench_auth.py [--users 100000] [--sample 500] [--latency-ms 20] [--error-rate 0.01] [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "bench"))
+
+ADMIN_EMAIL = "admin@{domain}"
+SA_JSON = "bench-sa.json" # Never read: custom endpoints use anonymous credentials
+
+def measure(sdk, name, func):
+    """Runs func once; returns its timing row (func returns the number of errors it saw)."""
+    sdk.directory.reset_counters()
+    start = time.perf_counter()
+    try:
+        errors = func() or 0
+    except Exception as e:
+        status = getattr(getattr(e, "resp", None), "status", None)
+        errors = f"{type(e).__name__} {status}" if status else f"{type(e).__name__}: {e}"[:60]
+    wall = time.perf_counter() - start
+    calls = dict(sdk.directory.calls)
+    return {"scenario": name, "wall_ms": round(wall * 1000, 1), "http_requests": sdk.directory.http_requests, "api_calls": sum(calls.values()), "errors": errors}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000, help="Directory size.")
+    parser.add_argument("--sample", type=int, default=200, help="Users per suspension check / unsuspend / delete run.")
+    parser.add_argument("--domain", default="example.com")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Server latency per HTTP request.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with an injected error.")
+    parser.add_argument("--error-codes", default="429,503")
+    parser.add_argument("--batch-size", type=int, default=1000, help="admin_batch_size for the batched paths.")
+    parser.add_argument("--clients", type=int, default=20, help="Constructions per client_* scenario.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    # isync.db, status files and logs/ are written relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="isync_bench_auth_")
+    os.chdir(workdir)
+
+    from fake_admin_sdk import FakeAdminSDK
+    from isync_auth import ISyncAuthManager, set_directory_endpoint, get_directory_service, clear_service_cache, USER_LISTING_CACHE
+    from isync_engine import ISyncEngine
+
+    sdk = FakeAdminSDK(domain=args.domain, users=args.users, latency_ms=args.latency_ms, error_rate=args.error_rate,
+                       error_codes=[int(c) for c in args.error_codes.split(",") if c], seed=args.seed).start()
+    set_directory_endpoint(sdk.url)
+    admin = ADMIN_EMAIL.format(domain=args.domain)
+    engine = ISyncEngine({
+        'domains': [{'domain_name': args.domain, 'admin_email': admin, 'sa_json_path': SA_JSON}],
+        'admin_batch_size': args.batch_size, 'user_list_cache_ttl': 3600,
+    })
+
+    emails = list(sdk.directory.emails)
+    step = max(1, len(emails) // max(args.sample, 1))
+    sample = emails[::step][:args.sample]
+    suspended = [e for e in emails if sdk.directory.users[e].get("suspended")][:args.sample]
+    to_delete = emails[-args.sample:]
+
+    def build_clients(fresh):
+        for _ in range(args.clients):
+            if fresh: clear_service_cache()
+            ISyncAuthManager(SA_JSON, admin)
+
+    def list_users():
+        ISyncAuthManager(SA_JSON, admin).list_users(args.domain)
+
+    def revalidate():
+        USER_LISTING_CACHE.ttl = 0
+        try: list_users()
+        finally: USER_LISTING_CACHE.ttl = 3600
+
+    def check_batched():
+        res = engine.batch_check_suspension(args.domain, sample)
+        return sum(1 for r in res.values() if 'error' in r) if "Global Error" not in res else res["Global Error"]
+
+    def check_serial():
+        service = get_directory_service(SA_JSON, admin)
+        errors = 0
+        for email in sample:
+            try: service.users().get(userKey=email, fields='suspended,suspensionReason').execute()
+            except Exception: errors += 1
+        return errors
+
+    def unsuspend():
+        res = engine.batch_unsuspend_users(args.domain, suspended)
+        return sum(1 for r in res.values() if not str(r).startswith("Success"))
+
+    def delete():
+        mgr = ISyncAuthManager(SA_JSON, admin)
+        errors = 0
+        for email in to_delete:
+            try: mgr.delete_user(email)
+            except Exception: errors += 1
+        return errors
+
+    results = []
+    try:
+        results.append(measure(sdk, "client_pooled", lambda: build_clients(False)))
+        results.append(measure(sdk, "client_fresh", lambda: build_clients(True)))
+        USER_LISTING_CACHE.invalidate()
+        results.append(measure(sdk, "list_cold", list_users))
+        results.append(measure(sdk, "list_warm", list_users))
+        results.append(measure(sdk, "list_revalidate", revalidate))
+        results.append(measure(sdk, "check_batched", check_batched))
+        results.append(measure(sdk, "check_serial", check_serial))
+        results.append(measure(sdk, "unsuspend", unsuspend))
+        results.append(measure(sdk, "delete", delete))
+    finally:
+        sdk.stop()
+        set_directory_endpoint(None)
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"users": args.users, "sample": args.sample, "latency_ms": args.latency_ms, "results": results}, indent=2))
+    else:
+        print(f"users={args.users} sample={args.sample} latency_ms={args.latency_ms} error_rate={args.error_rate}")
+        cols = ["scenario", "wall_ms", "http_requests", "api_calls", "errors"]
+        widths = [max(len(c), *(len(str(r[c])) for r in results)) for c in cols]
+        print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+        for r in results: print("  ".join(str(r[c]).ljust(w) for c, w in zip(cols, widths)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Benchmarks ISyncEngine.run_rclone against bench/fake_rclone.py.
+
+Puts a stand-in `rclone` on PATH, runs each scenario through the real monitor loop
+in a scratch directory, and reports:
+
+    cpu_us/line   process CPU time per rclone output line (reader thread + monitor loop + status)
+    lines/s       achieved output rate
+    writes/s      status file flushes per second (StatusWriter.flush_count)
+    detect_ms     time from the event (rclone exit, or last output + stall timeout) to run_rclone returning
+
+Usage:
+    python bench/bench_run_rclone.py [--lines 10000] [--rate 10000] [--scenarios text_done,stalled]
+                                     [--max-cpu-us-per-line 200] [--max-status-hz 3] [--json]
+
+Exits non-zero if a result is unexpected or a --max-* threshold is exceeded.
+"""
+import argparse
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_RCLONE = os.path.join(REPO_DIR, "bench", "fake_rclone.py")
+
+# name: (stats mode, fake rclone env, expected result)
+SCENARIOS = {
+    "text_done": ("text", {"FAKE_RCLONE_EXIT": "0"}, "DONE"),
+    "json_done": ("json", {"FAKE_RCLONE_EXIT": "0"}, "DONE"),
+    "text_verbose": ("text", {"FAKE_RCLONE_EXIT": "0", "FAKE_RCLONE_VERBOSE": "4"}, "DONE"),
+    "limit_exit8": ("text", {"FAKE_RCLONE_EXIT": "8"}, "LIMIT_REACHED"),
+    "error_exit7": ("text", {"FAKE_RCLONE_EXIT": "7"}, "ERROR"),
+    "stalled": ("text", {"FAKE_RCLONE_EXIT": "0", "FAKE_RCLONE_HANG": "3600"}, "STALLED"),
+}
+
+def install_fake_rclone(bin_dir):
+    """Writes an `rclone` wrapper that runs fake_rclone.py with this interpreter."""
+    if os.name == "nt":
+        path = os.path.join(bin_dir, "rclone.cmd")
+        with open(path, "w") as f: f.write(f'@echo off\r\n"{sys.executable}" "{FAKE_RCLONE}" %*\r\n')
+    else:
+        path = os.path.join(bin_dir, "rclone")
+        with open(path, "w") as f: f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_RCLONE}" "$@"\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+
+def run_scenario(name, args, workdir):
+    from isync_engine import ISyncEngine
+    from isync_status import get_run_registry
+
+    mode, env, expected = SCENARIOS[name]
+    stamp_path = os.path.join(workdir, f"{name}.stamp.json")
+    if os.path.exists(stamp_path): os.remove(stamp_path)
+    os.environ.update({
+        "FAKE_RCLONE_LINES": str(args.lines), "FAKE_RCLONE_RATE": str(args.rate),
+        "FAKE_RCLONE_VERBOSE": "0", "FAKE_RCLONE_HANG": "0", "FAKE_RCLONE_STAMP": stamp_path,
+        # Keep total bytes well under the upload limit so exit 0 means DONE
+        "FAKE_RCLONE_BYTES": "1024",
+    })
+    os.environ.update(env)
+
+    config = {
+        'upload_limit': '700G', 'rclone_stats_mode': mode, 'status_flush_hz': args.status_hz,
+        'stall_timeout_minutes': args.stall_seconds / 60, 'stall_kill_grace_seconds': 1,
+        'stall_throughput_window_minutes': 0,
+    }
+    engine = ISyncEngine(config)
+    job_label = f"bench:{name}"
+    flushes_before = get_run_registry().writer.flush_count
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = engine.run_rclone("src:", "dst:", "sa.json", "bench@example.com", job_label)
+    returned_at = time.time()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    # Each run gets its own output buffer (see isync_status.RunRegistry)
+    lines = max(get_run_registry().get_run(engine.last_run_id).output.end - 1, 1) # minus the run header line
+    try:
+        with open(stamp_path) as f: stamp = json.load(f)
+    except (OSError, ValueError):
+        stamp = {}
+    if result == "STALLED" and "last_output" in stamp:
+        detect = returned_at - (stamp["last_output"] + args.stall_seconds)
+    elif "exit" in stamp:
+        detect = returned_at - stamp["exit"]
+    else:
+        detect = None
+
+    return {
+        "scenario": name, "mode": mode, "expected": expected, "result": result,
+        "lines": lines, "wall_s": round(wall, 3),
+        "lines_per_s": round(lines / wall, 1) if wall else None,
+        "cpu_us_per_line": round(cpu / lines * 1e6, 2),
+        "status_writes_per_s": round((get_run_registry().writer.flush_count - flushes_before) / wall, 2) if wall else None,
+        "detect_ms": round(detect * 1000, 1) if detect is not None else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=10000, help="Stats lines emitted per run.")
+    parser.add_argument("--rate", type=float, default=10000, help="Lines per second (0 = unthrottled).")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--stall-seconds", type=float, default=2.0, help="Stall timeout used by the engine.")
+    parser.add_argument("--status-hz", type=float, default=2, help="status_flush_hz passed to the engine.")
+    parser.add_argument("--max-cpu-us-per-line", type=float, help="Fail if any scenario exceeds this CPU cost per line.")
+    parser.add_argument("--max-status-hz", type=float, help="Fail if status writes per second exceed this.")
+    parser.add_argument("--max-detect-ms", type=float, help="Fail if any detection latency exceeds this.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown: parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="isync_bench_")
+    bin_dir = os.path.join(workdir, "bin")
+    os.makedirs(bin_dir)
+    install_fake_rclone(bin_dir)
+    # The engine writes status files, logs/ and isync.db relative to the working directory
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+
+    results, failures = [], []
+    try:
+        for name in names:
+            r = run_scenario(name, args, workdir)
+            results.append(r)
+            if r["result"] != r["expected"]: failures.append(f"{name}: expected {r['expected']}, got {r['result']}")
+            if args.max_cpu_us_per_line is not None and r["cpu_us_per_line"] > args.max_cpu_us_per_line:
+                failures.append(f"{name}: {r['cpu_us_per_line']} us/line > {args.max_cpu_us_per_line}")
+            if args.max_status_hz is not None and (r["status_writes_per_s"] or 0) > args.max_status_hz:
+                failures.append(f"{name}: {r['status_writes_per_s']} status writes/s > {args.max_status_hz}")
+            if args.max_detect_ms is not None and r["detect_ms"] is not None and r["detect_ms"] > args.max_detect_ms:
+                failures.append(f"{name}: detection {r['detect_ms']} ms > {args.max_detect_ms}")
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"results": results, "failures": failures}, indent=2))
+    else:
+        cols = ["scenario", "mode", "result", "lines", "wall_s", "lines_per_s", "cpu_us_per_line", "status_writes_per_s", "detect_ms"]
+        widths = [max(len(c), *(len(str(r[c])) for r in results)) for c in cols]
+        print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+        for r in results: print("  ".join(str(r[c]).ljust(w) for c, w in zip(cols, widths)))
+        for f in failures: print(f"FAIL {f}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
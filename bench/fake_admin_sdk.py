@@ -0,0 +1,297 @@
+"""
+Local stand-in for the Google Admin SDK Directory API (the subset ISync uses).
+
+Routes (same paths as admin.googleapis.com, so googleapiclient works unchanged):
+
+    GET    /admin/directory/v1/users                    list (domain, maxResults <= 500, pageToken; per-page ETag / 304)
+    POST   /admin/directory/v1/users                    insert (409 if the user exists)
+    GET    /admin/directory/v1/users/{userKey}          get (404 if missing)
+    PATCH  /admin/directory/v1/users/{userKey}          patch (e.g. {"suspended": false})
+    DELETE /admin/directory/v1/users/{userKey}          delete
+    GET    /admin/directory/v1/groups                   list (connection checks)
+    POST   /admin/directory/v1/groups/{key}/members     members insert (409 if already a member)
+    POST   /batch/admin/directory_v1                    multipart/mixed batch of the calls above
+
+Latency and error injection (429 with Retry-After, 5xx, 404, 409) are configurable; injected
+errors apply per call, including each call inside a batch. user_errors pins a status (e.g. 403)
+to specific users' get/patch/delete calls, for deterministic per-item error tests.
+
+Run standalone:
+    python bench/fake_admin_sdk.py --users 100000 --port 8765 --latency-ms 20 --error-rate 0.01
+then point an in-process ISync at it with isync_auth.set_directory_endpoint("http://127.0.0.1:8765")
+(bench_auth.py starts one in-process and does this itself).
+"""
+import argparse
+import bisect
+import email.parser
+import email.policy
+import json
+import random
+import socket
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PREFIX = "/admin/directory/v1/"
+BATCH_PATH = "/batch/admin/directory_v1"
+MAX_PAGE_SIZE = 500
+
+REASONS = {400: "badRequest", 403: "forbidden", 404: "notFound", 409: "duplicate", 429: "rateLimitExceeded", 500: "backendError", 503: "backendError"}
+STATUS_TEXT = {200: "OK", 204: "No Content", 304: "Not Modified", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 409: "Conflict", 429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+def _error(status, message):
+    body = {"error": {"code": status, "message": message, "errors": [{"domain": "global", "reason": REASONS.get(status, "unknown"), "message": message}]}}
+    headers = {"Retry-After": "1"} if status == 429 else {}
+    return status, headers, body
+
+class FakeDirectory:
+    """
+    In-memory directory state shared by all request threads:
+    - Users are kept in a dict plus a sorted email list, so pages are slices (orderBy=email)
+    - A version counter bumps on every write; page ETags embed it, so unchanged pages revalidate as 304
+    """
+    def __init__(self, domain="example.com", users=1000, suspended_every=10, latency_ms=0, error_rate=0.0, error_codes=(429, 503), seed=None, user_errors=None):
+        self.domain = domain
+        self.user_errors = {k.lower(): v for k, v in (user_errors or {}).items()}
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.version = 0
+        self.users = {}
+        self.emails = []
+        self.members = {}
+        self.calls = {}
+        self.http_requests = 0
+        for i in range(users):
+            email = f"user{i:06d}@{domain}"
+            suspended = bool(suspended_every) and i % suspended_every == 0
+            self.users[email] = self._user(email, suspended=suspended, reason="ADMIN" if suspended else None)
+        self.emails = sorted(self.users)
+
+    @staticmethod
+    def _user(email, suspended=False, reason=None, body=None):
+        user = {"kind": "admin#directory#user", "id": uuid.uuid4().hex[:21], "primaryEmail": email, "suspended": suspended, "orgUnitPath": "/"}
+        if reason: user["suspensionReason"] = reason
+        if body: user.update({k: v for k, v in body.items() if k != "password"})
+        user["primaryEmail"] = email
+        return user
+
+    def reset_counters(self):
+        with self.lock:
+            self.calls = {}
+            self.http_requests = 0
+
+    def handle(self, method, path, query, headers, body):
+        """Serves one API call. Returns (status, headers, json body or None)."""
+        route = self._route(method, path)
+        with self.lock:
+            self.calls[route] = self.calls.get(route, 0) + 1
+        if self.error_rate and self.random.random() < self.error_rate:
+            code = self.random.choice(self.error_codes)
+            return _error(code, f"Injected {code}")
+        if route == "users.list": return self._list_users(query, headers)
+        if route == "users.insert": return self._insert_user(body)
+        if route in ("users.get", "users.patch", "users.delete"):
+            key = urllib.parse.unquote(path[len(API_PREFIX + "users/"):]).lower()
+            if key in self.user_errors: return _error(self.user_errors[key], f"Pinned {self.user_errors[key]} for {key}")
+            return getattr(self, "_" + route.split(".")[1] + "_user")(key, body)
+        if route == "groups.list": return 200, {}, {"kind": "admin#directory#groups", "groups": []}
+        if route == "members.insert":
+            group = urllib.parse.unquote(path[len(API_PREFIX + "groups/"):].split("/")[0]).lower()
+            return self._insert_member(group, body)
+        return _error(404, f"No route for {method} {path}")
+
+    @staticmethod
+    def _route(method, path):
+        if not path.startswith(API_PREFIX): return "unknown"
+        rest = path[len(API_PREFIX):].strip("/").split("/")
+        if rest == ["users"]: return {"GET": "users.list", "POST": "users.insert"}.get(method, "unknown")
+        if len(rest) == 2 and rest[0] == "users": return {"GET": "users.get", "PATCH": "users.patch", "PUT": "users.patch", "DELETE": "users.delete"}.get(method, "unknown")
+        if rest == ["groups"] and method == "GET": return "groups.list"
+        if len(rest) == 3 and rest[0] == "groups" and rest[2] == "members" and method == "POST": return "members.insert"
+        return "unknown"
+
+    def _list_users(self, query, headers):
+        try:
+            size = min(int(query.get("maxResults", [100])[0]), MAX_PAGE_SIZE)
+            offset = int(query.get("pageToken", ["0"])[0] or 0)
+        except ValueError:
+            return _error(400, "Invalid maxResults or pageToken")
+        with self.lock:
+            etag = f'"v{self.version}-{offset}-{size}"'
+            if headers.get("if-none-match") == etag: return 304, {"ETag": etag}, None
+            page = [dict(self.users[e]) for e in self.emails[offset:offset + size]]
+            more = offset + size < len(self.emails)
+        body = {"kind": "admin#directory#users", "etag": etag, "users": page}
+        if more: body["nextPageToken"] = str(offset + size)
+        return 200, {"ETag": etag}, body
+
+    def _get_user(self, key, body):
+        with self.lock:
+            user = self.users.get(key)
+            if user is None: return _error(404, "Resource Not Found: userKey")
+            return 200, {}, dict(user)
+
+    def _patch_user(self, key, body):
+        with self.lock:
+            user = self.users.get(key)
+            if user is None: return _error(404, "Resource Not Found: userKey")
+            patch = body or {}
+            user.update({k: v for k, v in patch.items() if k not in ("password", "primaryEmail")})
+            if patch.get("suspended") is False: user.pop("suspensionReason", None)
+            self.version += 1
+            return 200, {}, dict(user)
+
+    def _delete_user(self, key, body):
+        with self.lock:
+            if self.users.pop(key, None) is None: return _error(404, "Resource Not Found: userKey")
+            i = bisect.bisect_left(self.emails, key)
+            if i < len(self.emails) and self.emails[i] == key: del self.emails[i]
+            self.version += 1
+            return 204, {}, None
+
+    def _insert_user(self, body):
+        email = ((body or {}).get("primaryEmail") or "").lower()
+        if not email: return _error(400, "Invalid Input: primaryEmail")
+        with self.lock:
+            if email in self.users: return _error(409, "Entity already exists.")
+            self.users[email] = self._user(email, body=body)
+            bisect.insort(self.emails, email)
+            self.version += 1
+            return 200, {}, dict(self.users[email])
+
+    def _insert_member(self, group, body):
+        email = ((body or {}).get("email") or "").lower()
+        with self.lock:
+            members = self.members.setdefault(group, set())
+            if email in members: return _error(409, "Member already exists.")
+            members.add(email)
+            return 200, {}, {"kind": "admin#directory#member", "email": email, "role": (body or {}).get("role", "MEMBER"), "type": "USER"}
+
+    def handle_batch(self, content_type, raw):
+        """Serves a multipart/mixed batch. Returns (content type, body bytes)."""
+        message = email.parser.BytesParser(policy=email.policy.compat32).parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + raw)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        out = []
+        for part in message.get_payload():
+            content_id = part.get("Content-ID", "")
+            method, path, query, headers, body = _parse_http_part(part.get_payload())
+            status, resp_headers, resp_body = self.handle(method, path, query, headers, body)
+            payload = json.dumps(resp_body) if resp_body is not None else ""
+            header_lines = "".join(f"{k}: {v}\r\n" for k, v in resp_headers.items())
+            out.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id.strip('<>')}>\r\n\r\n"
+                f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: application/json; charset=UTF-8\r\n{header_lines}Content-Length: {len(payload)}\r\n\r\n{payload}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(out).encode("utf-8")
+
+def _parse_http_part(text):
+    """Splits an application/http part into (method, path, query, lowercase headers, json body)."""
+    head, _, body = text.replace("\r\n", "\n").partition("\n\n")
+    lines = head.split("\n")
+    method, target = lines[0].split(" ")[:2]
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    parsed = urllib.parse.urlparse(target)
+    try: body = json.loads(body) if body.strip() else None
+    except ValueError: body = None
+    return method, parsed.path, urllib.parse.parse_qs(parsed.query), headers, body
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    directory = None
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, delayed ACKs add ~40ms per call
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _serve(self, method):
+        directory = self.directory
+        with directory.lock:
+            directory.http_requests += 1
+        if directory.latency: time.sleep(directory.latency)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path == BATCH_PATH and method == "POST":
+            content_type, payload = directory.handle_batch(self.headers.get("Content-Type", ""), raw)
+            self._respond(200, {"Content-Type": content_type}, payload)
+            return
+        try: body = json.loads(raw) if raw.strip() else None
+        except ValueError: body = None
+        headers = {k.lower(): v for k, v in self.headers.items()}
+        status, resp_headers, resp_body = directory.handle(method, parsed.path, urllib.parse.parse_qs(parsed.query), headers, body)
+        payload = json.dumps(resp_body).encode("utf-8") if resp_body is not None else b""
+        self._respond(status, dict(resp_headers, **({"Content-Type": "application/json; charset=UTF-8"} if payload else {})), payload)
+
+    def _respond(self, status, headers, payload):
+        self.send_response(status)
+        for k, v in headers.items(): self.send_header(k, v)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload: self.wfile.write(payload)
+
+    def do_GET(self): self._serve("GET")
+    def do_POST(self): self._serve("POST")
+    def do_PATCH(self): self._serve("PATCH")
+    def do_PUT(self): self._serve("PUT")
+    def do_DELETE(self): self._serve("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeAdminSDK:
+    """Runs a FakeDirectory behind a threaded HTTP server (port 0 picks a free port)."""
+    def __init__(self, host="127.0.0.1", port=0, **directory_kwargs):
+        self.directory = FakeDirectory(**directory_kwargs)
+        handler = type("Handler", (_Handler,), {"directory": self.directory})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-admin-sdk", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--domain", default="example.com")
+    parser.add_argument("--users", type=int, default=1000, help="Directory size (up to 100k+).")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added latency per HTTP request.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with an injected error.")
+    parser.add_argument("--error-codes", default="429,503", help="Comma-separated injected status codes (e.g. 429,500,503,404,409).")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    sdk = FakeAdminSDK(args.host, args.port, domain=args.domain, users=args.users, latency_ms=args.latency_ms,
+                       error_rate=args.error_rate, error_codes=[int(c) for c in args.error_codes.split(",") if c], seed=args.seed)
+    print(f"Fake Admin SDK serving {args.users} users of {args.domain} at {sdk.url} (Ctrl+C to stop)")
+    try:
+        sdk.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sdk.server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Stand-in rclone for benchmarking the run_rclone monitor loop.
+
+Accepts (and ignores) any rclone arguments. Emits text stats, or JSON stats when
+--use-json-log is passed, plus optional verbose chatter, at a fixed rate, then exits.
+With --rc it also serves core/stats on --rc-addr, requiring RCLONE_RC_USER/RCLONE_RC_PASS
+as basic auth when they are set (as rclone does).
+Behaviour is controlled by environment variables:
+
+    FAKE_RCLONE_LINES     total stats lines to emit (default 10000)
+    FAKE_RCLONE_RATE      lines per second, 0 = as fast as possible (default 10000)
+    FAKE_RCLONE_VERBOSE   verbose INFO lines emitted per stats line (default 0)
+    FAKE_RCLONE_BYTES     bytes transferred per stats line (default 1 MiB)
+    FAKE_RCLONE_EXIT      exit code (default 0; 8 = upload limit, 7 = fatal error)
+    FAKE_RCLONE_HANG      seconds to stay silent before exiting (simulates a stall)
+    FAKE_RCLONE_REPLAY    file whose lines are replayed verbatim instead of synthesized
+    FAKE_RCLONE_STAMP     JSON file receiving {"last_output": t, "exit": t} (time.time())
+"""
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def env_num(name, default, cast=int):
+    try: return cast(os.environ.get(name, default))
+    except ValueError: return default
+
+def write_stamp(path, **stamp):
+    if not path: return
+    try:
+        with open(path) as f: data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data.update(stamp)
+    with open(path, "w") as f: json.dump(data, f)
+
+def text_stats(i, n, done, total):
+    pct = int(done * 100 / total) if total else 0
+    return (
+        f"Transferred:   \t{done / 1048576:.3f} MiB / {total / 1048576:.3f} MiB, {pct}%, 10.000 MiB/s, ETA {n - i}s\n"
+        f"Transferred:          {i} / {n}, {pct}%\n"
+    )
+
+def json_stats(i, n, done, total):
+    stats = {
+        "bytes": done, "totalBytes": total, "speed": 10485760.0, "eta": n - i, "transfers": i, "errors": 0,
+        "transferring": [{"name": f"dir/file_{i}.bin", "bytes": 524288, "size": 1048576, "percentage": 50, "speed": 10485760.0, "eta": 1}],
+    }
+    return json.dumps({"level": "info", "msg": "stats", "source": "accounting/stats.go:0", "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "stats": stats}) + "\n"
+
+def serve_rc(addr, stats):
+    """Minimal rc server: POST core/stats returns the live stats dict."""
+    user, password = os.environ.get("RCLONE_RC_USER"), os.environ.get("RCLONE_RC_PASS")
+    expected = "Basic " + base64.b64encode(f"{user}:{password}".encode()).decode() if user else None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if expected and self.headers.get("Authorization") != expected: status, body = 401, {"error": "authentication required"}
+            elif self.path.strip("/") == "core/stats": status, body = 200, dict(stats)
+            else: status, body = 404, {"error": "couldn't find method"}
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    host, _, port = addr.rpartition(":")
+    server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+def main():
+    n = env_num("FAKE_RCLONE_LINES", 10000)
+    rate = env_num("FAKE_RCLONE_RATE", 10000, float)
+    verbose = env_num("FAKE_RCLONE_VERBOSE", 0)
+    per_line = env_num("FAKE_RCLONE_BYTES", 1048576)
+    exit_code = env_num("FAKE_RCLONE_EXIT", 0)
+    hang = env_num("FAKE_RCLONE_HANG", 0, float)
+    stamp = os.environ.get("FAKE_RCLONE_STAMP")
+    use_json = "--use-json-log" in sys.argv
+    out = sys.stdout
+    rc_stats = None
+    if "--rc" in sys.argv:
+        rc_addr = next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--rc-addr=")), "127.0.0.1:5572")
+        rc_stats = {"bytes": 0, "totalBytes": n * per_line, "speed": 10485760.0, "transfers": 0, "checks": 0, "errors": 0, "eta": None, "transferring": []}
+        serve_rc(rc_addr, rc_stats)
+
+    replay = os.environ.get("FAKE_RCLONE_REPLAY")
+    if replay:
+        with open(replay) as f: lines = f.readlines()
+        chunks = (line for line in lines)
+        n = len(lines)
+    else:
+        total = n * per_line
+        fmt = json_stats if use_json else text_stats
+        chunks = (
+            "".join(f"INFO  : dir/file_{i}_{v}.bin: Copied (new)\n" for v in range(verbose)) + fmt(i, n, i * per_line, total)
+            for i in range(1, n + 1)
+        )
+
+    start = time.perf_counter()
+    for i, chunk in enumerate(chunks, 1):
+        out.write(chunk)
+        out.flush()
+        if rc_stats is not None: rc_stats.update(bytes=i * per_line, transfers=i)
+        if rate:
+            # Pace against the start time so write cost doesn't skew the rate
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+    write_stamp(stamp, last_output=time.time())
+
+    if hang: time.sleep(hang)
+    write_stamp(stamp, exit=time.time())
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 import logging
 import random
-import csv
 import os
 import string
+import threading
 import time
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, BatchHttpRequest
 from isync_config import DEFAULT_SA_JSON_PATH
+from isync_db import upsert_user, set_user_status
+from isync_metrics import observe_admin_call, timed
 try:
     from faker import Faker
     fake = Faker()
@@ -23,7 +27,160 @@ FB_JB = ["Analyst", "Engineer", "Consultant", "Coordinator", "Specialist", "Dire
 FB_DP = ["Operations", "Engineering", "Sales", "Marketing", "Support", "Legal", "Finance"]
 FB_CO = ["Global Solutions", "Integrated Systems", "Apex Dynamics", "Summit Technologies", "Vanguard Corp", "Matrix Innovations", "Synergy Partners", "Pinnacle Group", "Omega Corp", "Delta Logistics"]
 
-USER_DB_FILE = "user_db.csv"
+DIRECTORY_SCOPES = [
+    'https://www.googleapis.com/auth/admin.directory.user',
+    'https://www.googleapis.com/auth/admin.directory.group',
+    'https://www.googleapis.com/auth/admin.directory.group.member',
+]
+
+# Process-wide client pool. Credentials are shared so token refresh happens once per key;
+# service objects are per-thread because the underlying httplib2 connection is not thread-safe.
+_credentials_cache = {}
+_credentials_lock = threading.Lock()
+_thread_local = threading.local()
+
+# Directory API endpoint override, set only in-process by bench/ and tests (see set_directory_endpoint); empty means Google
+_api_endpoint = ''
+
+def set_directory_endpoint(url=None):
+    """
+    Points newly pooled Directory clients at another endpoint (None/'' restores Google).
+    Requests to a custom endpoint are sent without Google credentials, so no key file is needed.
+    """
+    global _api_endpoint
+    _api_endpoint = (url or '').rstrip('/')
+    if _api_endpoint: logging.warning(f"[ISyncAuth] Directory API endpoint overridden to {_api_endpoint}; requests are sent without Google credentials.")
+
+def _client_key(sa_json_path, admin_email, scopes):
+    # mtime in the key so a replaced key file is picked up without a restart
+    try: mtime = os.path.getmtime(sa_json_path)
+    except OSError: mtime = None
+    return (os.path.abspath(sa_json_path), admin_email, tuple(sorted(scopes)), mtime, _api_endpoint)
+
+class _TimedHttpRequest(HttpRequest):
+    """HttpRequest that records call count, outcome and latency per API method (see isync_metrics)."""
+    def execute(self, http=None, num_retries=0):
+        start = time.monotonic()
+        outcome = "ok"
+        try:
+            return super().execute(http=http, num_retries=num_retries)
+        except HttpError as e:
+            outcome = str(e.resp.status)
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            observe_admin_call(self.methodId or "unknown", outcome, time.monotonic() - start)
+
+def get_directory_service(sa_json_path, admin_email, scopes=None):
+    """Returns a pooled Directory API client keyed by (sa_json_path, admin_email, scopes)."""
+    sa_json_path = sa_json_path if sa_json_path else DEFAULT_SA_JSON_PATH
+    scopes = scopes or DIRECTORY_SCOPES
+    key = _client_key(sa_json_path, admin_email, scopes)
+
+    services = getattr(_thread_local, 'services', None)
+    if services is None: services = _thread_local.services = {}
+    if key in services: return services[key]
+
+    client_options = None
+    if _api_endpoint:
+        creds = AnonymousCredentials()
+        client_options = {'api_endpoint': _api_endpoint + '/'}
+    else:
+        with _credentials_lock:
+            creds = _credentials_cache.get(key)
+            if creds is None:
+                base_creds = service_account.Credentials.from_service_account_file(sa_json_path, scopes=list(scopes))
+                # Delegate authority to the admin user
+                creds = _credentials_cache[key] = base_creds.with_subject(admin_email)
+    # Bundled discovery document: no network fetch or re-download per client
+    service = build('admin', 'directory_v1', credentials=creds, static_discovery=True, cache_discovery=False, requestBuilder=_TimedHttpRequest, client_options=client_options)
+    services[key] = service
+    return service
+
+# Only the columns ISync reads; keeps list pages small
+LIST_USERS_FIELDS = 'etag,nextPageToken,users(primaryEmail,suspended,suspensionReason)'
+
+# Directory API accepts at most 1000 calls per batch request
+BATCH_LIMIT = 1000
+BATCH_PATH = 'batch/admin/directory_v1'
+
+def new_batch_request(service, callback):
+    """Batch request for the service's endpoint (the discovery batch URI ignores endpoint overrides)."""
+    if _api_endpoint: return BatchHttpRequest(callback=callback, batch_uri=f"{_api_endpoint}/{BATCH_PATH}")
+    return service.new_batch_http_request(callback=callback)
+
+def batch_get_users(service, user_keys, fields=None, batch_size=BATCH_LIMIT):
+    """
+    Fetches many users with batched users().get calls (one HTTP round trip per chunk).
+    Returns {user_key: user_dict or Exception}, mirroring one-by-one calls.
+    """
+    batch_size = max(1, min(int(batch_size), BATCH_LIMIT))
+    results = {}
+    for start in range(0, len(user_keys), batch_size):
+        chunk = user_keys[start:start + batch_size]
+
+        def on_response(request_id, response, exception):
+            results[chunk[int(request_id)]] = exception if exception is not None else response
+
+        batch = new_batch_request(service, on_response)
+        for i, key in enumerate(chunk):
+            batch.add(service.users().get(userKey=key, fields=fields), request_id=str(i))
+        start = time.monotonic()
+        outcome = "ok"
+        try:
+            batch.execute()
+        except Exception as e:
+            outcome = "error"
+            # Whole-batch failure (network/auth): attribute it to every user in the chunk
+            for key in chunk:
+                results.setdefault(key, e)
+        finally:
+            observe_admin_call("batch", outcome, time.monotonic() - start)
+    return results
+
+class UserListingCache:
+    """
+    Per-domain cache of full directory listings, shared by the UI and engine threads:
+    - Served as-is while younger than ttl seconds
+    - Kept (but marked stale) on invalidation so pages can be revalidated by ETag
+    """
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, domain_name, page_size):
+        """Returns (users or None if stale, cached pages for revalidation)."""
+        with self.lock:
+            entry = self.entries.get(domain_name.lower())
+            if not entry or entry['page_size'] != page_size: return None, []
+            fresh = time.time() - entry['fetched_at'] < self.ttl
+            users = [u for p in entry['pages'] for u in p['users']] if fresh else None
+            return users, entry['pages']
+
+    def store(self, domain_name, page_size, pages):
+        with self.lock:
+            self.entries[domain_name.lower()] = {'page_size': page_size, 'pages': pages, 'fetched_at': time.time()}
+
+    def invalidate(self, domain_name=None):
+        """Marks one domain (or all) stale after a create/delete/patch."""
+        with self.lock:
+            targets = [domain_name.lower()] if domain_name else list(self.entries)
+            for d in targets:
+                if d in self.entries: self.entries[d]['fetched_at'] = 0
+
+USER_LISTING_CACHE = UserListingCache()
+
+def _email_domain(email):
+    return email.split('@')[-1].strip().lower()
+
+def clear_service_cache():
+    """Drops pooled credentials and this thread's clients (e.g. after changing DWD scopes)."""
+    with _credentials_lock:
+        _credentials_cache.clear()
+    _thread_local.services = {}
 
 class ISyncAuthManager:
     """
@@ -38,88 +195,60 @@ class ISyncAuthManager:
         self.admin_email = admin_email
         self.company_name = company_name
         self.protected_users = [u.lower().strip() for u in (protected_users or [])]
-        self.scopes = [
-            'https://www.googleapis.com/auth/admin.directory.user',
-            'https://www.googleapis.com/auth/admin.directory.group',
-            'https://www.googleapis.com/auth/admin.directory.group.member',
-        ]
+        self.scopes = DIRECTORY_SCOPES
         self.service = self._get_service()
 
     def _get_service(self):
-        """Authenticates and returns the Directory API service."""
+        """Authenticates and returns the Directory API service (from the shared client pool)."""
         try:
-            creds = service_account.Credentials.from_service_account_file(
-                self.sa_json_path, scopes=self.scopes
-            )
-            # Delegate authority to the admin user
-            delegated_creds = creds.with_subject(self.admin_email)
-            return build('admin', 'directory_v1', credentials=delegated_creds)
+            return get_directory_service(self.sa_json_path, self.admin_email, self.scopes)
         except Exception as e:
             logging.error(f"[ISyncAuth] Auth Error for {self.admin_email}: {e}")
             raise
 
     def _log_user_creation(self, user_data, password):
-        """Logs new user details to a CSV file."""
-        file_exists = os.path.isfile(USER_DB_FILE)
+        """Records new user details in the isync.db users table."""
         try:
-            with open(USER_DB_FILE, mode='a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                if not file_exists:
-                    writer.writerow(["Timestamp", "Email", "Password", "Google_ID", "ETag", "Is_Admin", "Org_Unit", "Recovery_Email", "Status", "Suspended", "First_Name", "Last_Name", "Recovery_Phone", "Address", "Job_Title", "Department", "External_ID", "Notes"])
-                
-                # Extract complex fields safely
-                name = user_data.get('name', {})
-                orgs = user_data.get('organizations', [{}])[0] if user_data.get('organizations') else {}
-                addrs = user_data.get('addresses', [{}])[0] if user_data.get('addresses') else {}
-                addr_str = f"{addrs.get('streetAddress', '')}, {addrs.get('locality', '')} {addrs.get('postalCode', '')}"
-                ext_ids = user_data.get('externalIds', [{}])[0].get('value', '') if user_data.get('externalIds') else ''
-                notes = user_data.get('notes', {}).get('value', '')
-
-                writer.writerow([
-                    time.strftime("%Y-%m-%d %H:%M:%S"),
-                    user_data.get('primaryEmail'),
-                    password,
-                    user_data.get('id'),
-                    user_data.get('etag'),
-                    user_data.get('isAdmin'),
-                    user_data.get('orgUnitPath'),
-                    user_data.get('recoveryEmail'),
-                    "Current",
-                    "False",
-                    name.get('givenName', ''),
-                    name.get('familyName', ''),
-                    user_data.get('recoveryPhone', ''),
-                    addr_str.strip(', '),
-                    orgs.get('title', ''),
-                    orgs.get('department', ''),
-                    ext_ids,
-                    notes
-                ])
+            # Extract complex fields safely
+            name = user_data.get('name', {})
+            orgs = user_data.get('organizations', [{}])[0] if user_data.get('organizations') else {}
+            addrs = user_data.get('addresses', [{}])[0] if user_data.get('addresses') else {}
+            addr_str = f"{addrs.get('streetAddress', '')}, {addrs.get('locality', '')} {addrs.get('postalCode', '')}"
+            ext_ids = user_data.get('externalIds', [{}])[0].get('value', '') if user_data.get('externalIds') else ''
+            notes = user_data.get('notes', {}).get('value', '')
+
+            upsert_user({
+                'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'email': user_data.get('primaryEmail'),
+                'password': password,
+                'google_id': user_data.get('id'),
+                'etag': user_data.get('etag'),
+                'is_admin': user_data.get('isAdmin'),
+                'org_unit': user_data.get('orgUnitPath'),
+                'recovery_email': user_data.get('recoveryEmail'),
+                'status': "Current",
+                'suspended': "False",
+                'first_name': name.get('givenName', ''),
+                'last_name': name.get('familyName', ''),
+                'recovery_phone': user_data.get('recoveryPhone', ''),
+                'address': addr_str.strip(', '),
+                'job_title': orgs.get('title', ''),
+                'department': orgs.get('department', ''),
+                'external_id': ext_ids,
+                'notes': notes
+            })
         except Exception as e:
             logging.error(f"[ISyncAuth] Failed to log user creation: {e}")
 
     def _update_user_status_log(self, email, status=None):
-        """Updates the status of a user in the CSV log."""
-        if not os.path.isfile(USER_DB_FILE): return
-        
-        rows = []
+        """Updates the status of a user record (single indexed UPDATE)."""
+        if not status: return
         try:
-            with open(USER_DB_FILE, mode='r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                rows = list(reader)
-            
-            for row in rows:
-                if row['Email'] == email and status:
-                    row['Status'] = status
-            
-            with open(USER_DB_FILE, mode='w', newline='', encoding='utf-8') as f:
-                if rows:
-                    writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-                    writer.writeheader()
-                    writer.writerows(rows)
+            set_user_status(email, status)
         except Exception as e:
             logging.error(f"[ISyncAuth] Failed to update user log: {e}")
 
+    @timed("auth.test_api_connection")
     def test_api_connection(self):
         """Simple API call to verify credentials work."""
         try:
@@ -190,6 +319,7 @@ class ISyncAuthManager:
         }
         return body
 
+    @timed("auth.create_user")
     def create_user(self, domain_name, user_body=None):
         """Creates a temporary user. Uses provided body or generates a new one."""
         if user_body is None:
@@ -201,6 +331,7 @@ class ISyncAuthManager:
         try:
             logging.info(f"[ISyncAuth] Creating User: {email}")
             user_res = self.service.users().insert(body=user_body).execute()
+            USER_LISTING_CACHE.invalidate(_email_domain(email))
             self._log_user_creation(user_res, password)
             time.sleep(5) # Allow propagation
             return email
@@ -208,6 +339,7 @@ class ISyncAuthManager:
             logging.error(f"[ISyncAuth] Failed to create user {email}: {e}")
             raise
 
+    @timed("auth.add_to_group")
     def add_to_group(self, user_email, group_email):
         """Adds the new user to the permission group."""
         body = {"email": user_email, "role": "MEMBER"}
@@ -221,6 +353,7 @@ class ISyncAuthManager:
                 logging.error(f"[ISyncAuth] Failed to add to group: {e}")
                 raise
 
+    @timed("auth.delete_user")
     def delete_user(self, user_email):
         """Deletes the temporary user."""
         if user_email.lower().strip() in self.protected_users:
@@ -230,19 +363,22 @@ class ISyncAuthManager:
         try:
             logging.info(f"[ISyncAuth] Deleting User: {user_email}")
             self.service.users().delete(userKey=user_email).execute()
+            USER_LISTING_CACHE.invalidate(_email_domain(user_email))
             self._update_user_status_log(user_email, status="Deleted")
         except HttpError as e:
             if e.resp.status == 404:
-                pass # Already deleted
+                USER_LISTING_CACHE.invalidate(_email_domain(user_email)) # Already deleted
             else:
                 logging.error(f"[ISyncAuth] Failed to delete user {user_email}: {e}")
 
+    @timed("auth.provision_uploader")
     def provision_uploader(self, domain_name, group_email, user_body=None):
         """Wrapper to create user and add to group in one go."""
         email = self.create_user(domain_name, user_body=user_body)
         self.add_to_group(email, group_email)
         return email
 
+    @timed("auth.user_exists")
     def user_exists(self, user_email):
         """Checks if a user exists in the directory."""
         try:
@@ -253,14 +389,76 @@ class ISyncAuthManager:
                 return False
             raise
 
-    def list_users(self, domain_name, max_results=500, return_detailed=False):
-        """Lists users in the domain."""
-        try:
-            results = self.service.users().list(domain=domain_name, maxResults=max_results, orderBy='email').execute()
-            users = results.get('users', [])
-            if return_detailed:
-                return [{'email': u['primaryEmail'], 'suspended': u.get('suspended', False), 'suspensionReason': u.get('suspensionReason', '')} for u in users]
-            return [u['primaryEmail'] for u in users]
-        except HttpError as e:
-            logging.error(f"[ISyncAuth] Failed to list users: {e}")
-            raise
\ No newline at end of file
+    def iter_users(self, domain_name, max_users=None, page_size=500, fields=LIST_USERS_FIELDS):
+        """
+        Yields user resources page by page, following nextPageToken.
+        Stops fetching as soon as max_users rows have been yielded (max_users <= 0 fetches nothing).
+        """
+        # maxResults must be >= 1; a zero/negative budget would otherwise send an invalid request
+        if max_users is not None and max_users <= 0: return
+        page_token = None
+        yielded = 0
+        while True:
+            req_size = page_size if max_users is None else min(page_size, max_users - yielded)
+            try:
+                results = self.service.users().list(domain=domain_name, maxResults=req_size, orderBy='email', pageToken=page_token, fields=fields).execute()
+            except HttpError as e:
+                logging.error(f"[ISyncAuth] Failed to list users: {e}")
+                raise
+            for u in results.get('users', []):
+                yield u
+                yielded += 1
+                if max_users is not None and yielded >= max_users: return
+            page_token = results.get('nextPageToken')
+            if not page_token: return
+
+    def _list_users_cached(self, domain_name, page_size, max_users=None):
+        """
+        Returns user resources from USER_LISTING_CACHE when fresh; otherwise refetches page by page,
+        sending If-None-Match with each cached page's ETag so unchanged pages come back as 304.
+        """
+        if max_users is not None and max_users <= 0: return []
+        cached_users, cached_pages = USER_LISTING_CACHE.get(domain_name, page_size)
+        if cached_users is not None:
+            return cached_users[:max_users] if max_users is not None else cached_users
+
+        pages = []
+        page_token = None
+        rows = 0
+        complete = False
+        while True:
+            idx = len(pages)
+            old = cached_pages[idx] if idx < len(cached_pages) and cached_pages[idx]['token'] == page_token else None
+            req = self.service.users().list(domain=domain_name, maxResults=page_size, orderBy='email', pageToken=page_token, fields=LIST_USERS_FIELDS)
+            if old and old.get('etag'): req.headers['If-None-Match'] = old['etag']
+            try:
+                res = req.execute()
+                page = {'token': page_token, 'etag': res.get('etag'), 'users': res.get('users', []), 'next': res.get('nextPageToken')}
+            except HttpError as e:
+                if e.resp.status == 304 and old: page = old
+                else:
+                    logging.error(f"[ISyncAuth] Failed to list users: {e}")
+                    raise
+            pages.append(page)
+            rows += len(page['users'])
+            page_token = page['next']
+            if not page_token:
+                complete = True
+                break
+            if max_users is not None and rows >= max_users: break
+
+        # Only complete listings are cached; an early-stopped fetch can't answer a later full request
+        if complete: USER_LISTING_CACHE.store(domain_name, page_size, pages)
+        users = [u for p in pages for u in p['users']]
+        return users[:max_users] if max_users is not None else users
+
+    @timed("auth.list_users")
+    def list_users(self, domain_name, max_results=500, return_detailed=False, max_users=None, use_cache=True):
+        """Lists users in the domain (all pages, or the first max_users)."""
+        if use_cache:
+            users = self._list_users_cached(domain_name, max_results, max_users=max_users)
+        else:
+            users = self.iter_users(domain_name, max_users=max_users, page_size=max_results)
+        if return_detailed:
+            return [{'email': u['primaryEmail'], 'suspended': u.get('suspended', False), 'suspensionReason': u.get('suspensionReason', '')} for u in users]
+        return [u['primaryEmail'] for u in users]
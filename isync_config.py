@@ -12,6 +12,7 @@ KEYS_DIR = "keys"
 LOGS_DIR = "logs"
 DEFAULT_SA_JSON_PATH = os.path.join(KEYS_DIR, "master.json")
 LOG_FILE_PATH = os.path.join(LOGS_DIR, "isync.log")
+DB_FILE = "isync.db"
 
 def get_hardcoded_defaults():
     return {
@@ -27,8 +28,15 @@ def get_hardcoded_defaults():
         'rclone_chunk_size': '128M',
         'rclone_stats_interval': '1s',
         'rclone_verbose': True,
+        'rclone_stats_mode': 'text',
+        'rclone_rc_poll_interval': 1,
+        'rclone_echo_stdout': False,
         'stall_timeout_minutes': 10,
+        'stall_kill_grace_seconds': 15,
+        'stall_min_throughput_mbps': 0.1,
+        'stall_throughput_window_minutes': 10,
         'webhook_url': '',
+        'webhook_timeout': 10,
         'global_rclone_flags': '',
         'ssh_enabled': False,
         'ssh_mode': 'explicit',
@@ -40,7 +48,13 @@ def get_hardcoded_defaults():
         'ssh_connect_timeout': 10,
         'protected_users': [],
         'include_protected_users': False,
+        'admin_batch_size': 1000,
+        'user_list_cache_ttl': 60,
         'step_check': False,
+        'status_flush_hz': 2,
+        'metrics_port': 0,
+        'metrics_bind': '127.0.0.1',
+        'profile_jobs': '',
         'domains': []
     }
 
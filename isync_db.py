@@ -0,0 +1,391 @@
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from isync_config import DB_FILE
+
+USER_DB_CSV = "user_db.csv"
+
+# (CSV header, column) pairs; the CSV layout is the legacy user_db.csv format
+USER_COLUMNS = [
+    ("Timestamp", "timestamp"), ("Email", "email"), ("Password", "password"), ("Google_ID", "google_id"),
+    ("ETag", "etag"), ("Is_Admin", "is_admin"), ("Org_Unit", "org_unit"), ("Recovery_Email", "recovery_email"),
+    ("Status", "status"), ("Suspended", "suspended"), ("First_Name", "first_name"), ("Last_Name", "last_name"),
+    ("Recovery_Phone", "recovery_phone"), ("Address", "address"), ("Job_Title", "job_title"),
+    ("Department", "department"), ("External_ID", "external_id"), ("Notes", "notes"),
+]
+USER_CSV_HEADERS = [h for h, _ in USER_COLUMNS]
+
+SCHEMA = [
+    # Created by earlier releases; kept compatible
+    """CREATE TABLE IF NOT EXISTS configs ("key" VARCHAR NOT NULL PRIMARY KEY, value VARCHAR)""",
+    """CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER NOT NULL PRIMARY KEY, source VARCHAR, dest VARCHAR, domain_reference VARCHAR,
+        status VARCHAR, created_at DATETIME, last_updated DATETIME
+    )""",
+    """CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER NOT NULL PRIMARY KEY, job_id INTEGER, level VARCHAR, message VARCHAR, timestamp DATETIME
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS users (
+        email TEXT NOT NULL PRIMARY KEY COLLATE NOCASE,
+        {", ".join(f"{c} TEXT" for _, c in USER_COLUMNS if c != "email")},
+        updated_at REAL
+    )""",
+    # Transfer ledger: one row per rclone run, checkpointed while it runs (exact integer bytes)
+    """CREATE TABLE IF NOT EXISTS transfers (
+        id INTEGER NOT NULL PRIMARY KEY, job_id INTEGER, cycle INTEGER, user VARCHAR,
+        bytes INTEGER NOT NULL DEFAULT 0, files INTEGER NOT NULL DEFAULT 0,
+        result VARCHAR, exit_code INTEGER, started_at DATETIME, updated_at DATETIME, finished_at DATETIME
+    )""",
+    # Persistent job queue (see isync_queue)
+    """CREATE TABLE IF NOT EXISTS queue (
+        id INTEGER NOT NULL PRIMARY KEY, source VARCHAR NOT NULL, dest VARCHAR NOT NULL, domain_reference VARCHAR,
+        dry_run INTEGER NOT NULL DEFAULT 0, ssh_enabled INTEGER NOT NULL DEFAULT 0, priority INTEGER NOT NULL DEFAULT 0,
+        status VARCHAR NOT NULL, job_id INTEGER, max_users INTEGER, error VARCHAR,
+        created_at DATETIME, started_at DATETIME, finished_at DATETIME
+    )""",
+    # Throughput time series (see isync_timeseries): tier is the bucket width in seconds
+    """CREATE TABLE IF NOT EXISTS samples (
+        job_id INTEGER NOT NULL, tier INTEGER NOT NULL, ts INTEGER NOT NULL,
+        bytes INTEGER, speed REAL, transfers INTEGER,
+        PRIMARY KEY (job_id, tier, ts)
+    ) WITHOUT ROWID""",
+]
+
+# Columns added to tables created by earlier releases
+MIGRATIONS = [
+    ("logs", "event", "VARCHAR"),
+    ("logs", "data", "VARCHAR"),
+    # Job checkpoints (see checkpoint_job)
+    ("jobs", "cycle", "INTEGER"),
+    ("jobs", "step", "VARCHAR"),
+    ("jobs", "state", "VARCHAR"),
+    ("jobs", "owner", "VARCHAR"),
+    ("queue", "max_users", "INTEGER"),
+]
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_logs_job_id ON logs (job_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_logs_event ON logs (event)",
+    "CREATE INDEX IF NOT EXISTS ix_samples_tier_ts ON samples (tier, ts)",
+    "CREATE INDEX IF NOT EXISTS ix_transfers_job_id ON transfers (job_id, cycle)",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status)",
+    "CREATE INDEX IF NOT EXISTS ix_queue_next ON queue (status, priority DESC, id)",
+    # One active entry per source -> dest pair; INSERT OR IGNORE dedupes against it
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_queue_active_pair ON queue (source, dest) WHERE status IN ('QUEUED', 'PAUSED', 'RUNNING')",
+]
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+def get_connection(path=None):
+    """Returns this thread's connection to isync.db (WAL mode, schema ensured)."""
+    path = path or DB_FILE
+    conns = getattr(_local, 'conns', None)
+    if conns is None: conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conns[path] = conn
+    _ensure_schema(conn, path)
+    return conn
+
+def _ensure_schema(conn, path):
+    if path in _initialized: return
+    with _init_lock:
+        if path in _initialized: return
+        with conn:
+            for stmt in SCHEMA: conn.execute(stmt)
+            for table, column, col_type in MIGRATIONS:
+                existing = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+                if column not in existing: conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+            for stmt in INDEXES: conn.execute(stmt)
+        _initialized.add(path)
+    import_users_csv(conn=conn)
+
+def get_setting(key, default=None, conn=None):
+    conn = conn or get_connection()
+    row = conn.execute('SELECT value FROM configs WHERE "key" = ?', (key,)).fetchone()
+    return row['value'] if row else default
+
+def set_setting(key, value, conn=None):
+    conn = conn or get_connection()
+    with conn:
+        conn.execute('INSERT INTO configs ("key", value) VALUES (?, ?) ON CONFLICT("key") DO UPDATE SET value = excluded.value', (key, value))
+
+# --- User Records ---
+
+def upsert_user(record, conn=None):
+    """Inserts or updates a user record (dict keyed by column name; email required)."""
+    conn = conn or get_connection()
+    cols = [c for _, c in USER_COLUMNS if c in record]
+    values = [None if record[c] is None else str(record[c]) for c in cols]
+    updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c != "email")
+    with conn:
+        conn.execute(
+            f"INSERT INTO users ({', '.join(cols)}, updated_at) VALUES ({', '.join('?' * len(cols))}, ?) "
+            f"ON CONFLICT(email) DO UPDATE SET {updates}, updated_at = excluded.updated_at",
+            values + [time.time()]
+        )
+
+def set_user_status(email, status, conn=None):
+    """Updates the Status of one user record (indexed lookup, no file rewrite)."""
+    conn = conn or get_connection()
+    with conn:
+        conn.execute("UPDATE users SET status = ?, updated_at = ? WHERE email = ?", (status, time.time(), email))
+
+def get_users(emails=None, conn=None):
+    """Returns user records as dicts keyed by the legacy CSV headers."""
+    conn = conn or get_connection()
+    cols = ", ".join(c for _, c in USER_COLUMNS)
+    if emails is None:
+        rows = conn.execute(f"SELECT {cols} FROM users ORDER BY timestamp").fetchall()
+    else:
+        rows = []
+        emails = list(emails)
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(emails), 500):
+            chunk = emails[i:i + 500]
+            rows += conn.execute(f"SELECT {cols} FROM users WHERE email IN ({', '.join('?' * len(chunk))}) ORDER BY timestamp", chunk).fetchall()
+    return [{h: (row[c] if row[c] is not None else "") for h, c in USER_COLUMNS} for row in rows]
+
+def get_passwords(emails, conn=None):
+    """Returns {email: password} for the given users."""
+    return {u['Email']: u['Password'] for u in get_users(emails, conn=conn)}
+
+def import_users_csv(path=USER_DB_CSV, conn=None, force=False):
+    """One-time import of the legacy user_db.csv (later rows win, matching the old 'last entry' lookup)."""
+    conn = conn or get_connection()
+    if not os.path.isfile(path): return 0
+    if not force and get_setting('user_db_csv_imported', conn=conn): return 0
+    count = 0
+    try:
+        with open(path, mode='r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            for row in reader:
+                if not row or row[0] == "Timestamp": continue
+                row = (row + [""] * len(USER_COLUMNS))[:len(USER_COLUMNS)]
+                record = {c: v for (_, c), v in zip(USER_COLUMNS, row)}
+                if not record['email']: continue
+                upsert_user(record, conn=conn)
+                count += 1
+        set_setting('user_db_csv_imported', str(time.time()), conn=conn)
+        logging.info(f"[ISyncDB] Imported {count} user records from {path}")
+    except Exception as e:
+        logging.error(f"[ISyncDB] Failed to import {path}: {e}")
+    return count
+
+def export_users_csv(path=None, conn=None):
+    """Writes all user records in the legacy CSV layout. Returns the CSV text if path is None."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(USER_CSV_HEADERS)
+    for u in get_users(conn=conn):
+        writer.writerow([u[h] for h in USER_CSV_HEADERS])
+    if path is None: return buf.getvalue()
+    with open(path, mode='w', newline='', encoding='utf-8') as f:
+        f.write(buf.getvalue())
+    return path
+
+# --- Jobs & Structured Events ---
+
+def db_now():
+    """Timestamp in the format the jobs/logs tables already use."""
+    return datetime.now().isoformat(sep=' ')
+
+def _process_start(pid):
+    """Linux: '<boot id>-<start ticks>' for pid, which changes on pid reuse, container restarts and reboots; None elsewhere."""
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f: boot_id = f.read().strip()
+        with open(f"/proc/{pid}/stat") as f: stat = f.read()
+        # comm (field 2) may contain spaces; starttime is field 22
+        return f"{boot_id}-{stat.rsplit(')', 1)[1].split()[19]}"
+    except (OSError, IndexError):
+        return None
+
+# Identifies this process in jobs.owner; a bare pid is reused (same pid after a container restart)
+PROCESS_TOKEN = f"{os.getpid()}:{_process_start(os.getpid()) or uuid.uuid4().hex}"
+
+def owner_alive(token):
+    """True if the process that wrote this jobs.owner token is still running."""
+    if not token: return False
+    if token == PROCESS_TOKEN: return True
+    pid, _, start = str(token).partition(":")
+    if not pid.isdigit() or not start: return False
+    # Without /proc the token is a random id that can't be checked from outside; treat it as gone
+    return _process_start(int(pid)) == start
+
+def create_job(source, dest, domain_reference, status="RUNNING", conn=None):
+    """Inserts a jobs row synchronously (callers need the id) and returns it."""
+    conn = conn or get_connection()
+    now = db_now()
+    with conn:
+        cur = conn.execute("INSERT INTO jobs (source, dest, domain_reference, status, created_at, last_updated, owner) VALUES (?, ?, ?, ?, ?, ?, ?)", (source, dest, domain_reference, status, now, now, PROCESS_TOKEN))
+    return cur.lastrowid
+
+def _job_row(row):
+    job = dict(row)
+    try: job['state'] = json.loads(job['state']) if job.get('state') else {}
+    except ValueError: job['state'] = {}
+    return job
+
+def get_job(job_id, conn=None):
+    """One jobs row with its checkpoint state decoded, or None."""
+    conn = conn or get_connection()
+    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job_row(row) if row else None
+
+def jobs_with_status(statuses, conn=None):
+    """Jobs rows (state decoded) whose status is one of statuses, oldest first."""
+    conn = conn or get_connection()
+    statuses = list(statuses)
+    return [_job_row(r) for r in conn.execute(f"SELECT * FROM jobs WHERE status IN ({', '.join('?' * len(statuses))}) ORDER BY id", statuses)]
+
+def checkpoint_job(job_id, cycle, step, state, status=None, conn=None):
+    """
+    Writes a job's resumable state to its jobs row synchronously.
+    Called at step boundaries only, so it can afford to bypass the BatchWriter (a crash must not lose it).
+    """
+    conn = conn or get_connection()
+    sets = "cycle = ?, step = ?, state = ?, owner = ?, last_updated = ?"
+    params = [cycle, step, json.dumps(state, default=str), PROCESS_TOKEN, db_now()]
+    if status:
+        sets += ", status = ?"
+        params.append(status)
+    with conn:
+        conn.execute(f"UPDATE jobs SET {sets} WHERE id = ?", params + [job_id])
+
+def interrupt_job(job_id, state, conn=None):
+    """Marks a job whose process died as INTERRUPTED and closes its open ledger rows."""
+    conn = conn or get_connection()
+    now = db_now()
+    with conn:
+        conn.execute("UPDATE jobs SET status = 'INTERRUPTED', state = ?, last_updated = ? WHERE id = ?", (json.dumps(state, default=str), now, job_id))
+        conn.execute("UPDATE transfers SET result = 'INTERRUPTED', finished_at = ? WHERE job_id = ? AND finished_at IS NULL", (now, job_id))
+
+def recent_jobs(limit=20, conn=None):
+    """Newest jobs, with their ledger byte totals."""
+    conn = conn or get_connection()
+    sql = "SELECT jobs.*, (SELECT SUM(bytes) FROM transfers WHERE transfers.job_id = jobs.id) AS bytes FROM jobs ORDER BY id DESC LIMIT ?"
+    return [dict(r) for r in conn.execute(sql, (limit,))]
+
+def job_events(job_id, event=None, conn=None):
+    """Structured history for one job (indexed on job_id)."""
+    conn = conn or get_connection()
+    sql = "SELECT id, level, event, message, data, timestamp FROM logs WHERE job_id = ?"
+    params = [job_id]
+    if event:
+        sql += " AND event = ?"
+        params.append(event)
+    rows = [dict(r) for r in conn.execute(sql + " ORDER BY id", params)]
+    for r in rows: r['data'] = json.loads(r['data']) if r['data'] else None
+    return rows
+
+class BatchWriter:
+    """
+    Background SQLite writer:
+    - Callers enqueue (sql, params) without blocking
+    - One thread drains the queue and commits each batch in a single transaction
+    - If the queue is full the row is dropped (and counted) rather than stalling the caller
+    """
+    def __init__(self, path=None, max_queue=10000, batch_size=500, flush_interval=0.5):
+        self.path = path
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="isync-db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, sql, params):
+        try:
+            self.queue.put_nowait((sql, params))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Blocks until everything queued so far is committed."""
+        self.queue.join()
+
+    def _run(self):
+        conn = get_connection(self.path)
+        while True:
+            items = [self.queue.get()]
+            # Linger briefly so bursts land in one transaction
+            deadline = time.monotonic() + self.flush_interval
+            while len(items) < self.batch_size:
+                try: items.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty: break
+            try:
+                grouped = {}
+                for sql, params in items: grouped.setdefault(sql, []).append(params)
+                with conn:
+                    for sql, rows in grouped.items(): conn.executemany(sql, rows)
+            except Exception as e:
+                logging.error(f"[ISyncDB] Batch write failed ({len(items)} rows): {e}")
+            finally:
+                for _ in items: self.queue.task_done()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_batch_writer():
+    """Returns the process-wide background writer for isync.db."""
+    global _writer
+    with _writer_lock:
+        if _writer is None: _writer = BatchWriter()
+        return _writer
+
+def record_event(job_id, event, message, data=None, level="INFO"):
+    """Queues a structured event for the logs table (never blocks on SQLite)."""
+    get_batch_writer().submit(
+        "INSERT INTO logs (job_id, level, message, timestamp, event, data) VALUES (?, ?, ?, ?, ?, ?)",
+        (job_id, level, message, db_now(), event, json.dumps(data) if data is not None else None)
+    )
+
+def update_job_status(job_id, status):
+    """Queues a jobs.status change."""
+    get_batch_writer().submit("UPDATE jobs SET status = ?, last_updated = ? WHERE id = ?", (status, db_now(), job_id))
+
+# --- Transfer Ledger ---
+
+def start_transfer(job_id, cycle, user, conn=None):
+    """Opens a ledger row for one rclone run synchronously and returns its id."""
+    conn = conn or get_connection()
+    now = db_now()
+    with conn:
+        cur = conn.execute("INSERT INTO transfers (job_id, cycle, user, started_at, updated_at) VALUES (?, ?, ?, ?, ?)", (job_id, cycle, user, now, now))
+    return cur.lastrowid
+
+def checkpoint_transfer(transfer_id, bytes_done, files):
+    """Queues the running byte/file counts for a ledger row."""
+    get_batch_writer().submit("UPDATE transfers SET bytes = ?, files = ?, updated_at = ? WHERE id = ?", (int(bytes_done), int(files), db_now(), transfer_id))
+
+def finish_transfer(transfer_id, bytes_done, files, result, exit_code):
+    """Queues the final counts and outcome for a ledger row."""
+    now = db_now()
+    get_batch_writer().submit(
+        "UPDATE transfers SET bytes = ?, files = ?, result = ?, exit_code = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+        (int(bytes_done), int(files), result, exit_code, now, now, transfer_id)
+    )
+
+def job_transfers(job_id, conn=None):
+    """Ledger rows for one job, oldest first."""
+    conn = conn or get_connection()
+    return [dict(r) for r in conn.execute("SELECT * FROM transfers WHERE job_id = ? ORDER BY id", (job_id,))]
+
+def job_transfer_totals(job_id, conn=None):
+    """Exact totals for one job: {'bytes', 'files', 'runs'}."""
+    conn = conn or get_connection()
+    row = conn.execute("SELECT COALESCE(SUM(bytes), 0), COALESCE(SUM(files), 0), COUNT(*) FROM transfers WHERE job_id = ?", (job_id,)).fetchone()
+    return {'bytes': row[0], 'files': row[1], 'runs': row[2]}
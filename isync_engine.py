@@ -4,14 +4,19 @@ from logging.handlers import RotatingFileHandler
 import time
 import os
 import threading
-import json
+import queue
 import re
+import secrets
 import shlex
-import requests
 import shutil
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from isync_auth import ISyncAuthManager
+from isync_auth import ISyncAuthManager, get_directory_service, batch_get_users, BATCH_LIMIT, USER_LISTING_CACHE
+from isync_rclone import parse_json_stats, summarize_stats, parse_size_bytes, format_bytes, find_free_port, RcloneRcClient, ThroughputWindow
+from isync_notify import get_notifier
+from isync_db import create_job, record_event, update_job_status, start_transfer, checkpoint_transfer, finish_transfer, job_transfer_totals, get_job, jobs_with_status, checkpoint_job, interrupt_job, owner_alive
+from isync_timeseries import SampleRecorder
+from isync_profile import profile_run, PROFILE_MODES
+from isync_metrics import span, timed, SPAN_DURATION, start_metrics_server, BYTES_TRANSFERRED, SPEED, JOB_RUNNING, RCLONE_RUNS, RCLONE_RESTARTS, STALLS, STEP_DURATION
+from isync_status import get_run_registry
 from isync_config import DEFAULT_SA_JSON_PATH, LOG_FILE_PATH, LOGS_DIR
 
 # Configure logging to file
@@ -22,9 +27,7 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-STATUS_FILE = "current_status.json"
-STEP_STATUS_FILE = "step_status.json"
-STEP_ACTION_FILE = "step_action.json"
+USER_SCOPES = ['https://www.googleapis.com/auth/admin.directory.user']
 
 class ISyncEngine:
     """
@@ -37,11 +40,128 @@ class ISyncEngine:
     def __init__(self, config):
         self.config = config
         self.stop_event = threading.Event()
-        self.total_bytes_history = 0.0 
-        self.clear_status()
+        self.total_bytes_history = 0 # Exact bytes across every run of this engine
+        self.job_id = None
+        self.cycle = None
+        self.job_bytes = 0
+        self.job_state = {}
+        self.last_tmux_session = None
+        self.transfer_id = None
+        self.run_bytes = 0
+        self.run_files = 0
+        self.last_checkpoint = 0.0
+        self.last_exit_code = None
+        self.last_stall_phase = None
+        self.last_stall_reason = None
+        self.sample_recorder = None
+        self.step_started = {}
+        self.rclone_runs = 0
+        self.metrics_bytes = 0
+        self.run = None # RunState of the job/run in progress (see isync_status.RunRegistry)
+        self.last_run_id = None
+        USER_LISTING_CACHE.ttl = float(config.get('user_list_cache_ttl', 60))
+        # Every run's status shares the registry's snapshot file, coalesced to status_flush_hz
+        get_run_registry().set_flush_hz(float(config.get('status_flush_hz', 2)))
+        # Optional Prometheus endpoint; serves in-memory counters only
+        metrics_port = int(config.get('metrics_port') or 0)
+        if metrics_port: start_metrics_server(metrics_port, config.get('metrics_bind') or '127.0.0.1')
+
+    def stop(self):
+        """Signals the engine to stop and wakes it if paused on a Step Check."""
+        self.stop_event.set()
+        if self.run is not None: self.run.control.interrupt()
+
+    def _begin_run(self, label):
+        """Registers a namespaced status entry for this engine's work (no-op if one is already open)."""
+        if self.run is not None: return False
+        self.run = get_run_registry().start_run(label, job_id=self.job_id)
+        self.last_run_id = self.run.run_id
+        return True
+
+    def _end_run(self):
+        if self.run is None: return
+        get_run_registry().finish_run(self.run.run_id)
+        self.run = None
+
+    def _set_step(self, data):
+        if self.run is not None: get_run_registry().set_step(self.run, data)
+
+    def checkpoint(self, step, status=None, **state):
+        """Persists the current job's resumable state (cycle, step, user, ...) to its jobs row."""
+        if self.job_id is None: return
+        self.job_state.update(state)
+        self.job_state['bytes'] = self.job_bytes
+        try: checkpoint_job(self.job_id, self.cycle, step, self.job_state, status=status)
+        except Exception as e: logging.error(f"[ISyncEngine] Job checkpoint failed: {e}")
+
+    def remote_session_alive(self, session):
+        """True while rclone is still running in the SSH host's tmux session; None if the host can't be reached."""
+        # keep_open leaves the session waiting on 'read line' after rclone exits, so check the pane's command
+        cmd = self._get_ssh_base_cmd() + ["tmux", "list-panes", "-t", session, "-F", "#{pane_current_command}"]
+        try:
+            res = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logging.warning(f"[ISyncEngine] Could not check tmux session {session}: {e}")
+            return None
+        if res.returncode != 0: return None if res.returncode == 255 else False # 255: ssh itself failed
+        return "rclone" in res.stdout
+
+    def reconcile_interrupted_jobs(self):
+        """
+        Startup recovery pass:
+        - Jobs left RUNNING by a process that no longer exists are marked INTERRUPTED
+        - Their open ledger rows are closed, and a detached remote rclone is looked for (state['detached_alive'])
+        Returns the interrupted jobs; those with state['pair'] can be resumed via execute_job(resume_job_id=...).
+        """
+        interrupted = []
+        for job in jobs_with_status(("RUNNING",)):
+            if owner_alive(job['owner']): continue
+            state = job['state']
+            if job['step'] == "rclone_running" and state.get('tmux_session') and state.get('ssh_enabled'):
+                state['detached_alive'] = self.remote_session_alive(state['tmux_session'])
+            interrupt_job(job['id'], state)
+            record_event(job['id'], "job_interrupted", f"Job Interrupted at cycle {job['cycle']} ({job['step']})", {'cycle': job['cycle'], 'step': job['step'], 'detached_alive': state.get('detached_alive')}, level="WARNING")
+            logging.warning(f"[ISyncEngine] Job #{job['id']} was interrupted at cycle {job['cycle']} ({job['step']}).")
+            job['status'] = "INTERRUPTED"
+            interrupted.append(job)
+        return interrupted
+
+    def discard_interrupted_job(self, job):
+        """
+        Marks an interrupted job ABANDONED.
+        A temp user it provisioned and never deleted is deleted first; if that fails the job is left INTERRUPTED (raises).
+        """
+        state = dict(job['state'])
+        temp_user = state.get('user') if state.get('temp_user_live') else None
+        if temp_user:
+            domain_cfg = self.get_domain_config(job['domain_reference'])
+            auth_mgr = ISyncAuthManager(domain_cfg.get('sa_json_path') or DEFAULT_SA_JSON_PATH, domain_cfg['admin_email'], protected_users=self.config.get('protected_users', []))
+            auth_mgr.delete_user(temp_user)
+            # delete_user only logs API errors; confirm the account is really gone before dropping the record
+            if auth_mgr.user_exists(temp_user): raise RuntimeError(f"{temp_user} still exists after delete")
+            state['temp_user_live'] = False
+            logging.info(f"[ISyncEngine] Deleted temp user {temp_user} left by interrupted job #{job['id']}.")
+        checkpoint_job(job['id'], job['cycle'], job['step'], state, status="ABANDONED")
+        record_event(job['id'], "job_abandoned", f"Job Abandoned at cycle {job['cycle']}", {'deleted_user': temp_user})
+
+    def _await_detached_run(self, session, job_label, user, poll=30):
+        """Waits for an rclone left running in a remote tmux session by a previous process. False if stopped first."""
+        logging.info(f"[ISyncEngine] Waiting for detached rclone in tmux session {session}.")
+        self.update_status(job_label, user or "-", "-", "-", "0", status_msg=f"Waiting for detached rclone ({session})")
+        while not self.stop_event.is_set():
+            if self.remote_session_alive(session) is False: return True
+            self.stop_event.wait(poll)
+        return False
+
+    def record_event(self, event, message, data=None, level="INFO"):
+        """Queues a structured event for the current job in isync.db (non-blocking)."""
+        try:
+            record_event(self.job_id, event, message, data, level=level)
+        except Exception as e:
+            logging.debug(f"[ISyncEngine] Event sink unavailable: {e}")
 
     def clear_status(self, step="Ready", detail="", status="IDLE"):
-        """Clears the step status file to remove old errors."""
+        """Clears this run's step status to remove old errors."""
         data = {
             "step": step,
             "detail": detail,
@@ -49,9 +169,9 @@ class ISyncEngine:
             "error": None,
             "timestamp": time.time()
         }
-        with open(STEP_STATUS_FILE, 'w') as f:
-            json.dump(data, f)
+        self._set_step(data)
 
+    @timed("engine.announce_step")
     def announce_step(self, description, detail):
         """
         Announces a step to the UI. 
@@ -59,43 +179,41 @@ class ISyncEngine:
         """
         # 1. Initial State: Running or Waiting
         status = "WAITING_USER" if self.config.get('step_check') else "RUNNING"
+        step_id = f"{threading.get_ident()}-{time.time()}"
+        control = self.run.control if self.run is not None else None
+        if control is None: status = "RUNNING" # Nothing to pause on outside a run
         
         data = {
+            "step_id": step_id,
             "step": description,
             "detail": detail,
             "status": status,
             "error": None,
             "timestamp": time.time()
         }
-        with open(STEP_STATUS_FILE, 'w') as f:
-            json.dump(data, f)
+        self.step_started[description] = time.monotonic()
+        # Register before publishing so a fast Continue click can't arrive unclaimed
+        if status == "WAITING_USER": control.begin(step_id)
+        self._set_step(data)
+        self.record_event("step", f"{description}: {status}", {'step': description, 'status': status, 'detail': detail})
             
         # 2. Pause Logic
-        if self.config.get('step_check'):
+        if status == "WAITING_USER":
             logging.info(f"[Step Check] Paused for: {description}")
-            while True:
-                if self.stop_event.is_set(): raise Exception("Engine Stopped")
-                
-                if os.path.exists(STEP_ACTION_FILE):
-                    try:
-                        with open(STEP_ACTION_FILE, 'r') as f: action_data = json.load(f)
-                        if action_data.get('action') == 'CONTINUE':
-                            # Clear action and proceed
-                            os.remove(STEP_ACTION_FILE)
-                            break
-                        elif action_data.get('action') == 'ABORT':
-                            os.remove(STEP_ACTION_FILE)
-                            raise Exception("User Aborted via Step Check")
-                    except (json.JSONDecodeError, PermissionError): pass
-                time.sleep(0.5)
+            with span("engine.step_wait"):
+                action = control.wait(step_id, self.stop_event)
+            if action is None: raise Exception("Engine Stopped")
+            if action == 'ABORT': raise Exception("User Aborted via Step Check")
             
             # Update to RUNNING after approval
-            data['status'] = "RUNNING"
-            with open(STEP_STATUS_FILE, 'w') as f: json.dump(data, f)
+            self._set_step(dict(data, status="RUNNING"))
 
+    @timed("engine.complete_step")
     def complete_step(self, description, success=True, error=None):
         """Updates the step status to Success or Failed."""
         status = "SUCCESS" if success else "FAILED"
+        started = self.step_started.pop(description, None)
+        if started is not None: STEP_DURATION.observe(time.monotonic() - started, step=description, status=status)
         data = {
             "step": description,
             "detail": "", # Clear detail on completion to reduce clutter or keep it? Keeping it simple.
@@ -104,41 +222,32 @@ class ISyncEngine:
             "dismissible": not success,
             "timestamp": time.time()
         }
-        with open(STEP_STATUS_FILE, 'w') as f:
-            json.dump(data, f)
+        self._set_step(data)
+        self.record_event("step", f"{description}: {status}", {'step': description, 'status': status, 'error': data['error']}, level="INFO" if success else "ERROR")
         
         if not success:
             logging.error(f"[Step Failure] {description}: {error}")
 
+    @timed("engine.send_notification")
     def send_notification(self, message):
-        """Sends webhook notification (Discord/Slack)."""
+        """Queues a webhook notification (Discord/Slack); delivery happens on a background thread."""
         url = self.config.get('webhook_url')
         if not url: return
         try:
-            # Discord format default, adapts for Slack
-            payload = {"content": f"**[ISync]** {message}"} 
-            if "hooks.slack.com" in url: 
-                payload = {"text": f"[ISync] {message}"}
-            requests.post(url, json=payload)
+            get_notifier(url, timeout=float(self.config.get('webhook_timeout', 10))).send(message)
         except Exception: 
             pass
 
     def parse_size(self, size_str):
-        """Parses rclone size strings (e.g., '1.5 G') into GB floats."""
-        if not size_str: return 0.0
-        match = re.search(r"([0-9.]+)\s*([a-zA-Z]+)", size_str)
-        if not match: return 0.0
-        val = float(match.group(1))
-        unit = match.group(2).upper()
-        if 'T' in unit: return val * 1024
-        if 'G' in unit: return val
-        if 'M' in unit: return val / 1024
-        return 0.0
-
-    def update_status(self, job_name, user, speed, current_progress, current_bytes_str, is_running=True, mode="Normal", status_msg="Running"):
-        """Writes current state to JSON for UI consumption."""
-        current_val_gb = self.parse_size(current_bytes_str)
-        total_gb = self.total_bytes_history + current_val_gb
+        """Parses rclone size strings (e.g., '1.5 G', '512 KiB') into GiB floats (display only; accounting uses parse_size_bytes)."""
+        return parse_size_bytes(size_str) / (1024 ** 3)
+
+    @timed("engine.update_status")
+    def update_status(self, job_name, user, speed, current_progress, current_bytes_str, is_running=True, mode="Normal", status_msg="Running", current_bytes=None, eta=None, transferring=None):
+        """Publishes this run's live state for the UI (see isync_status.RunRegistry)."""
+        # Structured stats (JSON log / rc) give exact bytes; text mode falls back to the scraped size string
+        run_bytes = current_bytes if current_bytes is not None else parse_size_bytes(current_bytes_str)
+        total_bytes = self.total_bytes_history + run_bytes
 
         data = {
             "job": job_name,
@@ -147,12 +256,41 @@ class ISyncEngine:
             "current_user": user,
             "speed": speed,
             "current_progress": current_progress,
-            "total_transferred_gb": round(total_gb, 2),
+            "total_transferred_gb": round(total_bytes / (1024 ** 3), 2),
+            "total_transferred_bytes": total_bytes,
+            "job_transferred_bytes": self.job_bytes + run_bytes if self.job_id is not None else None,
+            "eta": eta,
+            "transferring": transferring or [],
             "is_running": is_running,
+            "job_id": self.job_id,
             "last_updated": time.time()
         }
-        with open(STATUS_FILE, 'w') as f:
-            json.dump(data, f)
+        # Coalesced and rate-limited; terminal states are written through immediately
+        if self.run is not None: get_run_registry().set_status(self.run, data, force=not is_running)
+        if total_bytes > self.metrics_bytes:
+            BYTES_TRANSFERRED.inc(total_bytes - self.metrics_bytes)
+            self.metrics_bytes = total_bytes
+        # Only updates that carry a rate ('10.000 MiB/s') move the gauge; placeholders like "0"/"-" would zero it between stats lines
+        if not is_running: SPEED.set(0)
+        elif str(speed).endswith("/s"): SPEED.set(parse_size_bytes(speed))
+        if is_running and self.job_id is not None: self.record_sample(total_bytes, parse_size_bytes(speed), len(transferring or []))
+
+    def record_sample(self, total_bytes, speed_bps, transfers):
+        """Adds a throughput sample to the current job's time series (non-blocking)."""
+        try:
+            if self.sample_recorder is None or self.sample_recorder.job_id != self.job_id:
+                self.close_samples()
+                self.sample_recorder = SampleRecorder(self.job_id)
+            self.sample_recorder.record(total_bytes, speed_bps, transfers)
+        except Exception as e:
+            logging.debug(f"[ISyncEngine] Sample sink unavailable: {e}")
+
+    def close_samples(self):
+        """Writes the open rollup buckets of the current time series."""
+        if self.sample_recorder is None: return
+        try: self.sample_recorder.close()
+        except Exception as e: logging.debug(f"[ISyncEngine] Sample sink unavailable: {e}")
+        self.sample_recorder = None
 
     def get_domain_config(self, domain_name):
         """Finds configuration for a specific domain."""
@@ -197,15 +335,12 @@ class ISyncEngine:
             json_path = domain_cfg.get('sa_json_path', DEFAULT_SA_JSON_PATH)
             admin_email = domain_cfg['admin_email']
             
-            SCOPES = ['https://www.googleapis.com/auth/admin.directory.user']
-            creds = service_account.Credentials.from_service_account_file(
-                json_path, scopes=SCOPES, subject=admin_email
-            )
-            service = build('admin', 'directory_v1', credentials=creds)
+            service = get_directory_service(json_path, admin_email, USER_SCOPES)
 
             for email in user_emails:
                 try:
                     service.users().patch(userKey=email, body={'suspended': False}).execute()
+                    USER_LISTING_CACHE.invalidate(domain_name)
                     results[email] = "Success: Reactivated"
                     logging.info(f"[ISyncEngine] Unsuspended user: {email}")
                 except Exception as e:
@@ -228,21 +363,19 @@ class ISyncEngine:
             json_path = domain_cfg.get('sa_json_path', DEFAULT_SA_JSON_PATH)
             admin_email = domain_cfg['admin_email']
             
-            SCOPES = ['https://www.googleapis.com/auth/admin.directory.user']
-            creds = service_account.Credentials.from_service_account_file(
-                json_path, scopes=SCOPES, subject=admin_email
-            )
-            service = build('admin', 'directory_v1', credentials=creds)
+            service = get_directory_service(json_path, admin_email, USER_SCOPES)
+            batch_size = int(self.config.get('admin_batch_size', BATCH_LIMIT))
+            fetched = batch_get_users(service, list(user_emails), fields='suspended,suspensionReason', batch_size=batch_size)
 
             for email in user_emails:
-                try:
-                    user = service.users().get(userKey=email).execute()
+                user = fetched.get(email)
+                if isinstance(user, Exception):
+                    results[email] = {'error': str(user)}
+                    logging.error(f"[ISyncEngine] Failed to check suspension for {email}: {user}")
+                else:
                     is_suspended = user.get('suspended', False)
                     reason = user.get('suspensionReason', 'None')
                     results[email] = {'suspended': is_suspended, 'reason': reason}
-                except Exception as e:
-                    results[email] = {'error': str(e)}
-                    logging.error(f"[ISyncEngine] Failed to check suspension for {email}: {e}")
         except Exception as e:
             logging.error(f"[ISyncEngine] Batch Check Suspension Error: {e}")
             return {"Global Error": str(e)}
@@ -259,7 +392,7 @@ class ISyncEngine:
         if ssh_key: cmd.extend(["-i", ssh_key])
         return cmd
 
-    def build_rclone_cmd(self, source, dest, sa_json_path, impersonate_email, dry_run=False, remote_sa_json_path=None, keep_open=True, session_suffix="", skip_ssh_wrapper=False):
+    def build_rclone_cmd(self, source, dest, sa_json_path, impersonate_email, dry_run=False, remote_sa_json_path=None, keep_open=True, session_suffix="", skip_ssh_wrapper=False, rc_addr=None, stats_mode=None):
         """Generates the full rclone command list (including SSH wrapping if enabled)."""
         command_type = self.config.get('rclone_command', 'copy')
         upload_limit_str = self.config.get('upload_limit', '700G')
@@ -267,6 +400,7 @@ class ISyncEngine:
         chunk_size = self.config.get('rclone_chunk_size', '128M')
         stats_interval = self.config.get('rclone_stats_interval', '1s')
         is_verbose = self.config.get('rclone_verbose', True)
+        if stats_mode is None: stats_mode = self.config.get('rclone_stats_mode', 'text')
         
         if not sa_json_path:
             sa_json_path = DEFAULT_SA_JSON_PATH
@@ -286,6 +420,14 @@ class ISyncEngine:
             f"--stats={stats_interval}"
         ]
         if is_verbose: cmd.append("--verbose")
+        if stats_mode == 'json':
+            cmd.append("--use-json-log")
+            # Stats are logged at INFO; surface them at the default level when not verbose
+            if not is_verbose: cmd.append("--stats-log-level=NOTICE")
+        if rc_addr:
+            # Local remote-control server; stats are polled instead of parsed from stdout.
+            # Authenticated with per-run credentials passed as RCLONE_RC_USER/RCLONE_RC_PASS (see _run_rclone)
+            cmd.extend(["--rc", f"--rc-addr={rc_addr}"])
         
         if extra_flags: cmd.extend(extra_flags)
         if dry_run: cmd.append("--dry-run")
@@ -303,14 +445,60 @@ class ISyncEngine:
             
             # Wrap in Tmux (New Session)
             session_name = f"isync_{int(time.time())}{session_suffix}"
+            self.last_tmux_session = session_name
             # Pass as separate arguments to avoid over-quoting by SSH/Windows
             cmd = base_cmd + ["tmux", "new-session", "-s", session_name, remote_cmd_str]
             
         return cmd
 
+    @timed("rclone.run")
     def run_rclone(self, source, dest, sa_json_path, impersonate_email, job_label, dry_run=False, remote_sa_json_path=None):
         """Runs the rclone command and monitors output."""
-        stall_limit = int(self.config.get('stall_timeout_minutes', 10)) * 60
+        # Standalone runs (Manual Ops 'Run Once') get their own jobs row for history
+        own_job = self.job_id is None
+        if own_job:
+            self.job_id = create_job(source, dest, None)
+            self.rclone_runs = 0
+        own_run = self._begin_run(job_label)
+        self.last_exit_code = None
+        self.last_stall_phase = None
+        self.last_stall_reason = None
+        if self.rclone_runs: RCLONE_RESTARTS.inc()
+        self.rclone_runs += 1
+        self.run_bytes = 0
+        self.run_files = 0
+        self.transfer_id = None
+        try: self.transfer_id = start_transfer(self.job_id, self.cycle, impersonate_email)
+        except Exception as e: logging.error(f"[ISyncEngine] Transfer ledger unavailable: {e}")
+        self.last_checkpoint = time.monotonic()
+        result = "ERROR"
+        try:
+            result = self._run_rclone(source, dest, sa_json_path, impersonate_email, job_label, dry_run, remote_sa_json_path)
+            return result
+        finally:
+            # Bytes count whatever the outcome (a stalled run still moved data)
+            self.total_bytes_history += self.run_bytes
+            self.job_bytes += self.run_bytes
+            if self.transfer_id is not None:
+                try: finish_transfer(self.transfer_id, self.run_bytes, self.run_files, result, self.last_exit_code)
+                except Exception as e: logging.error(f"[ISyncEngine] Transfer ledger unavailable: {e}")
+            RCLONE_RUNS.inc(result=result)
+            self.checkpoint("rclone_done", result=result, tmux_session=None)
+            if result == "STALLED": STALLS.inc(reason=self.last_stall_reason or "", phase=self.last_stall_phase or "")
+            self.record_event("rclone_exit", f"Rclone finished: {result} (exit code {self.last_exit_code})", {'result': result, 'exit_code': self.last_exit_code, 'stall_phase': self.last_stall_phase, 'stall_reason': self.last_stall_reason, 'user': impersonate_email, 'cycle': self.cycle, 'bytes': self.run_bytes, 'files': self.run_files}, level="WARNING" if result in ("ERROR", "STALLED") else "INFO")
+            if own_job:
+                update_job_status(self.job_id, "FAILED" if result == "ERROR" else result)
+                self.close_samples()
+                self.job_id = None
+                self.job_bytes = 0
+            if own_run: self._end_run()
+
+    def _run_rclone(self, source, dest, sa_json_path, impersonate_email, job_label, dry_run=False, remote_sa_json_path=None):
+        """Monitor loop for run_rclone. Returns DONE, LIMIT_REACHED, STALLED, CANCELLED or ERROR."""
+        stall_limit = float(self.config.get('stall_timeout_minutes', 10)) * 60
+        kill_grace = float(self.config.get('stall_kill_grace_seconds', 15))
+        # Throughput stall: below min MB/s for a full window with no file completing (window 0 disables)
+        throughput = ThroughputWindow(float(self.config.get('stall_throughput_window_minutes', 10)) * 60, float(self.config.get('stall_min_throughput_mbps', 0.1)) * 1024 ** 2)
         upload_limit_str = self.config.get('upload_limit', '700G')
         mode_label = "TEST MODE" if dry_run else "Normal"
         
@@ -330,7 +518,24 @@ class ISyncEngine:
                 logging.error(f"[ISyncEngine] SSH Check Error: {e}")
                 return "ERROR"
 
-        cmd = self.build_rclone_cmd(source, dest, sa_json_path, impersonate_email, dry_run, remote_sa_json_path)
+        # rc polling needs a port reachable from this process, so it is local-only
+        stats_mode = self.config.get('rclone_stats_mode', 'text')
+        rc_addr = None
+        rc_env = None
+        if stats_mode == 'rc':
+            if self.config.get('ssh_enabled'):
+                logging.warning("[ISyncEngine] rc stats mode is not available over SSH. Falling back to JSON log stats.")
+                stats_mode = 'json'
+            else:
+                rc_addr = f"127.0.0.1:{find_free_port()}"
+                # Random per-run credentials: the rc API can run operations/sync on the impersonated remotes,
+                # so no other local process (or a browser form POST) may call it. Passed via the environment
+                # rather than --rc-user/--rc-pass so they stay out of the process list and the logged command.
+                rc_auth = ("isync", secrets.token_urlsafe(24))
+                rc_env = dict(os.environ, RCLONE_RC_USER=rc_auth[0], RCLONE_RC_PASS=rc_auth[1])
+
+        self.last_tmux_session = None
+        cmd = self.build_rclone_cmd(source, dest, sa_json_path, impersonate_email, dry_run, remote_sa_json_path, rc_addr=rc_addr, stats_mode=stats_mode)
 
         # Windows Local Execution: Use PowerShell if available
         if os.name == 'nt' and not self.config.get('ssh_enabled'):
@@ -359,52 +564,172 @@ class ISyncEngine:
             cmd = ["cmd.exe", "/c", f"{cmd_str} & pause"]
 
         # Start subprocess
-        process = subprocess.Popen(cmd, stdout=stdout_dest, stderr=stderr_dest, universal_newlines=True, creationflags=creation_flags)
+        process = subprocess.Popen(cmd, stdout=stdout_dest, stderr=stderr_dest, universal_newlines=True, creationflags=creation_flags, env=rc_env)
+        self.checkpoint("rclone_running", user=impersonate_email, tmux_session=self.last_tmux_session, result=None)
+
+        # Recent output is kept in memory for the Live Console; echoing to stdout is opt-in
+        output_buffer = self.run.output
+        output_buffer.append(f"--- {time.strftime('%Y-%m-%d %H:%M:%S')} rclone ({mode_label}) as {impersonate_email} ---")
+        echo_stdout = self.config.get('rclone_echo_stdout', False)
 
         current_bytes_str = "0 G"
+        # Text mode: the files line carries no rate, so it reports the last rate parsed from the bytes line
+        text_speed = "0"
+        current_bytes = None
+        files_done = 0
+        checks_done = 0
+        json_stats = stats_mode == 'json'
         last_activity_time = time.time()
+        # Watchdog phase: starting -> scanning -> transferring -> exiting (reported if it hangs)
+        phase = "starting"
+        eof = False
+
+        # Dedicated reader thread so a silent rclone can't block the watchdog in readline()
+        output_q = queue.Queue()
+        if stdout_dest is not None:
+            threading.Thread(target=self._pump_output, args=(process.stdout, output_q), name="isync-rclone-reader", daemon=True).start()
+
+        # rc mode: a poller thread owns the stats; the pipe is only drained
+        rc_state = None
+        if rc_addr:
+            rc_state = {'bytes': None, 'last_activity': time.time(), 'updates': 0}
+            rc_seen = 0 # rc_state['updates'] already fed to the throughput window
+            rc_done = threading.Event()
+            rc_thread = threading.Thread(target=self._poll_rc_stats, args=(RcloneRcClient(rc_addr, auth=rc_auth), rc_done, rc_state, job_label, impersonate_email, mode_label), daemon=True)
+            rc_thread.start()
         
         # Monitor Loop
         while True:
-            # Stall Check
-            if time.time() - last_activity_time > stall_limit:
-                logging.error(f"[ISyncEngine] STALL DETECTED! No activity for {stall_limit/60} mins.")
-                process.terminate()
-                self.update_status(job_label, impersonate_email, "0", "STALLED", current_bytes_str, status_msg="Stalled - Restarting")
+            if rc_state:
+                last_activity_time = max(last_activity_time, rc_state['last_activity'])
+                current_bytes = rc_state['bytes']
+                files_done = rc_state.get('completed', 0)
+                # One window sample per poll, not per loop pass (verbose output would fill the window with duplicates)
+                if current_bytes is not None and rc_state['updates'] != rc_seen:
+                    rc_seen = rc_state['updates']
+                    if current_bytes and phase in ("starting", "scanning"):
+                        phase = "transferring"
+                        throughput.reset()
+                    throughput.add(current_bytes, files_done + rc_state.get('checks', 0))
+                    self.run_bytes, self.run_files = current_bytes, files_done
+            self._checkpoint_transfer()
+
+            # Stop/cancel (Stop button, QueueWorker.cancel): end the run now instead of when rclone exits on its own
+            if self.stop_event.is_set():
+                logging.warning(f"[ISyncEngine] Stop requested during '{phase}'. Terminating rclone.")
+                if rc_state: rc_done.set()
+                self._terminate_process(process, kill_grace)
+                # Over SSH, ending the local client leaves the tmux session (and rclone) running on the host
+                if self.last_tmux_session: self._kill_remote_session(self.last_tmux_session)
+                self.update_status(job_label, impersonate_email, "0", "CANCELLED", current_bytes_str, status_msg="Cancelled", current_bytes=current_bytes)
+                return "CANCELLED"
+
+            # Stall Check (watchdog deadline)
+            remaining = last_activity_time + stall_limit - time.time()
+            if remaining <= 0:
+                logging.error(f"[ISyncEngine] STALL DETECTED during '{phase}'! No activity for {stall_limit/60:g} mins.")
+                self.last_stall_phase = phase
+                self.last_stall_reason = "no_output"
+                if rc_state: rc_done.set()
+                self._terminate_process(process, kill_grace)
+                self.update_status(job_label, impersonate_email, "0", "STALLED", current_bytes_str, status_msg=f"Stalled ({phase}) - Restarting", current_bytes=current_bytes)
+                return "STALLED"
+
+            # Throughput Check (rclone alive and printing, but bytes not moving)
+            # Only armed once bytes flow: the listing/check pass over an already copied tree runs at 0 B/s by design
+            if phase == "transferring" and throughput.stalled():
+                rate_mbps = throughput.rate() / 1024 ** 2
+                logging.error(f"[ISyncEngine] THROUGHPUT STALL DETECTED! {rate_mbps:.3f} MB/s over {throughput.window/60:g} mins with no completed files.")
+                self.last_stall_phase = phase
+                self.last_stall_reason = "low_throughput"
+                if rc_state: rc_done.set()
+                self._terminate_process(process, kill_grace)
+                self.update_status(job_label, impersonate_email, "0", "STALLED", current_bytes_str, status_msg=f"Stalled ({rate_mbps:.2f} MB/s) - Restarting", current_bytes=current_bytes)
                 return "STALLED"
 
             if stdout_dest is None:
                 # External Window Mode: Cannot read stats
-                time.sleep(1)
+                time.sleep(min(1, remaining))
                 if process.poll() is not None: break
                 self.update_status(job_label, impersonate_email, "-", "Running (External Window)", current_bytes_str, mode=mode_label)
                 continue
-            else:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None: 
-                    break
+
+            if eof:
+                # Output closed; the process must still exit before the deadline
+                if process.poll() is not None: break
+                time.sleep(min(0.2, remaining))
+                continue
+
+            try:
+                output = output_q.get(timeout=min(1.0, remaining))
+            except queue.Empty:
+                continue
+            if output is None:
+                eof = True
+                phase = "exiting"
+                continue
             
             if output:
+                line_start = time.perf_counter()
                 last_activity_time = time.time()
+                if phase == "starting": phase = "scanning"
                 output = output.strip()
+                output_buffer.append(output)
+                if echo_stdout: print(output)
                 # Parse Rclone Stats
-                if "Transferred:" in output and "," in output:
+                if rc_state:
+                    pass
+                elif json_stats:
+                    stats = parse_json_stats(output)
+                    if stats is not None:
+                        summary = summarize_stats(stats)
+                        current_bytes = summary['bytes']
+                        files_done = summary['transfers']
+                        if current_bytes and phase != "transferring":
+                            phase = "transferring"
+                            throughput.reset()
+                        throughput.add(current_bytes, files_done + summary['checks'])
+                        self.run_bytes, self.run_files = current_bytes, files_done
+                        self.update_status(job_label, impersonate_email, summary['speed'], summary['progress'], current_bytes_str, mode=mode_label, current_bytes=current_bytes, eta=summary['eta'], transferring=summary['transferring'])
+                elif output.startswith("Checks:"):
+                    # 'Checks: 1200 / 5000, 24%' (progress for the throughput window)
+                    checks_match = re.search(r"Checks:\s+(\d+)", output)
+                    if checks_match: checks_done = int(checks_match.group(1))
+                elif "Transferred:" in output and "," in output:
                     try:
                         bytes_match = re.search(r"Transferred:\s+([0-9.]+\s?[a-zA-Z]+)", output)
-                        if bytes_match: current_bytes_str = bytes_match.group(1)
+                        if bytes_match:
+                            current_bytes_str = bytes_match.group(1)
+                            text_bytes = parse_size_bytes(current_bytes_str)
+                            if text_bytes and phase != "transferring":
+                                phase = "transferring"
+                                throughput.reset()
+                            throughput.add(text_bytes, files_done + checks_done)
+                            self.run_bytes = text_bytes
+                        else:
+                            # Files line: 'Transferred: 3 / 10, 30%'
+                            files_match = re.search(r"Transferred:\s+(\d+)\s*/\s*\d+,", output)
+                            if files_match: files_done = self.run_files = int(files_match.group(1))
                         parts = output.split(',')
-                        speed, progress = "0", "0%"
+                        progress = "0%"
                         for p in parts:
-                            if "Bytes/s" in p or "bits/s" in p: speed = p.strip()
+                            # '10.000 MiB/s' (rclone >= 1.54), '10.000 MBytes/s', '80 Mbits/s'
+                            if bytes_match and p.strip().endswith("/s"): text_speed = p.strip()
                             if "%" in p: progress = p.strip()
-                        self.update_status(job_label, impersonate_email, speed, progress, current_bytes_str, mode=mode_label)
+                        self.update_status(job_label, impersonate_email, text_speed, progress, current_bytes_str, mode=mode_label)
                     except: pass
-                print(output)
+                SPAN_DURATION.observe(time.perf_counter() - line_start, span="rclone.line")
 
         exit_code = process.poll()
-        final_bytes_gb = self.parse_size(current_bytes_str)
-        self.total_bytes_history += final_bytes_gb
-        limit_gb = self.parse_size(upload_limit_str)
+        self.last_exit_code = exit_code
+        if rc_state:
+            rc_done.set()
+            rc_thread.join(timeout=5)
+            current_bytes = rc_state['bytes']
+            self.run_files = rc_state.get('completed', self.run_files)
+        final_bytes = current_bytes if current_bytes is not None else parse_size_bytes(current_bytes_str)
+        self.run_bytes = final_bytes
+        limit_bytes = parse_size_bytes(upload_limit_str)
         
         if exit_code == 0 or exit_code == 8:
             # If external window, we assume Limit Reached to ensure rotation continues (safer)
@@ -419,8 +744,9 @@ class ISyncEngine:
                 return "LIMIT_REACHED"
 
             # If successful and transfer size is significantly less than limit, assume done.
-            if final_bytes_gb < (limit_gb * 0.9):
-                logging.info(f"[ISyncEngine] Process exited 0 and {final_bytes_gb}G < limit. Job Done.")
+            # Integer comparison: final < 90% of limit
+            if final_bytes * 10 < limit_bytes * 9:
+                logging.info(f"[ISyncEngine] Process exited 0 and {format_bytes(final_bytes)} < limit. Job Done.")
                 self.complete_step("Execute Rclone Command", success=True)
                 return "DONE"
             else:
@@ -431,6 +757,91 @@ class ISyncEngine:
             logging.warning(f"[ISyncEngine] Rclone exited code {exit_code}.")
             return "ERROR"
 
+    def _checkpoint_transfer(self, interval=5.0):
+        """Persists the running byte/file counts to the ledger at most every interval seconds."""
+        if self.transfer_id is None: return
+        now = time.monotonic()
+        if now - self.last_checkpoint < interval: return
+        self.last_checkpoint = now
+        try: checkpoint_transfer(self.transfer_id, self.run_bytes, self.run_files)
+        except Exception as e: logging.debug(f"[ISyncEngine] Ledger checkpoint failed: {e}")
+
+    @staticmethod
+    def _pump_output(stream, output_q):
+        """Reader thread: forwards each rclone output line to the monitor loop; None marks EOF."""
+        try:
+            for line in iter(stream.readline, ''):
+                output_q.put(line)
+        except (OSError, ValueError):
+            pass # Pipe closed underneath us (process killed)
+        finally:
+            output_q.put(None)
+
+    @staticmethod
+    def _terminate_process(process, grace):
+        """Asks rclone to exit, then kills it if it hasn't within grace seconds."""
+        process.terminate()
+        try:
+            process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            logging.error(f"[ISyncEngine] Rclone ignored terminate for {grace:g}s. Killing.")
+            process.kill()
+            try: process.wait(timeout=5)
+            except subprocess.TimeoutExpired: pass
+
+    def _deprovision_user(self, auth_mgr, user):
+        """
+        Deletes a cycle's temp user and checkpoints it as gone. Returns False if the deletion failed.
+        A stopped or cancelled job skips the Step Check pause, so the user is deleted rather than left behind.
+        """
+        if not self.stop_event.is_set():
+            try:
+                self.announce_step("Delete User", f"Deleting user {user}")
+            except Exception:
+                if not self.stop_event.is_set(): raise # Aborted via Step Check
+                # Stopped while paused on this step: clean up anyway
+        try:
+            auth_mgr.delete_user(user)
+            self.complete_step("Delete User", success=True)
+        except Exception as e:
+            self.complete_step("Delete User", success=False, error=str(e))
+            return False
+        self.checkpoint("deprovisioned", temp_user_live=False)
+        return True
+
+    def _kill_remote_session(self, session):
+        """Ends an rclone tmux session on the SSH host (best effort)."""
+        cmd = self._get_ssh_base_cmd() + ["tmux", "kill-session", "-t", session]
+        try:
+            res = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            if res.returncode != 0: logging.warning(f"[ISyncEngine] Could not kill tmux session {session}: {res.stderr.strip()}")
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logging.warning(f"[ISyncEngine] Could not kill tmux session {session}: {e}")
+
+    def _poll_rc_stats(self, client, done, state, job_label, impersonate_email, mode_label):
+        """Polls rclone's rc server for live stats until the run finishes."""
+        interval = float(self.config.get('rclone_rc_poll_interval', 1))
+        while not done.wait(interval):
+            try:
+                summary = summarize_stats(client.stats())
+            except Exception:
+                # rc server not up yet (or already gone); the monitor loop handles exit/stall
+                continue
+            if summary['bytes'] != state['bytes']:
+                state['last_activity'] = time.time()
+            state['bytes'] = summary['bytes']
+            # core/stats' running counter; core/transferred only lists the last ~100 finished items (checks included)
+            state['completed'] = summary['transfers']
+            state['checks'] = summary['checks']
+            state['updates'] = state.get('updates', 0) + 1
+            self.update_status(job_label, impersonate_email, summary['speed'], summary['progress'], "0", mode=mode_label, current_bytes=summary['bytes'], eta=summary['eta'], transferring=summary['transferring'])
+        client.close()
+
+    def _user_fetch_limit(self, max_users):
+        """How many directory rows to fetch so max_users remain after protected users are filtered out."""
+        if self.config.get('include_protected_users', False): return max_users
+        return max_users + len(self.config.get('protected_users', []))
+
     def generate_batch_command(self, pair, dry_run=False, user_list=None):
         """Generates a single batch command string for all users in the rotation."""
         source = pair['source']
@@ -447,9 +858,10 @@ class ISyncEngine:
             if self.config.get('rotation_strategy', 'standard') != 'existing':
                 return "Batch command generation is only supported in 'Existing Users' mode (or with manually selected users)."
 
+            max_users = int(self.config.get('max_users_per_cycle', 10))
             try:
                 list_mgr = ISyncAuthManager(json_path, domain_cfg['admin_email'])
-                fetched_users = list_mgr.list_users(domain_cfg['domain_name'])
+                fetched_users = list_mgr.list_users(domain_cfg['domain_name'], max_users=self._user_fetch_limit(max_users))
             except Exception as e:
                 return f"Error fetching users: {e}"
 
@@ -457,7 +869,6 @@ class ISyncEngine:
                 protected_set = set(u.lower() for u in self.config.get('protected_users', []))
                 fetched_users = [u for u in fetched_users if u.lower() not in protected_set]
 
-            max_users = int(self.config.get('max_users_per_cycle', 10))
             users_to_process = fetched_users[:max_users]
 
         commands = []
@@ -474,8 +885,52 @@ class ISyncEngine:
 
         return "\n".join(commands)
 
-    def execute_job(self, pair, dry_run=False):
-        """Orchestrates the full lifecycle of users for one job."""
+    def execute_job(self, pair, dry_run=False, resume_job_id=None, on_job=None):
+        """
+        Orchestrates the full lifecycle of users for one job (or resumes an interrupted one from its checkpoint).
+        on_job, if given, is called with the jobs row id before any work starts.
+        """
+        self.rclone_runs = 0
+        resume = None
+        if resume_job_id is not None:
+            resume = get_job(resume_job_id)
+            if resume is None: raise ValueError(f"Job #{resume_job_id} not found")
+            self.job_id = resume_job_id
+            self.cycle = resume['cycle']
+            self.job_state = dict(resume['state'])
+            self.job_bytes = job_transfer_totals(resume_job_id)['bytes']
+            self.checkpoint(resume['step'], status="RUNNING")
+            self.record_event("job_resume", f"Job Resumed at cycle {self.cycle} ({resume['step']})", {'cycle': self.cycle, 'step': resume['step']})
+        else:
+            self.job_id = create_job(pair['source'], pair['dest'], pair['domain_reference'])
+            self.cycle = None
+            self.job_bytes = 0
+            self.job_state = {'pair': pair, 'dry_run': dry_run, 'ssh_enabled': bool(self.config.get('ssh_enabled'))}
+            self.checkpoint("started")
+            self.record_event("job_start", f"Job Started: {pair['source']} -> {pair['dest']}", {'pair': pair, 'dry_run': dry_run})
+        if on_job: on_job(self.job_id)
+        self._begin_run(f"{pair['source']} -> {pair['dest']}")
+        JOB_RUNNING.inc()
+        outcome = "FAILED"
+        profile_mode = self.config.get('profile_jobs')
+        try:
+            if profile_mode in PROFILE_MODES:
+                # Opt-in whole-job profile, written to logs/
+                with profile_run(f"{pair['source']}_{pair['dest']}", profile_mode):
+                    outcome = self._run_job(pair, dry_run, resume)
+            else:
+                outcome = self._run_job(pair, dry_run, resume)
+        finally:
+            self.checkpoint("finished", status=outcome)
+            self.record_event("job_finish", f"Job Finished: {outcome} ({format_bytes(self.job_bytes)})", {'outcome': outcome, 'bytes': self.job_bytes}, level="INFO" if outcome != "FAILED" else "ERROR")
+            self.close_samples()
+            JOB_RUNNING.inc(-1)
+            self.job_id = None
+            self._end_run()
+        return outcome
+
+    def _run_job(self, pair, dry_run=False, resume=None):
+        """Job body for execute_job. Returns the outcome recorded on the jobs row."""
         source = pair['source']
         dest = pair['dest']
         target_domain = pair['domain_reference']
@@ -493,19 +948,38 @@ class ISyncEngine:
         if not json_path:
             json_path = DEFAULT_SA_JSON_PATH
             
-        strategy = self.config.get('rotation_strategy', 'standard')
-        max_users = 1 if dry_run else int(self.config.get('max_users_per_cycle', 10))
+        # Resume: carry on from the last checkpoint instead of re-listing and re-running finished cycles
+        state = resume['state'] if resume else {}
+        resume_cycle = (resume or {}).get('cycle') or 0
+        run_finished = bool(resume) and resume['step'] in ("rclone_done", "deprovisioned")
+        if resume and resume['step'] == "rclone_running" and state.get('tmux_session') and state.get('ssh_enabled'):
+            # The previous process died but rclone may still be running on the SSH host; let it finish
+            if not self._await_detached_run(state['tmux_session'], job_label, state.get('user')): return "STOPPED"
+            run_finished = True
+            self.checkpoint("rclone_done", tmux_session=None)
+        finished_done = run_finished and state.get('result') == "DONE"
+        # An uninterrupted job fails on an rclone ERROR; resuming must not carry on to the next cycle instead
+        finished_error = run_finished and state.get('result') == "ERROR"
+
+        strategy = state.get('strategy') or self.config.get('rotation_strategy', 'standard')
+        max_users = state.get('max_users') or (1 if dry_run else int(self.config.get('max_users_per_cycle', 10)))
+        if not resume: self.checkpoint("planned", strategy=strategy, max_users=max_users)
         
-        if strategy == 'existing':
+        if strategy == 'existing' and state.get('user_list') is not None:
+            # --- EXISTING USERS MODE (resumed) ---
+            user_list = state['user_list']
+            logging.info(f"[ISyncEngine] Resuming with the saved list of {len(user_list)} users from cycle {resume_cycle}.")
+
+        elif strategy == 'existing':
             # --- EXISTING USERS MODE ---
             try:
                 list_mgr = ISyncAuthManager(json_path, domain_cfg['admin_email'])
-                user_list = list_mgr.list_users(domain_cfg['domain_name'])
+                user_list = list_mgr.list_users(domain_cfg['domain_name'], max_users=self._user_fetch_limit(max_users))
                 logging.info(f"[ISyncEngine] Fetched {len(user_list)} users from directory.")
             except Exception as e:
                 logging.error(f"[ISyncEngine] Failed to fetch users: {e}")
                 self.send_notification(f"❌ Job Failed: API Error {str(e)}")
-                return
+                return "FAILED"
 
             # Filter Protected Users if Excluded
             if not self.config.get('include_protected_users', False):
@@ -517,18 +991,30 @@ class ISyncEngine:
 
             if not user_list:
                 logging.error("[ISyncEngine] User list is empty.")
-                return
+                return "FAILED"
+            self.checkpoint("listed", user_list=user_list)
 
-            count = 0
+        if strategy == 'existing':
+            if finished_done:
+                self.update_status(job_label, "None", "-", "100%", "0", is_running=False, status_msg="Success")
+                return "DONE"
+            if finished_error:
+                self.send_notification(f"⚠️ Rclone Error: `{job_label}`")
+                return "FAILED"
+            # A cycle whose rclone run finished is not repeated
+            count = resume_cycle if run_finished else max(resume_cycle - 1, 0)
             status = "START"
-            for current_user in user_list:
+            for current_user in user_list[count:]:
                 if count >= max_users: 
                     self.update_status(job_label, "None", "-", "-", "0", is_running=False, status_msg="Max Users Reached")
                     break
                 if self.stop_event.is_set(): break
                 
                 count += 1
+                self.cycle = count
                 logging.info(f"--- Cycle {count}/{max_users} (User: {current_user}) ---")
+                self.record_event("cycle", f"Cycle {count}/{max_users}", {'cycle': count, 'max_users': max_users, 'user': current_user})
+                self.checkpoint("cycle_start", user=current_user)
                 self.update_status(job_label, current_user, "0", "0%", "0", mode=mode_label, status_msg=f"Cycle {count}/{max_users}")
                 
                 try:
@@ -536,7 +1022,7 @@ class ISyncEngine:
                 except Exception as e:
                     self.complete_step("Execute Rclone Command", success=False, error=str(e))
                     self.send_notification(f"❌ Job Aborted: {str(e)}")
-                    return
+                    return "FAILED"
                 
                 if status == "DONE":
                     self.send_notification(f"✅ Job Complete: `{job_label}`")
@@ -546,28 +1032,50 @@ class ISyncEngine:
                 if status == "ERROR":
                     self.send_notification(f"⚠️ Rclone Error: `{job_label}`")
                     self.complete_step("Execute Rclone Command", success=False, error="Rclone exited with error code.")
-                    return
+                    return "FAILED"
 
         else:
             # --- STANDARD MODE (Create/Delete) ---
             protected = self.config.get('protected_users', [])
             auth_mgr = ISyncAuthManager(json_path, domain_cfg['admin_email'], protected_users=protected, company_name=self.config.get('company_name', 'Internal Ops'))
             status = "START"
-            for i in range(1, max_users + 1):
+            start = 1
+            # A temp user provisioned before the interruption is reused (or just deleted if its run finished)
+            pending_user = state.get('user') if state.get('temp_user_live') else None
+            if resume_cycle:
+                start = resume_cycle + 1 if run_finished else resume_cycle
+                if pending_user and run_finished:
+                    if not self._deprovision_user(auth_mgr, pending_user): return "FAILED"
+                    pending_user = None
+                if finished_done:
+                    self.update_status(job_label, "None", "-", "100%", "0", is_running=False, status_msg="Success")
+                    return "DONE"
+                if finished_error:
+                    self.send_notification(f"⚠️ Rclone Error: `{job_label}`")
+                    return "FAILED"
+
+            for i in range(start, max_users + 1):
                 if self.stop_event.is_set(): break
+                self.cycle = i
                 
                 logging.info(f"--- Cycle {i}/{max_users} ---")
+                self.record_event("cycle", f"Cycle {i}/{max_users}", {'cycle': i, 'max_users': max_users})
+                self.checkpoint("cycle_start", user=pending_user, temp_user_live=bool(pending_user))
                 self.update_status(job_label, "Creating User...", "0", "0%", "0", mode=mode_label, status_msg=f"Cycle {i}/{max_users}: Provisioning")
 
                 # 1. Create User
-                self.announce_step("Provision User", f"Creating temp user in {domain_cfg['domain_name']} and adding to {domain_cfg['group_email']}")
-                current_user = None
-                try:
-                    current_user = auth_mgr.provision_uploader(domain_cfg['domain_name'], domain_cfg['group_email'])
-                    self.complete_step("Provision User", success=True)
-                except Exception as e:
-                    self.complete_step("Provision User", success=False, error=str(e))
-                    return
+                current_user, pending_user = pending_user, None
+                if current_user:
+                    logging.info(f"[ISyncEngine] Reusing temp user {current_user} from the interrupted cycle.")
+                else:
+                    self.announce_step("Provision User", f"Creating temp user in {domain_cfg['domain_name']} and adding to {domain_cfg['group_email']}")
+                    try:
+                        current_user = auth_mgr.provision_uploader(domain_cfg['domain_name'], domain_cfg['group_email'])
+                        self.complete_step("Provision User", success=True)
+                    except Exception as e:
+                        self.complete_step("Provision User", success=False, error=str(e))
+                        return "FAILED"
+                    self.checkpoint("provisioned", user=current_user, temp_user_live=True)
 
                 # 2. Run Rclone
                 self.update_status(job_label, current_user, "0", "0%", "0", mode=mode_label, status_msg=f"Cycle {i}/{max_users}: Running")
@@ -575,19 +1083,12 @@ class ISyncEngine:
                     status = self.run_rclone(source, dest, json_path, current_user, job_label, dry_run=dry_run, remote_sa_json_path=domain_cfg.get('remote_sa_json_path'))
                 except Exception as e:
                     self.complete_step("Execute Rclone Command", success=False, error=str(e))
-                    # Attempt cleanup
-                    try: auth_mgr.delete_user(current_user)
-                    except: pass
-                    return
+                    # Attempt cleanup (also reached when stopped while paused on the rclone Step Check)
+                    self._deprovision_user(auth_mgr, current_user)
+                    return "STOPPED" if self.stop_event.is_set() else "FAILED"
 
                 # 3. Delete User
-                self.announce_step("Delete User", f"Deleting user {current_user}")
-                try:
-                    auth_mgr.delete_user(current_user)
-                    self.complete_step("Delete User", success=True)
-                except Exception as e:
-                    self.complete_step("Delete User", success=False, error=str(e))
-                    return
+                if not self._deprovision_user(auth_mgr, current_user): return "FAILED"
 
                 if status == "DONE":
                     self.send_notification(f"✅ Job Complete: `{job_label}`")
@@ -597,7 +1098,9 @@ class ISyncEngine:
                 if status == "ERROR":
                     self.send_notification(f"⚠️ Rclone Error: `{job_label}`")
                     self.complete_step("Execute Rclone Command", success=False, error="Rclone Error")
-                    return
+                    return "FAILED"
 
         if status != "DONE":
-             self.update_status(job_label, "None", "-", "-", "0", is_running=False, status_msg="Max Users Reached / List Exhausted")
\ No newline at end of file
+             self.update_status(job_label, "None", "-", "-", "0", is_running=False, status_msg="Max Users Reached / List Exhausted")
+        if status == "DONE": return "DONE"
+        return "STOPPED" if self.stop_event.is_set() else "EXHAUSTED"
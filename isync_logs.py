@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+def rotated_log_files(path):
+    """Returns path and its RotatingFileHandler backups, oldest first (isync.log.N ... isync.log)."""
+    folder = os.path.dirname(path) or "."
+    base = os.path.basename(path)
+    backups = []
+    if os.path.isdir(folder):
+        for name in os.listdir(folder):
+            suffix = name[len(base) + 1:]
+            if name.startswith(base + ".") and suffix.isdigit():
+                backups.append((int(suffix), os.path.join(folder, name)))
+    files = [p for _, p in sorted(backups, reverse=True)]
+    if os.path.exists(path): files.append(path)
+    return files
+
+def tail_lines(path, n=20, block_size=8192):
+    """Returns the last n lines of a file, reading only the trailing blocks it needs."""
+    if n <= 0 or not os.path.exists(path): return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        # n+1 newlines guarantees n complete lines (the file usually ends with one)
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    return [l.decode('utf-8', errors='replace') for l in data.splitlines(keepends=True)[-n:]]
+
+def filter_log_lines(path, needle, max_lines=500):
+    """
+    Streams the log and its rotations line by line and returns the newest max_lines matches
+    (case-insensitive substring). Memory stays bounded by max_lines regardless of log size.
+    """
+    needle = needle.lower()
+    matches = deque(maxlen=max_lines)
+    for log_path in rotated_log_files(path):
+        try:
+            with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    if needle in line.lower(): matches.append(line)
+        except OSError:
+            continue # Rotated away mid-read
+    return list(matches)
+
+LOG_LINE_RE = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),\d+ - (\w+) - (.*)$")
+JOB_START_RE = re.compile(r"Job Started \([^)]*\): (.+)$")
+CYCLE_RE = re.compile(r"--- Cycle (\d+)/\d+")
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+class LogIndex:
+    """
+    Sidecar SQLite index over isync.log and its rotations:
+    - Maps level, job label, cycle, user email and hour bucket to (file, byte offset)
+    - Files are identified by their first line, so rotation renames keep their entries
+    - update() only reads bytes appended since the last call; refresh() runs the first build of a process in the background
+    - search() re-checks each file's fingerprint, so lines of a file rotated or cleared since the last update are skipped
+    Job/cycle attribution follows the 'Job Started' and '--- Cycle N' markers in file order.
+    """
+    def __init__(self, log_path, index_path=None):
+        self.log_path = log_path
+        self.index_path = index_path or f"{log_path}.idx"
+        self.conn = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.built = False # Set once an update() has completed in this process
+        self.build_thread = None
+        self.build_lock = threading.Lock() # Not self.lock: that is held for the whole build
+        self.build_error = None
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS files (fingerprint TEXT PRIMARY KEY, path TEXT, offset INTEGER, job TEXT, cycle INTEGER)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS entries (fingerprint TEXT, offset INTEGER, ts REAL, bucket TEXT, level TEXT, job TEXT, cycle INTEGER, user TEXT)")
+            for col in ("level", "job, cycle", "user", "bucket", "fingerprint"):
+                name = col.replace(", ", "_")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS ix_entries_{name} ON entries ({col})")
+
+    @staticmethod
+    def _fingerprint(f):
+        first = f.readline(1024)
+        if not first.endswith(b"\n"): return None # Empty or first line still being written
+        return hashlib.sha1(first).hexdigest()
+
+    def refresh(self):
+        """
+        Brings the index up to date without blocking on a full build. Returns True when it is ready to query.
+        The first update() of a process (possibly the whole log history) runs on a background thread;
+        once it has finished, later calls update synchronously, which only reads newly appended lines.
+        """
+        if self.built:
+            self.update()
+            return True
+        with self.build_lock:
+            if self.build_thread is None or not self.build_thread.is_alive():
+                self.build_thread = threading.Thread(target=self._build, name="isync-log-index", daemon=True)
+                self.build_thread.start()
+        return False
+
+    def _build(self):
+        try:
+            self.update()
+            self.built, self.build_error = True, None
+        except Exception as e:
+            self.build_error = e
+            logging.error(f"[ISyncLogs] Log index build failed: {e}")
+
+    def update(self):
+        """Indexes new complete lines in every log file; drops entries for files rotated out."""
+        with self.lock:
+            seen = set()
+            carry = (None, None)
+            for path in rotated_log_files(self.log_path):
+                try:
+                    with open(path, 'rb') as f: fp = self._fingerprint(f)
+                    if fp is None: continue
+                    seen.add(fp)
+                    # A fresh file continues the job/cycle context of the one rotated before it
+                    carry = self._index_file(fp, path, carry)
+                except OSError:
+                    continue
+            with self.conn:
+                for (fp,) in self.conn.execute("SELECT fingerprint FROM files").fetchall():
+                    if fp not in seen:
+                        self.conn.execute("DELETE FROM entries WHERE fingerprint = ?", (fp,))
+                        self.conn.execute("DELETE FROM files WHERE fingerprint = ?", (fp,))
+
+    def _index_file(self, fp, path, carry):
+        row = self.conn.execute("SELECT offset, job, cycle FROM files WHERE fingerprint = ?", (fp,)).fetchone()
+        offset, job, cycle = row if row else (0,) + carry
+        rows = []
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"): break # Partial trailing line; picked up next time
+                line = raw.decode('utf-8', errors='replace')
+                m = LOG_LINE_RE.match(line.rstrip("\n"))
+                if m:
+                    stamp, level, msg = m.groups()
+                    jm = JOB_START_RE.search(msg)
+                    if jm: job, cycle = jm.group(1).strip(), None
+                    cm = CYCLE_RE.search(msg)
+                    if cm: cycle = int(cm.group(1))
+                    em = EMAIL_RE.search(msg)
+                    ts = time.mktime(time.strptime(stamp, "%Y-%m-%d %H:%M:%S"))
+                    rows.append((fp, offset, ts, stamp[:13], level, job, cycle, em.group(0).lower() if em else None))
+                offset += len(raw)
+        with self.conn:
+            if rows: self.conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?) ON CONFLICT(fingerprint) DO UPDATE SET path = excluded.path, offset = excluded.offset, job = excluded.job, cycle = excluded.cycle", (fp, path, offset, job, cycle))
+        return job, cycle
+
+    def search(self, level=None, job=None, cycle=None, user=None, bucket=None, text=None, limit=500):
+        """Returns the newest `limit` matching lines (oldest first), read by seeking to indexed offsets."""
+        clauses, params = [], []
+        for col, val in (("e.level", level), ("e.job", job), ("e.cycle", cycle), ("e.user", user.lower() if user else None), ("e.bucket", bucket)):
+            if val is not None and val != "":
+                clauses.append(f"{col} = ?")
+                params.append(val)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            hits = self.conn.execute(f"SELECT f.fingerprint, f.path, e.offset FROM entries e JOIN files f ON f.fingerprint = e.fingerprint {where} ORDER BY e.ts DESC, e.rowid DESC", params)
+            lines = []
+            handles = {} # path -> (current fingerprint, open file), or None if unreadable
+            try:
+                for fp, path, offset in hits:
+                    if path not in handles: handles[path] = self._open_checked(path)
+                    # Rotated, rewritten or cleared since the last update(): the offsets belong to another file now
+                    if handles[path] is None or handles[path][0] != fp: continue
+                    f = handles[path][1]
+                    f.seek(offset)
+                    line = f.readline().decode('utf-8', errors='replace')
+                    if text and text.lower() not in line.lower(): continue
+                    lines.append(line)
+                    if len(lines) >= limit: break
+            finally:
+                for h in handles.values():
+                    if h is not None: h[1].close()
+        return lines[::-1]
+
+    def _open_checked(self, path):
+        try: f = open(path, 'rb')
+        except OSError: return None
+        try: return self._fingerprint(f), f
+        except OSError:
+            f.close()
+            return None
+
+    def distinct(self, column):
+        """Distinct indexed values for a column (level/job/user/bucket), for filter pickers."""
+        if column not in ("level", "job", "user", "bucket", "cycle"): raise ValueError(column)
+        with self.lock:
+            return [r[0] for r in self.conn.execute(f"SELECT DISTINCT {column} FROM entries WHERE {column} IS NOT NULL ORDER BY {column}")]
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_log_index(log_path):
+    """Returns the process-wide LogIndex for a log file."""
+    with _indexes_lock:
+        if log_path not in _indexes: _indexes[log_path] = LogIndex(log_path)
+        return _indexes[log_path]
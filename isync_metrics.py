@@ -0,0 +1,232 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SPAN_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60, 300)
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 1800, 3600, 4 * 3600, 12 * 3600)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra: pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == float("inf"): return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=(), registry=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0: raise ValueError("Counters can only increase.")
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; each label set keeps per-bucket counts, a sum and a count."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, help_text, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None: state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self):
+        """Returns {label tuple: (bucket counts, sum, count)} (non-cumulative counts)."""
+        with self.lock:
+            return {k: (list(v[0]), v[1], v[2]) for k, v in self.values.items()}
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = 'le="' + _format_value(float(bound)) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+
+    def render(self):
+        """Current values in Prometheus text format (in-memory only)."""
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for m in metrics: lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# --- ISync Metrics ---
+BYTES_TRANSFERRED = Counter("isync_bytes_transferred_total", "Bytes transferred by rclone.")
+SPEED = Gauge("isync_speed_bytes_per_second", "Current rclone transfer speed.")
+JOB_RUNNING = Gauge("isync_job_running", "1 while a job is running.")
+RCLONE_RUNS = Counter("isync_rclone_runs_total", "Rclone runs by result.", ["result"])
+RCLONE_RESTARTS = Counter("isync_rclone_restarts_total", "Rclone launches after the first within a job.")
+STALLS = Counter("isync_stalls_total", "Stalled rclone runs by reason and phase.", ["reason", "phase"])
+STEP_DURATION = Histogram("isync_step_duration_seconds", "Duration of engine steps.", ["step", "status"], buckets=DURATION_BUCKETS)
+ADMIN_CALLS = Counter("isync_admin_sdk_calls_total", "Admin SDK (Directory API) calls by method and outcome.", ["method", "outcome"])
+ADMIN_LATENCY = Histogram("isync_admin_sdk_latency_seconds", "Admin SDK (Directory API) call latency.", ["method"])
+WEBHOOK_SENT = Counter("isync_webhook_sent_total", "Webhook notifications delivered.")
+WEBHOOK_FAILURES = Counter("isync_webhook_failures_total", "Webhook notifications given up on.")
+WEBHOOK_DROPPED = Counter("isync_webhook_dropped_total", "Webhook notifications dropped because the queue was full.")
+
+SPAN_DURATION = Histogram("isync_span_seconds", "Time spent in instrumented engine code paths.", ["span"], buckets=SPAN_BUCKETS)
+
+def observe_admin_call(method, outcome, seconds):
+    ADMIN_CALLS.inc(method=method, outcome=outcome)
+    ADMIN_LATENCY.observe(seconds, method=method)
+
+# --- Spans ---
+@contextmanager
+def span(name):
+    """Times the enclosed block into the isync_span_seconds histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_DURATION.observe(time.perf_counter() - start, span=name)
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                SPAN_DURATION.observe(time.perf_counter() - start, span=name)
+        return wrapper
+    return decorator
+
+def _quantile(buckets, counts, count, q):
+    """Upper bound of the bucket holding quantile q (histograms only know bucket edges)."""
+    target, seen = q * count, 0
+    for bound, n in zip(buckets, counts):
+        seen += n
+        if seen >= target: return bound
+    return buckets[-1]
+
+def span_summary():
+    """Per-span count, total, mean and approximate p50/p95/p99 (seconds), slowest total first."""
+    rows = []
+    for (name,), (counts, total, count) in SPAN_DURATION.snapshot().items():
+        if not count: continue
+        rows.append({
+            'span': name, 'count': count, 'total_s': total, 'mean_s': total / count,
+            'p50_s': _quantile(SPAN_DURATION.buckets, counts, count, 0.5),
+            'p95_s': _quantile(SPAN_DURATION.buckets, counts, count, 0.95),
+            'p99_s': _quantile(SPAN_DURATION.buckets, counts, count, 0.99),
+        })
+    return sorted(rows, key=lambda r: r['total_s'], reverse=True)
+
+# --- HTTP Endpoint ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes would otherwise flood stderr
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+def start_metrics_server(port, bind="127.0.0.1"):
+    """Starts the process-wide /metrics endpoint on (bind, port) once. Returns the server or None on failure."""
+    with _servers_lock:
+        server = _servers.get((bind, port))
+        if server is not None: return server
+        try:
+            server = ThreadingHTTPServer((bind, port), _MetricsHandler)
+        except OSError as e:
+            logging.error(f"[ISyncMetrics] Could not start metrics endpoint on {bind}:{port}: {e}")
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="isync-metrics", daemon=True).start()
+        _servers[(bind, port)] = server
+        logging.info(f"[ISyncMetrics] Serving metrics on http://{bind}:{server.server_address[1]}/metrics")
+        return server
@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+import time
+import requests
+from isync_metrics import WEBHOOK_SENT, WEBHOOK_FAILURES, WEBHOOK_DROPPED
+
+# Discord rejects content over 2000 chars; leave room for the prefix
+MAX_MESSAGE_CHARS = 1900
+
+class WebhookNotifier:
+    """
+    Background webhook sender (Discord/Slack):
+    - send() only enqueues, so a slow endpoint never stalls job orchestration
+    - Bursts arriving within coalesce_window are merged into one message
+    - Pooled HTTP session with timeouts; 429 honors Retry-After, 5xx/network errors back off
+    """
+    def __init__(self, url, timeout=10, max_queue=100, max_retries=5, coalesce_window=2.0):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.coalesce_window = coalesce_window
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.session = requests.Session()
+        self.sent = 0
+        self.failures = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="isync-notifier", daemon=True)
+        self.thread.start()
+
+    def send(self, message):
+        """Queues a message. Returns False if the queue is full and the message was dropped."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            WEBHOOK_DROPPED.inc()
+            logging.warning("[ISyncNotify] Notification queue full; dropping message.")
+            return False
+
+    def flush(self):
+        """Blocks until every queued message has been delivered (or given up on)."""
+        self.queue.join()
+
+    def _payload(self, text):
+        if "hooks.slack.com" in self.url:
+            return {"text": f"[ISync] {text}"}
+        # Discord format default
+        return {"content": f"**[ISync]** {text}"}
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.coalesce_window
+            while True:
+                try: batch.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty: break
+            try:
+                for text in self._chunk(batch):
+                    self._post(text)
+            finally:
+                for _ in batch: self.queue.task_done()
+
+    @staticmethod
+    def _chunk(messages):
+        """Joins messages with newlines, splitting so no chunk exceeds MAX_MESSAGE_CHARS."""
+        chunks, current = [], ""
+        for m in messages:
+            m = m[:MAX_MESSAGE_CHARS]
+            if current and len(current) + 1 + len(m) > MAX_MESSAGE_CHARS:
+                chunks.append(current)
+                current = m
+            else:
+                current = f"{current}\n{m}" if current else m
+        if current: chunks.append(current)
+        return chunks
+
+    def _post(self, text):
+        backoff = 1.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                res = self.session.post(self.url, json=self._payload(text), timeout=self.timeout)
+                if res.status_code < 300:
+                    self.sent += 1
+                    WEBHOOK_SENT.inc()
+                    return True
+                if res.status_code == 429:
+                    wait = self._retry_after(res, backoff)
+                elif res.status_code >= 500:
+                    wait = backoff
+                else:
+                    logging.warning(f"[ISyncNotify] Webhook rejected message: HTTP {res.status_code}")
+                    break
+            except requests.RequestException as e:
+                logging.debug(f"[ISyncNotify] Webhook error (attempt {attempt + 1}): {e}")
+                wait = backoff
+            if attempt < self.max_retries:
+                time.sleep(wait)
+                backoff = min(backoff * 2, 60)
+        self.failures += 1
+        WEBHOOK_FAILURES.inc()
+        logging.warning("[ISyncNotify] Giving up on webhook notification.")
+        return False
+
+    @staticmethod
+    def _retry_after(res, default):
+        """Seconds to wait on 429: Retry-After header, else Discord's JSON retry_after."""
+        header = res.headers.get("Retry-After")
+        try:
+            if header is not None: return max(0.0, float(header))
+            return max(0.0, float(res.json().get("retry_after", default)))
+        except (ValueError, AttributeError):
+            return default
+
+_notifiers = {}
+_notifiers_lock = threading.Lock()
+
+def get_notifier(url, timeout=10):
+    """Returns the process-wide notifier for a webhook URL."""
+    with _notifiers_lock:
+        notifier = _notifiers.get(url)
+        if notifier is None:
+            notifier = _notifiers[url] = WebhookNotifier(url, timeout=timeout)
+        notifier.timeout = timeout
+        return notifier
@@ -0,0 +1,107 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from isync_config import LOGS_DIR
+
+PROFILE_MODES = ("cprofile", "sample")
+
+class StackSampler:
+    """
+    Low-overhead sampling profiler:
+    - A daemon thread snapshots every thread's stack each interval via sys._current_frames()
+    - Stacks are aggregated in collapsed "frame;frame;frame count" form (flamegraph.pl / speedscope)
+    Unlike cProfile it sees all threads (reader, pollers, writers), not just the job thread.
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="isync-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self.stop_event.wait(self.interval):
+            for t in threading.enumerate(): names[t.ident] = t.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own: continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def _profile_path(label, ext):
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", label)[:60].strip("_") or "job"
+    return os.path.join(LOGS_DIR, f"profile_{time.strftime('%Y%m%d_%H%M%S')}_{safe}.{ext}")
+
+@contextmanager
+def profile_run(label, mode="cprofile"):
+    """
+    Profiles the enclosed block and writes the result to logs/:
+    - cprofile: <name>.prof (load with pstats/snakeviz) plus a <name>.txt top-50 by cumulative time
+    - sample: <name>.folded collapsed stacks from StackSampler
+    cprofile falls back to sample when another profiler is already active (a ValueError on Python >= 3.12).
+    """
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    profiler = None
+    if mode != "sample":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # e.g. a concurrent job's profile, or a debugger/coverage tool holding the profiler slot
+            logging.warning(f"[ISyncProfile] cProfile unavailable for {label} ({e}); sampling instead.")
+            profiler = None
+    if profiler is None:
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            path = _profile_path(label, "folded")
+            try:
+                sampler.dump(path)
+                logging.info(f"[ISyncProfile] Wrote {sampler.samples} samples to {path}")
+            except OSError as e:
+                logging.error(f"[ISyncProfile] Failed to write profile: {e}")
+        return
+
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = _profile_path(label, "prof")
+        try:
+            profiler.dump_stats(path)
+            buf = io.StringIO()
+            pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(50)
+            with open(path[:-len(".prof")] + ".txt", "w") as f: f.write(buf.getvalue())
+            logging.info(f"[ISyncProfile] Wrote profile to {path}")
+        except OSError as e:
+            logging.error(f"[ISyncProfile] Failed to write profile: {e}")
@@ -0,0 +1,226 @@
+import logging
+import threading
+from isync_config import load_config
+from isync_db import get_connection, db_now, get_setting, set_setting, get_job
+from isync_engine import ISyncEngine
+
+ACTIVE_STATUSES = ("QUEUED", "PAUSED", "RUNNING")
+PAUSED_SETTING = "queue_paused"
+
+# Set on enqueue/resume so the worker doesn't wait out its poll interval
+_wake = threading.Event()
+
+def enqueue(pair, dry_run=False, ssh_enabled=False, priority=0, job_id=None, max_users=None, conn=None):
+    """
+    Adds a job to the queue and returns (entry_id, added).
+    - A source -> dest pair that is already queued, paused or running is not added twice; its entry id is returned
+    - job_id links an interrupted jobs row, which the worker resumes from its checkpoint instead of starting over
+    - max_users overrides max_users_per_cycle for this entry (Manual Ops batch jobs)
+    """
+    conn = conn or get_connection()
+    with conn:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO queue (source, dest, domain_reference, dry_run, ssh_enabled, priority, status, job_id, max_users, created_at) VALUES (?, ?, ?, ?, ?, ?, 'QUEUED', ?, ?, ?)",
+            (pair['source'], pair['dest'], pair.get('domain_reference'), int(bool(dry_run)), int(bool(ssh_enabled)), int(priority), job_id, max_users, db_now())
+        )
+        if cur.rowcount:
+            entry_id, added = cur.lastrowid, True
+        else:
+            row = conn.execute(f"SELECT id FROM queue WHERE source = ? AND dest = ? AND status IN {ACTIVE_STATUSES}", (pair['source'], pair['dest'])).fetchone()
+            entry_id, added = row['id'], False
+    if added: _wake.set()
+    return entry_id, added
+
+def list_queue(finished_limit=20, conn=None):
+    """Active entries (running first, then in the order they will run) followed by the most recently finished ones."""
+    conn = conn or get_connection()
+    active = conn.execute(f"SELECT * FROM queue WHERE status IN {ACTIVE_STATUSES} ORDER BY status = 'RUNNING' DESC, priority DESC, id").fetchall()
+    finished = conn.execute(f"SELECT * FROM queue WHERE status NOT IN {ACTIVE_STATUSES} ORDER BY finished_at DESC, id DESC LIMIT ?", (finished_limit,)).fetchall()
+    return [dict(r) for r in active], [dict(r) for r in finished]
+
+def active_job_ids(conn=None):
+    """jobs row ids owned by active queue entries (the Interrupted Jobs list hides these)."""
+    conn = conn or get_connection()
+    return {r[0] for r in conn.execute(f"SELECT job_id FROM queue WHERE job_id IS NOT NULL AND status IN {ACTIVE_STATUSES}")}
+
+def _update(sql, params, conn=None):
+    conn = conn or get_connection()
+    with conn:
+        return conn.execute(sql, params).rowcount
+
+def move_entry(entry_id, delta, conn=None):
+    """
+    Swaps a waiting entry with its neighbour above (delta > 0) or below (delta < 0) in run order.
+    - The waiting entries are renumbered to distinct priorities in their new order (ties would otherwise fall back to id order)
+    - The lowest priority is kept, so new entries added at that priority still run last
+    Returns 1 if the entry moved, 0 if it is not waiting or already at that end of the queue.
+    """
+    conn = conn or get_connection()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute("SELECT id, priority FROM queue WHERE status IN ('QUEUED', 'PAUSED') ORDER BY priority DESC, id").fetchall()
+        order = [r['id'] for r in rows]
+        if entry_id not in order or not delta: return 0
+        i = order.index(entry_id)
+        j = i - 1 if delta > 0 else i + 1
+        if not 0 <= j < len(order): return 0
+        order[i], order[j] = order[j], order[i]
+        base = min(r['priority'] for r in rows)
+        conn.executemany("UPDATE queue SET priority = ? WHERE id = ?", [(base + len(order) - 1 - k, eid) for k, eid in enumerate(order)])
+    return 1
+
+def pause_entry(entry_id):
+    """Holds a queued entry; the worker skips it until resumed."""
+    return _update("UPDATE queue SET status = 'PAUSED' WHERE id = ? AND status = 'QUEUED'", (entry_id,))
+
+def resume_entry(entry_id):
+    changed = _update("UPDATE queue SET status = 'QUEUED' WHERE id = ? AND status = 'PAUSED'", (entry_id,))
+    if changed: _wake.set()
+    return changed
+
+def cancel_entry(entry_id):
+    """Cancels an entry that hasn't started (see QueueWorker.cancel for a running one)."""
+    return _update("UPDATE queue SET status = 'CANCELLED', finished_at = ? WHERE id = ? AND status IN ('QUEUED', 'PAUSED')", (db_now(), entry_id))
+
+def clear_finished():
+    """Deletes finished entries (their jobs rows and history are kept)."""
+    return _update(f"DELETE FROM queue WHERE status NOT IN {ACTIVE_STATUSES}", ())
+
+def queue_paused():
+    return get_setting(PAUSED_SETTING) == "1"
+
+def set_queue_paused(paused):
+    """Stops (or restarts) the worker from claiming new entries; a running job is not affected."""
+    set_setting(PAUSED_SETTING, "1" if paused else "0")
+    if not paused: _wake.set()
+
+def claim_next(conn=None):
+    """Atomically marks the next queued entry RUNNING and returns it (None if the queue is empty)."""
+    conn = conn or get_connection()
+    with conn:
+        # IMMEDIATE takes the write lock up front, so two processes can't claim the same entry
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM queue WHERE status = 'QUEUED' ORDER BY priority DESC, id LIMIT 1").fetchone()
+        if row is None: return None
+        conn.execute("UPDATE queue SET status = 'RUNNING', started_at = ?, error = NULL WHERE id = ?", (db_now(), row['id']))
+    return dict(row)
+
+def set_entry_job(entry_id, job_id):
+    _update("UPDATE queue SET job_id = ? WHERE id = ?", (job_id, entry_id))
+
+def finish_entry(entry_id, status, error=None):
+    _update("UPDATE queue SET status = ?, error = ?, finished_at = ? WHERE id = ?", (status, error, db_now(), entry_id))
+
+def requeue_orphans(conn=None):
+    """
+    Settles RUNNING entries left behind by a process that died:
+    - Job interrupted (or never created): back to QUEUED, so it resumes from its checkpoint
+    - Job already finished (the process died before the entry was updated): the entry takes the job's final status
+    Entries whose job is still RUNNING under a live process are left alone. Returns the number requeued.
+    """
+    conn = conn or get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE queue SET status = (SELECT status FROM jobs WHERE jobs.id = queue.job_id), finished_at = ? "
+            "WHERE status = 'RUNNING' AND job_id IN (SELECT id FROM jobs WHERE status NOT IN ('RUNNING', 'INTERRUPTED'))",
+            (db_now(),)
+        )
+        return conn.execute(
+            "UPDATE queue SET status = 'QUEUED' WHERE status = 'RUNNING' AND "
+            "(job_id IS NULL OR job_id NOT IN (SELECT id FROM jobs WHERE status = 'RUNNING'))"
+        ).rowcount
+
+class QueueWorker:
+    """
+    Single supervised consumer of the persistent queue:
+    - Runs one job at a time, highest priority first (FIFO within a priority)
+    - On start, reconciles interrupted jobs and requeues entries orphaned by a dead process; those resume from their checkpoint
+    - A job that raises is recorded as FAILED and the loop carries on; ensure_running() restarts the thread if it dies
+    """
+    def __init__(self, poll_interval=5.0):
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.thread = None
+        self.engine = None
+        self.current_entry = None
+        self.cancel_requested = False
+        self.restarts = 0
+
+    def ensure_running(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive(): return
+            if self.thread is not None:
+                self.restarts += 1
+                logging.error(f"[ISyncQueue] Worker thread died; restarting (restart #{self.restarts}).")
+            self.thread = threading.Thread(target=self._run, name="isync-queue", daemon=True)
+            self.thread.start()
+
+    def cancel(self, entry_id):
+        """Cancels an entry; if it is the running one, its engine is stopped and the entry ends CANCELLED."""
+        with self.lock:
+            if self.current_entry == entry_id and self.engine is not None:
+                self.cancel_requested = True
+                self.engine.stop()
+                return True
+        return bool(cancel_entry(entry_id))
+
+    def running(self):
+        """(entry_id, engine) of the job in progress, or (None, None)."""
+        with self.lock: return self.current_entry, self.engine
+
+    def _recover(self):
+        ISyncEngine(load_config()).reconcile_interrupted_jobs()
+        count = requeue_orphans()
+        if count: logging.warning(f"[ISyncQueue] Requeued {count} entries left running by a previous process.")
+
+    def _run(self):
+        try: self._recover()
+        except Exception as e: logging.error(f"[ISyncQueue] Recovery failed: {e}")
+        while True:
+            _wake.clear()
+            try:
+                entry = None if queue_paused() else claim_next()
+            except Exception as e:
+                logging.error(f"[ISyncQueue] Failed to read queue: {e}")
+                entry = None
+            if entry is None:
+                _wake.wait(self.poll_interval)
+                continue
+            self._execute(entry)
+
+    def _execute(self, entry):
+        pair = {'source': entry['source'], 'dest': entry['dest'], 'domain_reference': entry['domain_reference']}
+        status, error = "FAILED", None
+        try:
+            config = load_config()
+            config['ssh_enabled'] = bool(entry['ssh_enabled'])
+            if entry.get('max_users'): config['max_users_per_cycle'] = int(entry['max_users'])
+            resume_job_id = None
+            if entry['job_id'] is not None:
+                job = get_job(entry['job_id'])
+                if job and job['status'] == "INTERRUPTED" and 'pair' in job['state']: resume_job_id = job['id']
+            engine = ISyncEngine(config)
+            with self.lock:
+                self.engine, self.current_entry, self.cancel_requested = engine, entry['id'], False
+            logging.info(f"[ISyncQueue] Running entry #{entry['id']}: {pair['source']} -> {pair['dest']}" + (f" (resuming job #{resume_job_id})" if resume_job_id else ""))
+            status = engine.execute_job(pair, dry_run=bool(entry['dry_run']), resume_job_id=resume_job_id, on_job=lambda job_id: set_entry_job(entry['id'], job_id))
+        except Exception as e:
+            error = str(e)
+            logging.error(f"[ISyncQueue] Entry #{entry['id']} failed: {e}")
+        finally:
+            with self.lock:
+                if self.cancel_requested: status = "CANCELLED"
+                self.engine, self.current_entry = None, None
+            try: finish_entry(entry['id'], status, error)
+            except Exception as e: logging.error(f"[ISyncQueue] Failed to record entry #{entry['id']} result: {e}")
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_queue_worker():
+    """Returns the process-wide queue worker, (re)starting its thread if needed."""
+    global _worker
+    with _worker_lock:
+        if _worker is None: _worker = QueueWorker()
+    _worker.ensure_running()
+    return _worker
@@ -0,0 +1,159 @@
+import json
+import re
+import socket
+import time
+from collections import deque
+import requests
+
+# rclone's --use-json-log emits one JSON object per line; stats lines carry a "stats" key
+JSON_STATS_MARKER = '"stats"'
+
+def format_bytes(num, suffix="B"):
+    """Formats a byte count the way rclone does (binary units, e.g. '1.500 GiB')."""
+    num = float(num or 0)
+    for unit in ["", "Ki", "Mi", "Gi", "Ti", "Pi"]:
+        if abs(num) < 1024.0:
+            return f"{num:.3f} {unit}{suffix}" if unit else f"{int(num)} {suffix}"
+        num /= 1024.0
+    return f"{num:.3f} Ei{suffix}"
+
+SIZE_RE = re.compile(r"([0-9.]+)\s*([a-zA-Z]*)")
+SIZE_UNITS = {'': 0, 'b': 0, 'k': 1, 'm': 2, 'g': 3, 't': 4, 'p': 5, 'e': 6}
+
+def parse_size_bytes(size_str):
+    """Parses an rclone size string ('1.500 GiB', '512 B', '1.5 G') into integer bytes (binary units)."""
+    match = SIZE_RE.search(size_str or "")
+    if not match: return 0
+    try:
+        return int(float(match.group(1)) * 1024 ** SIZE_UNITS.get(match.group(2)[:1].lower(), 0))
+    except ValueError:
+        return 0
+
+def format_eta(seconds):
+    """Formats an ETA in seconds as rclone-style '1h2m3s' ('-' when unknown)."""
+    if seconds is None: return "-"
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    if h: return f"{h}h{m}m{s}s"
+    if m: return f"{m}m{s}s"
+    return f"{s}s"
+
+def parse_json_stats(line):
+    """
+    Decodes the 'stats' object from a --use-json-log line.
+    Returns None for any non-stats line (cheap prefix/substring check before json.loads).
+    """
+    if not line.startswith('{') or JSON_STATS_MARKER not in line:
+        return None
+    try:
+        stats = json.loads(line).get('stats')
+    except (ValueError, AttributeError):
+        return None
+    return stats if isinstance(stats, dict) else None
+
+def summarize_stats(stats):
+    """
+    Normalizes an rclone stats object (JSON log or rc core/stats) into the fields the engine tracks.
+    Byte counts stay exact integers.
+    """
+    bytes_done = int(stats.get('bytes') or 0)
+    total_bytes = int(stats.get('totalBytes') or 0)
+    speed = float(stats.get('speed') or 0)
+    progress = f"{int(bytes_done * 100 / total_bytes)}%" if total_bytes else "0%"
+    transferring = [
+        {
+            'name': t.get('name'),
+            'bytes': int(t.get('bytes') or 0),
+            'size': int(t.get('size') or 0),
+            'percentage': t.get('percentage', 0),
+            'speed': float(t.get('speed') or 0),
+            'eta': t.get('eta'),
+        }
+        for t in (stats.get('transferring') or [])
+    ]
+    return {
+        'bytes': bytes_done,
+        'total_bytes': total_bytes,
+        'speed_bps': speed,
+        'speed': f"{format_bytes(speed)}/s",
+        'eta': format_eta(stats.get('eta')),
+        'progress': progress,
+        'transfers': int(stats.get('transfers') or 0),
+        'checks': int(stats.get('checks') or 0),
+        'errors': int(stats.get('errors') or 0),
+        'transferring': transferring,
+    }
+
+def find_free_port(host="127.0.0.1"):
+    """Asks the OS for an unused local TCP port for rclone's remote-control server."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+class RcloneRcClient:
+    """
+    Minimal client for rclone's remote-control (rc) API:
+    - core/stats for live byte counts, speed and in-flight transfers
+    - core/transferred for completed transfers
+    auth is the (user, pass) rclone was started with (--rc-user/--rc-pass), sent as HTTP basic auth.
+    """
+    def __init__(self, addr, timeout=2, auth=None):
+        self.base_url = addr if addr.startswith("http") else f"http://{addr}"
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = auth
+
+    def call(self, method, params=None):
+        """POSTs an rc method and returns the decoded JSON response."""
+        res = self.session.post(f"{self.base_url}/{method}", json=params or {}, timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()
+
+    def stats(self):
+        return self.call("core/stats")
+
+    def transferred(self):
+        return self.call("core/transferred").get('transferred', [])
+
+    def close(self):
+        self.session.close()
+
+class ThroughputWindow:
+    """
+    Rolling-window stall detector on rclone's monotonic byte counter:
+    - Samples are (time, bytes, completed items); only the window's span is kept
+    - Completed items are finished transfers plus checks, so re-checking an already copied tree is progress
+    - Stalled when a full window has passed below min_bytes_per_sec with no item completing
+    Independent of output, so stats lines printed at 0 B/s don't count as progress.
+    """
+    def __init__(self, window_seconds, min_bytes_per_sec):
+        self.window = float(window_seconds)
+        self.min_bps = float(min_bytes_per_sec)
+        self.samples = deque()
+
+    def add(self, bytes_done, files_done=0, now=None):
+        now = time.monotonic() if now is None else now
+        self.samples.append((now, bytes_done, files_done))
+        # Keep exactly one sample at/before the window start as the baseline
+        while len(self.samples) > 1 and self.samples[1][0] <= now - self.window:
+            self.samples.popleft()
+
+    def reset(self):
+        """Drops all samples; the next full window starts from the next add()."""
+        self.samples.clear()
+
+    def rate(self, now=None):
+        """Average bytes/s across the window (0 until there are two samples)."""
+        if len(self.samples) < 2: return 0.0
+        now = time.monotonic() if now is None else now
+        t0, b0, _ = self.samples[0]
+        return max(0, self.samples[-1][1] - b0) / max(now - t0, 1e-9)
+
+    def stalled(self, now=None):
+        if self.window <= 0 or len(self.samples) < 2: return False
+        now = time.monotonic() if now is None else now
+        t0, _, f0 = self.samples[0]
+        if now - t0 < self.window: return False # Not a full window of history yet
+        if self.samples[-1][2] > f0: return False
+        return self.rate(now) < self.min_bps
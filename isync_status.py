@@ -0,0 +1,301 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+
+# Floor for re-arming the trailing timer after a failed write, so an unthrottled writer doesn't spin
+FLUSH_RETRY_SECONDS = 0.5
+
+def write_json_atomic(path, data):
+    """Writes JSON via a temp file + os.replace so readers never see a half-written file."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+class StatusWriter:
+    """
+    Coalesced status publisher:
+    - Keeps the latest status in memory
+    - Flushes to disk at most max_hz times per second
+    - A trailing timer guarantees the last update always lands (re-armed if the write fails)
+    - data may be a zero-argument callable; it is only called when a write actually happens
+    """
+    def __init__(self, path, max_hz=2):
+        self.path = path
+        self.min_interval = 1.0 / max_hz if max_hz else 0
+        self.lock = threading.Lock()
+        self.pending = None
+        self.last_flush = 0.0
+        self.timer = None
+        self.flush_count = 0
+
+    def publish(self, data, force=False):
+        """Queues a status snapshot; writes immediately only if the rate limit allows (or force)."""
+        with self.lock:
+            self.pending = data
+            wait = self.last_flush + self.min_interval - time.monotonic()
+            if force or wait <= 0:
+                self._flush_locked()
+            elif self.timer is None:
+                self.timer = threading.Timer(wait, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """Writes any pending snapshot now."""
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending is None: return
+        try:
+            write_json_atomic(self.path, self.pending() if callable(self.pending) else self.pending)
+            self.pending = None
+            self.flush_count += 1
+        except OSError as e:
+            # e.g. Windows refusing os.replace while the UI has the file open. Keep the snapshot and
+            # retry on a timer, so a final forced write isn't lost when no further publish comes.
+            logging.debug(f"[ISyncStatus] Status flush failed: {e}")
+            self.timer = threading.Timer(max(self.min_interval, FLUSH_RETRY_SECONDS), self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+        self.last_flush = time.monotonic()
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_status_writer(path, max_hz=None):
+    """
+    Returns the process-wide writer for a status file, so concurrent engines share one rate limit.
+    max_hz=None keeps an existing writer's rate (a new writer starts at 2 Hz).
+    """
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = StatusWriter(path, 2 if max_hz is None else max_hz)
+        elif max_hz is not None:
+            writer.min_interval = 1.0 / max_hz if max_hz else 0
+        return writer
+
+class StepControl:
+    """
+    In-process Continue/Abort handshake for Step Check:
+    - The engine registers the step it is paused on and blocks on a condition variable
+    - The UI delivers an action for that exact step id, waking the engine immediately
+    Nothing touches disk, so a crash mid-step leaves no stale action behind.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.waiting_step = None
+        self.action = None
+
+    def begin(self, step_id):
+        """Marks step_id as awaiting a decision (discarding any stale action)."""
+        with self.cond:
+            self.waiting_step = step_id
+            self.action = None
+
+    def send(self, action, step_id=None):
+        """Delivers CONTINUE/ABORT. Returns False if no engine is waiting on that step."""
+        with self.cond:
+            if self.waiting_step is None or (step_id is not None and step_id != self.waiting_step):
+                return False
+            self.action = action
+            self.cond.notify_all()
+            return True
+
+    def wait(self, step_id, stop_event=None):
+        """Blocks until an action arrives for step_id. Returns None if stop_event fires first."""
+        with self.cond:
+            try:
+                while self.action is None:
+                    if stop_event is not None and stop_event.is_set(): return None
+                    # Bounded wait only so a stop_event set elsewhere is still noticed
+                    self.cond.wait(timeout=1.0)
+                return self.action
+            finally:
+                if self.waiting_step == step_id:
+                    self.waiting_step = None
+                    self.action = None
+
+    def interrupt(self):
+        """Wakes any waiter so it can re-check its stop event."""
+        with self.cond:
+            self.cond.notify_all()
+
+
+class OutputBuffer:
+    """
+    Ring buffer of recent rclone output for one job:
+    - Bounded by both line count and total characters; oldest lines fall off first
+    - Every line gets a monotonically increasing cursor, so readers ask for "lines since N"
+    - read_since() costs O(new lines), not O(buffer size)
+    """
+    def __init__(self, max_lines=2000, max_chars=1024 * 1024):
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.lock = threading.Lock()
+        self.lines = deque()
+        self.chars = 0
+        self.start = 0 # Cursor of self.lines[0]
+
+    @property
+    def end(self):
+        """Cursor one past the newest line."""
+        return self.start + len(self.lines)
+
+    def append(self, line):
+        with self.lock:
+            self.lines.append(line)
+            self.chars += len(line)
+            while len(self.lines) > 1 and (len(self.lines) > self.max_lines or self.chars > self.max_chars):
+                self.chars -= len(self.lines.popleft())
+                self.start += 1
+
+    def read_since(self, cursor=0, limit=None):
+        """Returns (lines, next_cursor, skipped); skipped counts lines that fell off before they were read."""
+        with self.lock:
+            end = self.start + len(self.lines)
+            skipped = max(0, self.start - cursor)
+            count = end - max(cursor, self.start)
+            if limit is not None and count > limit:
+                skipped += count - limit
+                count = limit
+            # Walk from the newest end so cost tracks the number of new lines
+            lines = list(islice(reversed(self.lines), max(0, count)))[::-1]
+            return lines, end, skipped
+
+MAX_OUTPUT_BUFFERS = 16
+_buffers = OrderedDict()
+_buffers_lock = threading.Lock()
+
+def get_output_buffer(key, create=True):
+    """Returns the process-wide output buffer for a job (the most recent MAX_OUTPUT_BUFFERS are kept)."""
+    with _buffers_lock:
+        buf = _buffers.get(key)
+        if buf is None and create:
+            buf = _buffers[key] = OutputBuffer()
+            while len(_buffers) > MAX_OUTPUT_BUFFERS: _buffers.popitem(last=False)
+        if buf is not None: _buffers.move_to_end(key)
+        return buf
+
+def output_buffer_keys():
+    """Jobs with buffered output, most recently active first."""
+    with _buffers_lock:
+        return list(reversed(_buffers))
+
+RUNS_STATUS_FILE = "runs_status.json"
+MAX_FINISHED_RUNS = 8
+
+class RunState:
+    """
+    Everything the UI needs for one engine run (a queued job, a Manual Ops 'Run Once', ...):
+    - status: latest live stats dict (what current_status.json used to hold)
+    - step: latest Step Check status dict (what step_status.json used to hold)
+    - control: this run's own StepControl, so a Continue click can only reach this run
+    - output: this run's rclone OutputBuffer
+    """
+    def __init__(self, run_id, label, job_id=None):
+        self.run_id = run_id
+        self.label = label
+        self.job_id = job_id
+        self.status = {}
+        self.step = {}
+        self.control = StepControl()
+        self.output = get_output_buffer(run_id)
+        self.started_at = time.time()
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.finished_at is None
+
+    def snapshot(self):
+        return {
+            "run_id": self.run_id, "label": self.label, "job_id": self.job_id, "active": self.active,
+            "started_at": self.started_at, "finished_at": self.finished_at, "status": self.status, "step": self.step,
+        }
+
+class RunRegistry:
+    """
+    Per-run status store, so concurrent runs never overwrite each other:
+    - State lives in memory, keyed by run id; the last MAX_FINISHED_RUNS finished runs are kept for display
+    - A combined snapshot of every run is coalesced to RUNS_STATUS_FILE (see StatusWriter) for out-of-process readers
+    - The snapshot's flush rate is a registry setting (set_flush_hz); engines apply status_flush_hz through it
+    """
+    def __init__(self, snapshot_path=RUNS_STATUS_FILE):
+        self.lock = threading.Lock()
+        self.runs = OrderedDict()
+        self.counter = 0
+        self.writer = get_status_writer(snapshot_path)
+
+    def set_flush_hz(self, max_hz):
+        """Caps snapshot writes at max_hz per second (0 writes on every publish)."""
+        self.writer.min_interval = 1.0 / max_hz if max_hz else 0
+
+    def start_run(self, label, job_id=None):
+        with self.lock:
+            self.counter += 1
+            run = RunState(f"run-{os.getpid()}-{self.counter}", label, job_id)
+            self.runs[run.run_id] = run
+        self.publish()
+        return run
+
+    def finish_run(self, run_id):
+        with self.lock:
+            run = self.runs.get(run_id)
+            if run is None or not run.active: return
+            run.finished_at = time.time()
+            run.control.interrupt()
+            finished = [r for r in self.runs.values() if not r.active]
+            for old in finished[:-MAX_FINISHED_RUNS]: del self.runs[old.run_id]
+        self.publish(force=True)
+
+    def get_run(self, run_id):
+        with self.lock: return self.runs.get(run_id)
+
+    def list_runs(self, active_only=False):
+        """Runs newest first; active runs before finished ones."""
+        with self.lock: runs = list(self.runs.values())
+        runs.reverse()
+        if active_only: return [r for r in runs if r.active]
+        return [r for r in runs if r.active] + [r for r in runs if not r.active]
+
+    def set_status(self, run, data, force=False):
+        run.status = data
+        if data.get("job_id") is not None: run.job_id = data["job_id"]
+        self.publish(force)
+
+    def set_step(self, run, data):
+        # In-process readers see the change at once; only the snapshot file is rate-limited
+        run.step = data
+        self.publish()
+
+    def publish(self, force=False):
+        # The snapshot is built lazily, so per-line status updates cost nothing between flushes
+        self.writer.publish(self.snapshot, force=force)
+
+    def snapshot(self):
+        # Status/step dicts are replaced, never mutated, so a shallow copy per run is enough
+        with self.lock: return {"runs": [r.snapshot() for r in self.runs.values()], "timestamp": time.time()}
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_run_registry():
+    """Returns the process-wide run status store."""
+    global _registry
+    with _registry_lock:
+        if _registry is None: _registry = RunRegistry()
+        return _registry
+
+def list_active_runs():
+    """RunStates of the runs currently in progress in this process, newest first."""
+    return get_run_registry().list_runs(active_only=True)
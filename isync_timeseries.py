@@ -0,0 +1,108 @@
+import threading
+import time
+from isync_db import get_connection, get_batch_writer
+
+# Sample tiers (bucket width in seconds) and how long each is kept; None keeps forever
+TIERS = (1, 60, 3600)
+RETENTION = {1: 6 * 3600, 60: 14 * 86400, 3600: None}
+PRUNE_INTERVAL = 600
+
+UPSERT_SQL = "INSERT OR REPLACE INTO samples (job_id, tier, ts, bytes, speed, transfers) VALUES (?, ?, ?, ?, ?, ?)"
+
+class _Bucket:
+    """Running aggregate for one rollup bucket: last byte count, mean speed, peak transfers."""
+    __slots__ = ('ts', 'bytes', 'speed_sum', 'count', 'transfers')
+
+    def __init__(self, ts):
+        self.ts = ts
+        self.bytes = 0
+        self.speed_sum = 0.0
+        self.count = 0
+        self.transfers = 0
+
+    def add(self, bytes_done, speed, transfers):
+        self.bytes = bytes_done
+        self.speed_sum += speed
+        self.count += 1
+        self.transfers = max(self.transfers, transfers)
+
+    def row(self, job_id, tier):
+        return (job_id, tier, self.ts, self.bytes, self.speed_sum / max(self.count, 1), self.transfers)
+
+class SampleRecorder:
+    """
+    Per-job throughput time series in isync.db:
+    - At most one raw sample per second (the first in each second is kept; rollups see them all)
+    - 1m and 1h rollups are aggregated in memory and written when their bucket closes
+      (the open hour is refreshed once a minute so long jobs chart without gaps)
+    - Old raw/minute rows are pruned by RETENTION; all writes go through the background BatchWriter
+    - Thread-safe: the rc poller and the job's monitor loop both record into the same recorder
+    """
+    def __init__(self, job_id, writer=None):
+        self.job_id = job_id
+        self.writer = writer or get_batch_writer()
+        self.buckets = {}
+        self.last_raw = None
+        self.last_prune = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, bytes_done, speed, transfers=0, now=None):
+        now = int(time.time() if now is None else now)
+        bytes_done, speed, transfers = int(bytes_done), float(speed), int(transfers)
+        with self.lock: self._record_locked(now, bytes_done, speed, transfers)
+
+    def _record_locked(self, now, bytes_done, speed, transfers):
+        if now != self.last_raw:
+            self.last_raw = now
+            self.writer.submit(UPSERT_SQL, (self.job_id, 1, now, bytes_done, speed, transfers))
+        minute_closed = False
+        for tier in TIERS[1:]:
+            ts = now - now % tier
+            bucket = self.buckets.get(tier)
+            if bucket is not None and bucket.ts != ts:
+                self.writer.submit(UPSERT_SQL, bucket.row(self.job_id, tier))
+                if tier == 60: minute_closed = True
+                bucket = None
+            if bucket is None: bucket = self.buckets[tier] = _Bucket(ts)
+            bucket.add(bytes_done, speed, transfers)
+        if minute_closed:
+            if 3600 in self.buckets: self.writer.submit(UPSERT_SQL, self.buckets[3600].row(self.job_id, 3600))
+            if now - self.last_prune >= PRUNE_INTERVAL:
+                self.last_prune = now
+                prune_samples(now, writer=self.writer)
+
+    def close(self):
+        """Writes the open rollup buckets."""
+        with self.lock:
+            for tier, bucket in self.buckets.items():
+                self.writer.submit(UPSERT_SQL, bucket.row(self.job_id, tier))
+            self.buckets = {}
+
+def prune_samples(now=None, writer=None):
+    """Queues deletion of samples past their tier's retention."""
+    now = int(time.time() if now is None else now)
+    writer = writer or get_batch_writer()
+    for tier, keep in RETENTION.items():
+        if keep is not None: writer.submit("DELETE FROM samples WHERE tier = ? AND ts < ?", (tier, now - keep))
+
+def load_series(job_id, max_points=600, now=None, conn=None):
+    """
+    Returns up to max_points (ts, bytes, speed, transfers) rows for a job, oldest first.
+    Uses the finest tier that still covers the whole job within max_points, so cost is
+    bounded by max_points rather than job length.
+    """
+    conn = conn or get_connection()
+    now = int(time.time() if now is None else now)
+    rows = []
+    for tier in TIERS:
+        # Separate MIN/MAX so each is a single primary-key seek on (job_id, tier, ts)
+        first = conn.execute("SELECT MIN(ts) FROM samples WHERE job_id = ? AND tier = ?", (job_id, tier)).fetchone()[0]
+        if first is None: continue
+        last = conn.execute("SELECT MAX(ts) FROM samples WHERE job_id = ? AND tier = ?", (job_id, tier)).fetchone()[0]
+        keep = RETENTION[tier]
+        too_long = (last - first) / tier + 1 > max_points
+        pruned = keep is not None and first < now - keep # Start of the job may already be gone at this tier
+        if (too_long or pruned) and tier != TIERS[-1]: continue
+        rows = conn.execute("SELECT ts, bytes, speed, transfers FROM samples WHERE job_id = ? AND tier = ? ORDER BY ts DESC LIMIT ?", (job_id, tier, max_points)).fetchall()
+        break
+    return [tuple(r) for r in reversed(rows)]
@@ -17,6 +17,13 @@ from datetime import datetime
 from isync_config import load_config, save_config, load_synclist, save_synclist, resolve_sa_path, LOG_FILE_PATH, DEFAULT_CONFIG_FILE, CURRENT_CONFIG_FILE, CONFIGS_DIR
 from isync_engine import ISyncEngine
 from isync_auth import ISyncAuthManager
+from isync_status import get_run_registry
+from isync_logs import tail_lines, filter_log_lines, get_log_index
+from isync_timeseries import load_series
+from isync_metrics import span_summary
+from isync_rclone import format_bytes
+from isync_queue import get_queue_worker, enqueue, list_queue, active_job_ids, move_entry, pause_entry, resume_entry, clear_finished, queue_paused, set_queue_paused
+from isync_db import get_users, get_passwords, export_users_csv, USER_CSV_HEADERS, recent_jobs, job_events, job_transfers, jobs_with_status
 
 st.set_page_config(page_title="ISync Manager", layout="wide", initial_sidebar_state="expanded")
 
@@ -96,49 +103,84 @@ def ui_text_input_copy(label, value="", key=None, help=None, type="default", on_
     if val: st.code(val, language=None)
     return val
 
-def render_step_manager():
-    """Reads step status and renders the top-level step UI."""
-    if os.path.exists("step_status.json"):
-        try:
-            with open("step_status.json", "r") as f:
-                status = json.load(f)
-            
-            st_code = status.get('status')
-            step_name = status.get('step')
-            detail = status.get('detail')
-            err = status.get('error')
-
-            if st_code == "WAITING_USER":
-                st.warning(f"✋ **Step Check Paused**: {step_name}")
-                st.info(f"**Command Detail:**\n`{detail}`")
-                c1, c2 = st.columns(2)
-                if c1.button("✅ Continue"):
-                    with open("step_action.json", "w") as f: json.dump({"action": "CONTINUE"}, f)
-                    st.rerun()
-                if c2.button("🛑 Abort"):
-                    with open("step_action.json", "w") as f: json.dump({"action": "ABORT"}, f)
-                    st.rerun()
-            elif st_code == "RUNNING":
-                st.info(f"⏳ **Executing:** {step_name}\n\n`{detail}`")
-            elif st_code == "SUCCESS":
-                st.success(f"✅ **Step Completed Successfully:** {step_name}")
-            elif st_code == "FAILED":
-                st.error(f"❌ **Step Failed:** {step_name}\n\nError: {err}\n\n*isync has stopped.*")
-        except: pass
-
-def start_isync_thread(selected_pairs, config, is_dry_run):
-    """Starts the backend engine in a separate thread."""
-    engine = ISyncEngine(config)
-    for pair in selected_pairs:
-        engine.execute_job(pair, dry_run=is_dry_run)
-
-def get_live_status():
-    """Reads the JSON status file updated by the engine."""
-    if os.path.exists("current_status.json"):
-        try:
-            with open("current_status.json", "r") as f: return json.load(f)
-        except: return None
-    return None
+def render_step_manager(run):
+    """Renders one run's step status (and its Step Check Continue/Abort buttons)."""
+    status = run.step
+    st_code = status.get('status')
+    step_name = status.get('step')
+    detail = status.get('detail')
+    err = status.get('error')
+    prefix = f"[{run.label}] " if len(get_run_registry().list_runs(active_only=True)) > 1 else ""
+
+    if st_code == "WAITING_USER":
+        st.warning(f"✋ **{prefix}Step Check Paused**: {step_name}")
+        st.info(f"**Command Detail:**\n`{detail}`")
+        c1, c2 = st.columns(2)
+        action = None
+        if c1.button("✅ Continue", key=f"step_continue_{run.run_id}"): action = "CONTINUE"
+        if c2.button("🛑 Abort", key=f"step_abort_{run.run_id}"): action = "ABORT"
+        if action:
+            # Delivered to this run's own StepControl, so it can't be consumed by another job
+            if run.control.send(action, status.get('step_id')):
+                time.sleep(0.2) # Let the engine publish its next state before rerendering
+                st.rerun()
+            else:
+                st.warning("This run is no longer waiting on this step (it may have been stopped). Status will refresh on the next step.")
+    elif st_code == "RUNNING":
+        st.info(f"⏳ **{prefix}Executing:** {step_name}\n\n`{detail}`")
+    elif st_code == "SUCCESS":
+        st.success(f"✅ **{prefix}Step Completed Successfully:** {step_name}")
+    elif st_code == "FAILED":
+        st.error(f"❌ **{prefix}Step Failed:** {step_name}\n\nError: {err}\n\n*isync has stopped.*")
+
+def render_run(run):
+    """Live Console panel for one run: metrics, transfers, chart and its own rclone output."""
+    status = run.status
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Status", status.get("status_msg", "Starting" if run.active else "Finished"))
+    m2.metric("User", status.get("current_user", "-"))
+    m3.metric("Speed", status.get("speed", "-") if run.active else "-")
+    if status.get("total_transferred_bytes") is not None: m4.metric("Total Transferred", format_bytes(status["total_transferred_bytes"]))
+    else: m4.metric("Total Transferred", f"{status.get('total_transferred_gb', 0)} GB")
+    if run.active and status.get("is_running"): st.progress(0, text=f"Job: {status.get('job')} | {status.get('current_progress')}" + (f" | ETA {status.get('eta')}" if status.get('eta') else ""))
+    if run.active and status.get("transferring"):
+        st.dataframe(pd.DataFrame(status["transferring"])[['name', 'percentage', 'bytes', 'size', 'speed', 'eta']], hide_index=True)
+    if run.step.get('step'): st.caption(f"Step: {run.step.get('step')} ({run.step.get('status')})")
+    if run.job_id is not None: render_throughput_chart(run.job_id)
+
+    # Live rclone output: only lines past the stored cursor are fetched on each rerun
+    view = st.session_state.setdefault('rclone_out_view', {})
+    cursor, shown = view.get(run.run_id, (0, []))
+    new_lines, cursor, skipped = run.output.read_since(cursor, limit=200)
+    if skipped: new_lines = [f"... {skipped} lines skipped ..."] + new_lines
+    shown = (shown + new_lines)[-200:]
+    view[run.run_id] = (cursor, shown)
+    st.code("\n".join(shown[-50:]) or "(no output yet)", language=None)
+
+@st.cache_resource
+def run_startup_recovery():
+    """Once per process: marks jobs orphaned by a previous process as INTERRUPTED (see reconcile_interrupted_jobs)."""
+    try:
+        return ISyncEngine(load_config()).reconcile_interrupted_jobs()
+    except Exception as e:
+        return [{'error': str(e)}]
+
+def render_throughput_chart(job_id):
+    """Speed/bytes chart for one job from the downsampled time series (bounded point count)."""
+    try: series = load_series(job_id)
+    except Exception as e:
+        st.caption(f"Throughput history unavailable: {e}")
+        return
+    if not series:
+        st.caption("No throughput samples recorded for this job.")
+        return
+    df = pd.DataFrame(series, columns=['ts', 'bytes', 'speed', 'transfers'])
+    df['time'] = pd.to_datetime(df['ts'], unit='s')
+    df['Speed (MB/s)'] = df['speed'] / (1024 ** 2)
+    df['Transferred (GB)'] = df['bytes'] / (1024 ** 3)
+    ch1, ch2 = st.columns(2)
+    ch1.line_chart(df, x='time', y='Speed (MB/s)', height=200)
+    ch2.line_chart(df, x='time', y='Transferred (GB)', height=200)
 
 if 'manual_email' not in st.session_state:
     st.session_state['manual_email'] = ''
@@ -175,10 +217,18 @@ def validate_config_health(conf):
 st.markdown("<h3 style='margin: 0 0 0.5rem 0;'>🔄 ISync: Impersonate Sync</h3>", unsafe_allow_html=True)
 
 # --- STEP STATUS DISPLAY ---
-render_step_manager()
+# Every active run, plus finished runs that stopped on a failed step
+for _run in get_run_registry().list_runs():
+    if _run.active or _run.step.get('status') == "FAILED": render_step_manager(_run)
 
 config = load_config()
 
+# --- BACKGROUND SERVICES ---
+# Recovery runs once per process, before the queue worker, so requeued entries resume from their checkpoint.
+# get_queue_worker() is cheap after the first call and restarts the worker thread if it has died.
+recovered = run_startup_recovery()
+queue_worker = get_queue_worker()
+
 # --- LOAD SESSION STATE ---
 load_session_state()
 
@@ -342,12 +392,18 @@ if nav_view == "⚙️ Configuration":
                 st.session_state['cfg_users_file'] = full_conf.get('existing_users_file')
                 st.session_state['cfg_cmd_type'] = 0 if full_conf.get('rclone_command') == 'copy' else 1
                 st.session_state['cfg_stall_time'] = full_conf.get('stall_timeout_minutes')
+                st.session_state['cfg_stall_mbps'] = full_conf.get('stall_min_throughput_mbps')
+                st.session_state['cfg_stall_window'] = full_conf.get('stall_throughput_window_minutes')
                 st.session_state['cfg_webhook'] = full_conf.get('webhook_url')
                 st.session_state['global_flags_input'] = full_conf.get('global_rclone_flags')
                 st.session_state['cfg_step_check'] = full_conf.get('step_check')
                 st.session_state['cfg_chunk_size'] = full_conf.get('rclone_chunk_size')
                 st.session_state['cfg_stats_int'] = full_conf.get('rclone_stats_interval')
                 st.session_state['cfg_verbose'] = full_conf.get('rclone_verbose')
+                st.session_state['cfg_stats_mode'] = full_conf.get('rclone_stats_mode', 'text')
+                st.session_state['cfg_echo_stdout'] = full_conf.get('rclone_echo_stdout', False)
+                st.session_state['cfg_metrics_port'] = full_conf.get('metrics_port', 0)
+                st.session_state['cfg_profile_jobs'] = full_conf.get('profile_jobs') or ""
                 st.session_state['ssh_host_input'] = full_conf.get('ssh_host')
                 st.session_state['ssh_user_input'] = full_conf.get('ssh_user')
                 st.session_state['ssh_key_input'] = full_conf.get('ssh_key_path')
@@ -395,12 +451,18 @@ if nav_view == "⚙️ Configuration":
                 full_save['existing_users_file'] = get_val('cfg_users_file', 'existing_users_file', 'users.txt')
                 full_save['rclone_command'] = 'sync' if st.session_state.get('cfg_cmd_type', 0) == 1 else 'copy'
                 full_save['stall_timeout_minutes'] = get_val('cfg_stall_time', 'stall_timeout_minutes', 10)
+                full_save['stall_min_throughput_mbps'] = get_val('cfg_stall_mbps', 'stall_min_throughput_mbps', 0.1)
+                full_save['stall_throughput_window_minutes'] = get_val('cfg_stall_window', 'stall_throughput_window_minutes', 10)
                 full_save['webhook_url'] = get_val('cfg_webhook', 'webhook_url', '')
                 full_save['global_rclone_flags'] = get_val('global_flags_input', 'global_rclone_flags', '')
                 full_save['step_check'] = get_val('cfg_step_check', 'step_check', False)
                 full_save['rclone_chunk_size'] = get_val('cfg_chunk_size', 'rclone_chunk_size', '128M')
                 full_save['rclone_stats_interval'] = get_val('cfg_stats_int', 'rclone_stats_interval', '1s')
                 full_save['rclone_verbose'] = get_val('cfg_verbose', 'rclone_verbose', True)
+                full_save['rclone_stats_mode'] = get_val('cfg_stats_mode', 'rclone_stats_mode', 'text')
+                full_save['rclone_echo_stdout'] = get_val('cfg_echo_stdout', 'rclone_echo_stdout', False)
+                full_save['metrics_port'] = get_val('cfg_metrics_port', 'metrics_port', 0)
+                full_save['profile_jobs'] = get_val('cfg_profile_jobs', 'profile_jobs', '')
                 full_save['ssh_host'] = get_val('ssh_host_input', 'ssh_host', '')
                 full_save['ssh_user'] = get_val('ssh_user_input', 'ssh_user', '')
                 full_save['ssh_key_path'] = get_val('ssh_key_input', 'ssh_key_path', '')
@@ -451,6 +513,10 @@ if nav_view == "⚙️ Configuration":
         c4, c5 = st.columns(2)
         cmd_type = c4.selectbox("Rclone Command *", ["copy", "sync"], index=0 if config.get('rclone_command', 'copy') == 'copy' else 1, key="cfg_cmd_type", on_change=save_session_state, help="'copy' adds files; 'sync' makes dest identical to source (deletes files!).")
         stall_time = c5.number_input("Stall Timeout (Mins) *", value=int(config.get('stall_timeout_minutes', 10)), key="cfg_stall_time", on_change=save_session_state, help="Restart rclone if no output is received for this many minutes.")
+
+        c5a, c5b = st.columns(2)
+        stall_mbps = c5a.number_input("Min Throughput (MB/s)", value=float(config.get('stall_min_throughput_mbps', 0.1)), min_value=0.0, step=0.1, key="cfg_stall_mbps", on_change=save_session_state, help="Restart rclone if it averages below this speed for the whole window below without completing a file.")
+        stall_window = c5b.number_input("Throughput Window (Mins)", value=int(config.get('stall_throughput_window_minutes', 10)), min_value=0, key="cfg_stall_window", on_change=save_session_state, help="Length of the throughput window. 0 disables throughput-based stall detection.")
         
         c6, c7 = st.columns(2)
         with c6:
@@ -467,6 +533,12 @@ if nav_view == "⚙️ Configuration":
         with c_adv2:
             stats_int = ui_text_input_copy("Stats Interval", value=config.get('rclone_stats_interval', '1s'), key="cfg_stats_int", help="Rclone --stats frequency (e.g. 1s, 5s).")
         verbose_log = c_adv3.checkbox("Verbose Logging", value=config.get('rclone_verbose', True), key="cfg_verbose", on_change=save_session_state, help="Enable --verbose flag for detailed logs.")
+        stats_modes = ["text", "json", "rc"]
+        stats_mode = st.selectbox("Stats Source", stats_modes, index=stats_modes.index(config.get('rclone_stats_mode', 'text')) if config.get('rclone_stats_mode', 'text') in stats_modes else 0, key="cfg_stats_mode", on_change=save_session_state, help="'text' scrapes rclone's stats lines; 'json' runs rclone with --use-json-log and decodes exact byte counts, speed and ETA; 'rc' starts rclone's local remote-control server and polls core/stats (local runs only).")
+        echo_stdout = st.checkbox("Echo Rclone Output to Console", value=config.get('rclone_echo_stdout', False), key="cfg_echo_stdout", on_change=save_session_state, help="Also print every rclone line to the terminal running ISync. Output is always available in the Live Console.")
+        metrics_port = st.number_input("Metrics Port (0 = Off)", value=int(config.get('metrics_port', 0) or 0), min_value=0, max_value=65535, key="cfg_metrics_port", on_change=save_session_state, help=f"Serve Prometheus metrics at http://{config.get('metrics_bind', '127.0.0.1')}:<port>/metrics while jobs run.")
+        profile_modes = ["", "cprofile", "sample"]
+        profile_jobs = st.selectbox("Profile Jobs", profile_modes, index=profile_modes.index(config.get('profile_jobs') or "") if (config.get('profile_jobs') or "") in profile_modes else 0, format_func=lambda m: m or "Off", key="cfg_profile_jobs", on_change=save_session_state, help="Profile each job run and write the result to logs/. 'cprofile' traces the job thread (.prof + .txt summary); 'sample' samples all threads with low overhead (.folded stacks for flame graphs).")
 
         st.subheader("Remote Execution (SSH)")
         st.caption(f"SSH Mode is currently: **{'ENABLED' if ssh_enabled else 'DISABLED'}** (Toggle in Sidebar)")
@@ -538,7 +610,8 @@ if nav_view == "⚙️ Configuration":
                 'company_name': company_name,
                 'rotation_strategy': config.get('rotation_strategy'), 'existing_users_file': users_file,
                 'rclone_command': cmd_type, 'stall_timeout_minutes': stall_time,
-                'rclone_chunk_size': chunk_size, 'rclone_stats_interval': stats_int, 'rclone_verbose': verbose_log,
+                'stall_min_throughput_mbps': stall_mbps, 'stall_throughput_window_minutes': stall_window,
+                'rclone_chunk_size': chunk_size, 'rclone_stats_interval': stats_int, 'rclone_verbose': verbose_log, 'rclone_stats_mode': stats_mode, 'rclone_echo_stdout': echo_stdout, 'metrics_port': metrics_port, 'profile_jobs': profile_jobs,
                 'webhook_url': webhook, 'global_rclone_flags': flags,
                 'step_check': step_check,
                 'ssh_enabled': ssh_enabled, 'ssh_host': ssh_host, 'ssh_user': ssh_user, 'ssh_key_path': ssh_key, 'ssh_remote_path': ssh_remote_path, 'ssh_connect_timeout': ssh_timeout,
@@ -703,6 +776,32 @@ if nav_view == "⚙️ Configuration":
 # --- TAB 2: JOBS ---
 elif nav_view == "📂 Sync Jobs":
     st.header("Job Manager")
+    if recovered and 'error' in recovered[0]: st.warning(f"Startup recovery failed: {recovered[0]['error']}")
+    try:
+        owned = active_job_ids()
+        interrupted = [j for j in jobs_with_status(("INTERRUPTED",)) if j['id'] not in owned]
+    except Exception as e:
+        interrupted = []
+        st.error(f"Failed to read interrupted jobs: {e}")
+    if interrupted:
+        st.write("### ⚠️ Interrupted Jobs")
+        st.caption("These jobs were running when ISync last stopped. Resume continues from the last checkpoint (saved user list, current cycle, live temp user) instead of starting over.")
+        for job in interrupted:
+            state = job['state']
+            label = f"**#{job['id']}** {job['source']} ➡️ {job['dest']} _(cycle {job['cycle'] or 0}, {job['step'] or 'not started'}, {format_bytes(state.get('bytes', 0))})_"
+            if state.get('detached_alive'): label += " — rclone is still running in tmux session `" + state['tmux_session'] + "`; Resume waits for it."
+            c_lbl, c_res, c_dis = st.columns([6, 1, 1])
+            c_lbl.markdown(label)
+            if c_res.button("▶️ Resume", key=f"resume_{job['id']}", disabled='pair' not in state):
+                _, added = enqueue(state['pair'], dry_run=state.get('dry_run', False), ssh_enabled=state.get('ssh_enabled', False), job_id=job['id'])
+                if added: st.rerun()
+                else: st.warning("This source -> destination pair is already in the queue.")
+            if c_dis.button("🗑️ Discard", key=f"discard_{job['id']}", help="Deletes the job's live temp user (if any) and marks it ABANDONED."):
+                try:
+                    ISyncEngine(config).discard_interrupted_job(job)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Not discarded: failed to delete temp user {state.get('user')}: {e}")
     sync_pairs = load_synclist()
     with st.expander("➕ Add Job", expanded=False):
         with st.form("add_pair_form"):
@@ -719,39 +818,83 @@ elif nav_view == "📂 Sync Jobs":
                     st.rerun()
 
     if sync_pairs:
-        st.write("### Queue")
-        c_opt1, c_opt2 = st.columns(2)
+        st.write("### Launch")
+        c_opt1, c_opt2, c_opt3 = st.columns(3)
         is_dry_run = c_opt1.checkbox("🧪 Test Mode (Dry Run)", help="Simulate run without copying files")
         use_ssh = c_opt2.checkbox("Run via SSH", value=config.get('ssh_enabled', False), help="Execute rclone on the configured SSH host.")
+        q_priority = c_opt3.number_input("Priority", value=0, step=1, help="Higher priorities run first; equal priorities run in the order added.")
         with st.form("job_runner"):
             selected_indices = []
             for idx, row in enumerate(sync_pairs):
                 label = f"**{row['source']}** ➡️ **{row['dest']}** _({row['domain_reference']})_"
                 if st.checkbox(label, value=False, key=f"pair_{idx}"): selected_indices.append(idx)
             
-            if st.form_submit_button("🚀 Launch ISync"):
+            if st.form_submit_button("🚀 Add to Queue"):
                 if selected_indices:
-                    selected_jobs = [sync_pairs[i] for i in selected_indices]
-                    run_config = config.copy()
-                    run_config['ssh_enabled'] = use_ssh
-                    t = threading.Thread(target=start_isync_thread, args=(selected_jobs, run_config, is_dry_run))
-                    t.start()
-                    st.success("Started! Check Live Console.")
+                    added = 0
+                    for i in selected_indices:
+                        _, is_new = enqueue(sync_pairs[i], dry_run=is_dry_run, ssh_enabled=use_ssh, priority=q_priority)
+                        added += is_new
+                    skipped = len(selected_indices) - added
+                    st.success(f"Queued {added} job(s)." + (f" {skipped} already queued or running." if skipped else "") + " Check Live Console.")
+
+    # Persistent queue in isync.db, consumed one job at a time by the queue worker thread
+    st.write("### Job Queue")
+    try:
+        active_q, finished_q = list_queue()
+        is_paused = queue_paused()
+    except Exception as e:
+        active_q, finished_q, is_paused = [], [], False
+        st.error(f"Failed to read the queue: {e}")
+    qc1, qc2, qc3 = st.columns([2, 1, 1])
+    qc1.caption(("⏸️ Queue paused — the running job continues, nothing new starts." if is_paused else "▶️ Queue active.") + (f" Worker restarted {queue_worker.restarts}x." if queue_worker.restarts else ""))
+    if qc2.button("▶️ Resume Queue" if is_paused else "⏸️ Pause Queue"):
+        set_queue_paused(not is_paused)
+        st.rerun()
+    if qc3.button("🧹 Clear Finished", disabled=not finished_q):
+        clear_finished()
+        st.rerun()
+    if active_q:
+        for entry in active_q:
+            eid = entry['id']
+            flags = ", ".join(f for f, on in (("dry run", entry['dry_run']), ("ssh", entry['ssh_enabled']), (f"job #{entry['job_id']}", entry['job_id'])) if on)
+            c_lbl, c_up, c_down, c_pause, c_cancel = st.columns([6, 1, 1, 1, 1])
+            c_lbl.markdown(f"**{entry['status']}** · #{eid} {entry['source']} ➡️ {entry['dest']} _(priority {entry['priority']}{', ' + flags if flags else ''})_")
+            is_running = entry['status'] == "RUNNING"
+            if c_up.button("⬆️", key=f"q_up_{eid}", disabled=is_running):
+                move_entry(eid, 1)
+                st.rerun()
+            if c_down.button("⬇️", key=f"q_down_{eid}", disabled=is_running):
+                move_entry(eid, -1)
+                st.rerun()
+            if entry['status'] == "PAUSED":
+                if c_pause.button("▶️", key=f"q_resume_{eid}"):
+                    resume_entry(eid)
+                    st.rerun()
+            elif c_pause.button("⏸️", key=f"q_pause_{eid}", disabled=is_running):
+                pause_entry(eid)
+                st.rerun()
+            if c_cancel.button("✖️", key=f"q_cancel_{eid}", help="Cancel (stops the job if it is running)"):
+                queue_worker.cancel(eid)
+                st.rerun()
+    else:
+        st.info("Queue is empty.")
+    if finished_q:
+        with st.expander(f"Finished ({len(finished_q)})", expanded=False):
+            st.dataframe(pd.DataFrame(finished_q)[['id', 'status', 'source', 'dest', 'priority', 'job_id', 'error', 'started_at', 'finished_at']], hide_index=True)
 
 # --- TAB 3: MONITOR ---
 elif nav_view == "📺 Live Console":
     st.header("Live Monitor")
     if st.button("Refresh"): st.rerun()
-    status = get_live_status()
-    m1, m2, m3, m4 = st.columns(4)
-    if status:
-        m1.metric("Status", status.get("status_msg", "Idle"))
-        m2.metric("User", status.get("current_user", "-"))
-        m3.metric("Speed", status.get("speed", "-"))
-        m4.metric("Total Transferred", f"{status.get('total_transferred_gb', 0)} GB")
-        if status.get("is_running"): st.progress(0, text=f"Job: {status.get('job')} | {status.get('current_progress')}")
-    else: st.info("No active job status.")
-    
+    # One panel per run (queued job, Manual Ops run, ...); each has its own status, steps and output
+    runs = get_run_registry().list_runs()
+    if not runs: st.info("No active job status.")
+    for run in runs:
+        state_lbl = "🟢 Running" if run.active else "⚪ Finished"
+        with st.expander(f"{state_lbl} · {run.label}" + (f" · job #{run.job_id}" if run.job_id is not None else ""), expanded=run.active):
+            render_run(run)
+
     st.divider()
     st.subheader("Log")
     
@@ -762,16 +905,66 @@ elif nav_view == "📺 Live Console":
 
     log_filter = lc2.text_input("Filter Log", help="Show only lines containing this text.")
 
+    # Indexed filters: the first build runs in the background, then the index is updated incrementally on each rerun
+    log_index = get_log_index(LOG_FILE_PATH)
+    index_ready = False
+    try: index_ready = log_index.refresh()
+    except Exception as e: st.caption(f"Log index unavailable: {e}")
+    if log_index.build_error is not None: st.caption(f"Log index unavailable: {log_index.build_error}")
+    elif not index_ready: st.caption("⏳ Indexing the log in the background; the Level/Job/Cycle/User filters will be available shortly.")
+    lf1, lf2, lf3, lf4 = st.columns([1, 3, 1, 2])
+    f_level = lf1.selectbox("Level", [""] + (log_index.distinct("level") if index_ready else []), key="log_f_level", disabled=not index_ready)
+    f_job = lf2.selectbox("Job", [""] + (log_index.distinct("job") if index_ready else []), key="log_f_job", disabled=not index_ready)
+    f_cycle = lf3.selectbox("Cycle", [""] + (log_index.distinct("cycle") if index_ready else []), key="log_f_cycle", disabled=not index_ready)
+    f_user = lf4.selectbox("User", [""] + (log_index.distinct("user") if index_ready else []), key="log_f_user", disabled=not index_ready)
+
     if os.path.exists(LOG_FILE_PATH):
-        with open(LOG_FILE_PATH, "r") as f: lines = f.readlines()
-        
-        if log_filter:
-            lines = [l for l in lines if log_filter.lower() in l.lower()]
+        if f_level or f_job or f_cycle or f_user:
+            # Seeks straight to the indexed lines; the text filter narrows them further
+            lines = log_index.search(level=f_level or None, job=f_job or None, cycle=f_cycle or None, user=f_user or None, text=log_filter or None, limit=500)
+        elif log_filter:
+            # Streams isync.log and its rotations; keeps only the newest matches
+            lines = filter_log_lines(LOG_FILE_PATH, log_filter, max_lines=500)
         else:
-            lines = lines[-20:]
+            lines = tail_lines(LOG_FILE_PATH, 20)
             
         st.text_area("Output", "".join(lines), height=300)
 
+    st.divider()
+    with st.expander("⏱️ Performance", expanded=False):
+        st.caption("Time spent in instrumented code paths since ISync started (p50/p95/p99 are histogram bucket upper bounds).")
+        perf = span_summary()
+        if perf:
+            perf_df = pd.DataFrame(perf)
+            for col in ['total_s', 'mean_s', 'p50_s', 'p95_s', 'p99_s']:
+                perf_df[col.replace('_s', '_ms')] = perf_df.pop(col) * 1000
+            st.dataframe(perf_df, hide_index=True)
+        else:
+            st.info("No timings recorded yet.")
+
+    with st.expander("📜 Job History", expanded=False):
+        try:
+            jobs = recent_jobs(50)
+        except Exception as e:
+            jobs = []
+            st.error(f"Failed to read job history: {e}")
+        if jobs:
+            st.dataframe(pd.DataFrame(jobs), hide_index=True)
+            job_opts = {f"#{j['id']} {j['source']} -> {j['dest']} ({j['status']})": j['id'] for j in jobs}
+            sel_job = st.selectbox("Job Events", list(job_opts.keys()))
+            render_throughput_chart(job_opts[sel_job])
+            transfers = job_transfers(job_opts[sel_job])
+            if transfers:
+                st.caption(f"Transfer ledger: {format_bytes(sum(t['bytes'] for t in transfers))} in {len(transfers)} run(s)")
+                st.dataframe(pd.DataFrame(transfers)[['cycle', 'user', 'result', 'exit_code', 'bytes', 'files', 'started_at', 'finished_at']], hide_index=True)
+            events = job_events(job_opts[sel_job])
+            if events:
+                st.dataframe(pd.DataFrame(events)[['timestamp', 'level', 'event', 'message']], hide_index=True)
+            else:
+                st.info("No structured events recorded for this job.")
+        else:
+            st.info("No jobs recorded yet.")
+
 # --- TAB 4: MANUAL OPS ---
 elif nav_view == "🛠️ Manual Ops":
     st.header("Manual Operations")
@@ -1139,13 +1332,10 @@ elif nav_view == "🛠️ Manual Ops":
                 if to_login:
                     # Load passwords
                     pass_map = {}
-                    if os.path.exists("user_db.csv"):
-                        try:
-                            df = pd.read_csv("user_db.csv")
-                            # Create dict of Email -> Password (last entry wins)
-                            pass_map = dict(zip(df['Email'], df['Password']))
-                        except Exception as e:
-                            st.error(f"Failed to load password DB: {e}")
+                    try:
+                        pass_map = get_passwords(to_login)
+                    except Exception as e:
+                        st.error(f"Failed to load password DB: {e}")
 
                     st.info(f"Opening browser for {len(to_login)} users...")
                     
@@ -1213,46 +1403,27 @@ elif nav_view == "🛠️ Manual Ops":
                         to_view.append(u)
                 
                 if to_view:
-                    if os.path.exists("user_db.csv"):
-                        try:
-                            # Robust CSV reading
-                            all_cols = [
-                                "Timestamp", "Email", "Password", "Google_ID", "ETag", "Is_Admin", 
-                                "Org_Unit", "Recovery_Email", "Status", "Suspended", 
-                                "First_Name", "Last_Name", "Recovery_Phone", "Address", "Job_Title", "Department",
-                                "External_ID", "Notes"
-                            ]
-                            data_rows = []
-                            with open("user_db.csv", "r", encoding="utf-8") as f:
-                                reader = csv.reader(f)
-                                for row in reader:
-                                    if not row: continue
-                                    if row[0] == "Timestamp": continue 
-                                    if len(row) < len(all_cols):
-                                        row += [""] * (len(all_cols) - len(row))
-                                    data_rows.append(row[:len(all_cols)])
-                            
-                            df = pd.DataFrame(data_rows, columns=all_cols)
-                            subset = df[df['Email'].isin(to_view)]
-                            
-                            if not subset.empty:
-                                # Column Selector
-                                sel_cols = st.multiselect("Select Columns to View/Copy", all_cols, default=all_cols)
-                                if sel_cols:
-                                    final_df = subset[sel_cols]
-                                    st.dataframe(final_df)
-                                    
-                                    st.caption("Copy Data (CSV):")
-                                    csv_txt = final_df.to_csv(index=False)
-                                    st.code(csv_txt, language="csv")
-                                else:
-                                    st.warning("Select at least one column.")
+                    try:
+                        all_cols = USER_CSV_HEADERS
+                        subset = pd.DataFrame(get_users(to_view), columns=all_cols)
+                        
+                        if not subset.empty:
+                            # Column Selector
+                            sel_cols = st.multiselect("Select Columns to View/Copy", all_cols, default=all_cols)
+                            if sel_cols:
+                                final_df = subset[sel_cols]
+                                st.dataframe(final_df)
+                                
+                                st.caption("Copy Data (CSV):")
+                                csv_txt = final_df.to_csv(index=False)
+                                st.code(csv_txt, language="csv")
                             else:
-                                st.warning("Selected users not found in local database.")
-                        except Exception as e:
-                            st.error(f"Error reading DB: {e}")
-                    else:
-                        st.warning("No user database found.")
+                                st.warning("Select at least one column.")
+                        else:
+                            st.warning("Selected users not found in local database.")
+                    except Exception as e:
+                        st.error(f"Error reading DB: {e}")
+                    st.download_button("📄 Export user_db.csv", data=export_users_csv(), file_name="user_db.csv", mime="text/csv", help="All user records in the legacy user_db.csv layout.")
                 else:
                     st.warning("No users selected.")
             if st.button("Close Details Panel"):
@@ -1372,13 +1543,11 @@ elif nav_view == "🛠️ Manual Ops":
         
         if c_batch_run.button("🚀 Start Batch Job"):
             if b_src and b_dst and selected_dom:
-                batch_conf = config.copy()
-                batch_conf['max_users_per_cycle'] = st.session_state.shared_max_users
                 pair = {'source': b_src, 'dest': b_dst, 'domain_reference': selected_dom}
-                eng = ISyncEngine(batch_conf)
-                t = threading.Thread(target=eng.execute_job, args=(pair, b_dry))
-                t.start()
-                st.success(f"Batch Job Started! (N={st.session_state.shared_max_users}, Mode={config.get('rotation_strategy')})")
+                # Through the queue like any other job: deduped against queued/running pairs, run by the single worker
+                entry_id, added = enqueue(pair, dry_run=b_dry, ssh_enabled=config.get('ssh_enabled', False), max_users=st.session_state.shared_max_users)
+                if added: st.success(f"Batch Job Queued as #{entry_id}! (N={st.session_state.shared_max_users}, Mode={config.get('rotation_strategy')})")
+                else: st.warning(f"This source -> destination pair is already queued or running (entry #{entry_id}).")
             else:
                 st.error("Missing Source, Destination, or Domain Context.")
 
@@ -1399,7 +1568,9 @@ elif nav_view == "🛠️ Manual Ops":
                         admin = sel_conf.get('admin_email', '')
                         mgr = ISyncAuthManager(sa_path, admin)
                         with st.spinner("Fetching users from directory..."):
-                            raw_users = mgr.list_users(sel_conf['domain_name'])
+                            fetch_limit = st.session_state.shared_max_users
+                            if not config.get('include_protected_users'): fetch_limit += len(config.get('protected_users', []))
+                            raw_users = mgr.list_users(sel_conf['domain_name'], max_users=fetch_limit)
                         
                         if not config.get('include_protected_users'):
                             protected_set = set(u.lower() for u in config.get('protected_users', []))
@@ -0,0 +1,29 @@
+import os
+import stat
+import sys
+import tempfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "bench"))
+
+# The isync modules resolve isync.db, logs/ and runs_status.json against the working directory;
+# run the suite in a scratch directory so it never touches the checkout's state.
+os.chdir(tempfile.mkdtemp(prefix="isync-tests-"))
+
+@pytest.fixture
+def fake_rclone(tmp_path, monkeypatch):
+    """Puts bench/fake_rclone.py on PATH as `rclone`; returns a setter for its FAKE_RCLONE_* variables."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "rclone"
+    script.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(REPO_DIR, "bench", "fake_rclone.py")}" "$@"\n')
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    for name in ("LINES", "RATE", "VERBOSE", "BYTES", "EXIT", "HANG", "REPLAY", "STAMP"): monkeypatch.delenv(f"FAKE_RCLONE_{name}", raising=False)
+
+    def configure(**env):
+        for name, value in env.items(): monkeypatch.setenv(f"FAKE_RCLONE_{name.upper()}", str(value))
+    return configure
@@ -0,0 +1,67 @@
+import pytest
+from googleapiclient.errors import HttpError
+
+from fake_admin_sdk import FakeAdminSDK
+from isync_auth import BATCH_LIMIT, ISyncAuthManager, batch_get_users, get_directory_service, set_directory_endpoint
+
+DOMAIN = "x.com"
+FORBIDDEN = f"user000003@{DOMAIN}"
+BROKEN = f"user000004@{DOMAIN}"
+MISSING = f"nobody@{DOMAIN}"
+
+@pytest.fixture
+def sdk():
+    sdk = FakeAdminSDK(domain=DOMAIN, users=BATCH_LIMIT + 200, user_errors={FORBIDDEN: 403, BROKEN: 503}).start()
+    set_directory_endpoint(sdk.url)
+    yield sdk
+    set_directory_endpoint(None)
+    sdk.stop()
+
+def directory_service():
+    # A custom endpoint uses anonymous credentials, so the key file doesn't need to exist
+    return get_directory_service("unused.json", f"admin@{DOMAIN}")
+
+def test_per_item_errors(sdk):
+    ok = f"user000001@{DOMAIN}"
+    results = batch_get_users(directory_service(), [ok, MISSING, FORBIDDEN, BROKEN], fields="primaryEmail,suspended")
+    assert (results[ok]["primaryEmail"], results[ok]["suspended"]) == (ok, False)
+    # Each failed item carries its own HttpError; the other items in the batch are unaffected
+    statuses = {key: results[key].resp.status for key in (MISSING, FORBIDDEN, BROKEN)}
+    assert statuses == {MISSING: 404, FORBIDDEN: 403, BROKEN: 503}
+    assert all(isinstance(results[key], HttpError) for key in statuses)
+    assert sdk.directory.http_requests == 1
+
+def test_splits_at_batch_limit(sdk):
+    keys = sdk.directory.emails[:BATCH_LIMIT + 1]
+    sdk.directory.reset_counters()
+    results = batch_get_users(directory_service(), keys, fields="primaryEmail")
+    assert sdk.directory.http_requests == 2
+    assert sdk.directory.calls["users.get"] == BATCH_LIMIT + 1
+    assert set(results) == set(keys)
+    errors = {k for k, v in results.items() if isinstance(v, Exception)}
+    assert errors == {FORBIDDEN, BROKEN}
+    assert all(results[k]["primaryEmail"] == k for k in set(keys) - errors)
+
+@pytest.mark.parametrize("batch_size, requests", [(400, 3), (BATCH_LIMIT * 5, 2), (0, 7)])
+def test_batch_size_is_clamped(sdk, batch_size, requests):
+    keys = sdk.directory.emails[:BATCH_LIMIT + 1] if batch_size else sdk.directory.emails[:7]
+    sdk.directory.reset_counters()
+    results = batch_get_users(directory_service(), keys, fields="primaryEmail", batch_size=batch_size)
+    assert sdk.directory.http_requests == requests
+    assert len(results) == len(keys)
+
+def test_whole_batch_failure_is_attributed_to_every_user(sdk):
+    service = directory_service()
+    sdk.stop()
+    keys = [f"user000001@{DOMAIN}", f"user000002@{DOMAIN}"]
+    results = batch_get_users(service, keys)
+    assert set(results) == set(keys)
+    assert all(isinstance(v, Exception) and not isinstance(v, HttpError) for v in results.values())
+
+@pytest.mark.parametrize("use_cache", [True, False])
+@pytest.mark.parametrize("max_users", [0, -3])
+def test_list_users_with_no_budget_fetches_nothing(sdk, max_users, use_cache):
+    sdk.directory.reset_counters()
+    manager = ISyncAuthManager("unused.json", f"admin@{DOMAIN}")
+    assert manager.list_users(DOMAIN, max_users=max_users, use_cache=use_cache) == []
+    assert sdk.directory.calls.get("users.list", 0) == 0
@@ -0,0 +1,48 @@
+import os
+import time
+
+from isync_logs import LogIndex
+
+def log_line(i, msg):
+    return f"2024-05-02 10:{i // 60:02d}:{i % 60:02d},000 - INFO - {msg}\n"
+
+def write_log(path, start, count, user):
+    with open(path, "a") as f:
+        for i in range(start, start + count): f.write(log_line(i, f"[ISyncEngine] Copying for {user} ({i})"))
+
+def wait_ready(index, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not index.refresh():
+        assert time.monotonic() < deadline, "log index build did not finish"
+        time.sleep(0.02)
+
+def test_first_build_runs_in_background(tmp_path):
+    log = str(tmp_path / "isync.log")
+    write_log(log, 0, 50, "a@x.com")
+    index = LogIndex(log)
+    assert index.refresh() is False # Build started; the caller isn't blocked on it
+    wait_ready(index)
+    assert index.build_thread is not None and not index.build_thread.is_alive()
+    assert len(index.search(user="a@x.com")) == 50
+    # Once built, refresh() updates in place
+    write_log(log, 50, 5, "b@x.com")
+    assert index.refresh() is True
+    assert len(index.search(user="b@x.com")) == 5
+
+def test_search_skips_files_changed_since_update(tmp_path):
+    log = str(tmp_path / "isync.log")
+    write_log(log, 0, 10, "a@x.com")
+    index = LogIndex(log)
+    wait_ready(index)
+    assert len(index.search(user="a@x.com")) == 10
+
+    # Rotated without an update(): the indexed path now holds a different file
+    os.rename(log, log + ".1")
+    write_log(log, 100, 10, "b@x.com")
+    assert index.search(user="a@x.com") == []
+    index.update()
+    assert len(index.search(user="a@x.com")) == 10
+
+    # Cleared from the UI (truncated in place)
+    open(log + ".1", "w").close()
+    assert index.search(user="a@x.com") == []
@@ -0,0 +1,54 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from isync_notify import WebhookNotifier
+
+RETRY_AFTER = 1.5
+
+class WebhookStub(BaseHTTPRequestHandler):
+    """Answers the first POST with 429 + Retry-After, every later one with 204 (like Discord)."""
+    posts = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        self.posts.append((time.monotonic(), body))
+        self.send_response(429 if len(self.posts) == 1 else 204)
+        if len(self.posts) == 1: self.send_header("Retry-After", str(RETRY_AFTER))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def webhook_url():
+    WebhookStub.posts = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WebhookStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/webhooks/1/test"
+    server.shutdown()
+    server.server_close()
+
+def test_burst_is_coalesced_and_retried_after_429(webhook_url):
+    notifier = WebhookNotifier(webhook_url, timeout=5)
+    start = time.monotonic()
+    for i in range(3):
+        assert notifier.send(f"event {i}")
+    notifier.flush()
+
+    assert len(WebhookStub.posts) == 2
+    (first_at, first), (retry_at, retried) = WebhookStub.posts
+    # The burst goes out as one message once the 2 s coalescing window closes
+    assert first == retried == {"content": "**[ISync]** event 0\nevent 1\nevent 2"}
+    assert first_at - start >= notifier.coalesce_window
+    # The retry waits out Retry-After (not the 1 s default backoff)
+    assert RETRY_AFTER <= retry_at - first_at < RETRY_AFTER + 1
+    assert (notifier.sent, notifier.failures, notifier.dropped) == (1, 0, 0)
+
+def test_chunk_splits_long_bursts():
+    chunks = WebhookNotifier._chunk(["a" * 1000, "b" * 1000, "c" * 5000])
+    assert [len(c) for c in chunks] == [1000, 1000, 1900]
@@ -0,0 +1,23 @@
+import time
+
+import isync_profile
+from isync_profile import profile_run
+
+class BusyProfile:
+    """cProfile.Profile as it behaves on Python >= 3.12 while another profiler is active."""
+    def enable(self):
+        raise ValueError("Another profiling tool is already active")
+
+def test_cprofile_falls_back_to_sampling(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(isync_profile, "LOGS_DIR", str(tmp_path))
+    monkeypatch.setattr(isync_profile.cProfile, "Profile", BusyProfile)
+    with profile_run("busy job", mode="cprofile"):
+        time.sleep(0.05)
+    assert [p.suffix for p in tmp_path.iterdir()] == [".folded"]
+    assert "sampling instead" in caplog.text
+
+def test_cprofile_writes_stats(tmp_path, monkeypatch):
+    monkeypatch.setattr(isync_profile, "LOGS_DIR", str(tmp_path))
+    with profile_run("job", mode="cprofile"):
+        sum(range(1000))
+    assert sorted(p.suffix for p in tmp_path.iterdir()) == [".prof", ".txt"]
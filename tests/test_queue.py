@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+
+import pytest
+
+import isync_queue
+from fake_admin_sdk import FakeAdminSDK
+from isync_auth import set_directory_endpoint
+from isync_db import checkpoint_job, create_job, get_connection, get_job
+from isync_queue import QueueWorker, claim_next, enqueue, finish_entry, list_queue, move_entry, pause_entry, requeue_orphans, set_entry_job, set_queue_paused
+
+DOMAIN = "x.com"
+CONFIG = {
+    'rotation_strategy': 'standard', 'max_users_per_cycle': 3, 'stall_kill_grace_seconds': 2,
+    'domains': [{'domain_name': DOMAIN, 'admin_email': f"admin@{DOMAIN}", 'group_email': f"g@{DOMAIN}", 'sa_json_path': "unused.json"}],
+}
+
+@pytest.fixture(autouse=True)
+def empty_queue():
+    with get_connection() as conn: conn.execute("DELETE FROM queue")
+    set_queue_paused(False)
+
+def pair(name):
+    return {'source': f"{name}:src", 'dest': f"{name}:dst", 'domain_reference': DOMAIN}
+
+def waiting_order():
+    return [e['source'].split(":")[0] for e in list_queue()[0] if e['status'] != "RUNNING"]
+
+def read_stamp(path):
+    try: return json.loads(path.read_text())
+    except (OSError, ValueError): return {} # Not written yet (or mid-write)
+
+def entry_status(entry_id):
+    return get_connection().execute("SELECT status FROM queue WHERE id = ?", (entry_id,)).fetchone()['status']
+
+def test_claim_next_by_priority_then_fifo():
+    enqueue(pair("a"))
+    enqueue(pair("b"), priority=5)
+    enqueue(pair("c"))
+    pause_entry(enqueue(pair("d"), priority=9)[0])
+    assert [claim_next()['source'] for _ in range(3)] == ["b:src", "a:src", "c:src"]
+    assert claim_next() is None # Only the paused entry is left
+    assert [e['status'] for e in list_queue()[0]] == ["RUNNING"] * 3 + ["PAUSED"]
+
+def test_active_pair_is_not_queued_twice():
+    first, added = enqueue(pair("a"))
+    assert added
+    assert enqueue(pair("a"), priority=3) == (first, False)
+    claim_next()
+    assert enqueue(pair("a")) == (first, False) # Still running
+    finish_entry(first, "DONE")
+    second, added = enqueue(pair("a"))
+    assert added and second != first
+
+def test_move_entry_swaps_with_neighbour():
+    ids = {name: enqueue(pair(name))[0] for name in "abcd"}
+    assert move_entry(ids["c"], 1) == 1
+    assert waiting_order() == list("acbd")
+    assert move_entry(ids["c"], 1) == 1
+    assert waiting_order() == list("cabd")
+    assert move_entry(ids["c"], 1) == 0 # Already first
+    assert move_entry(ids["d"], -1) == 0 # Already last
+    assert move_entry(ids["a"], -1) == 1
+    assert waiting_order() == list("cbad")
+    # Entries with distinct priorities still move by exactly one place
+    ids["e"] = enqueue(pair("e"), priority=10)[0]
+    assert move_entry(ids["d"], 1) == 1
+    assert waiting_order() == list("ecbda")
+    # A running entry keeps its place
+    assert claim_next()['source'] == "e:src"
+    assert move_entry(ids["e"], -1) == 0
+    assert waiting_order() == list("cbda")
+
+def test_requeue_orphans():
+    entries = {name: enqueue(pair(name))[0] for name in ("no_job", "interrupted", "finished", "live")}
+    for _ in entries: claim_next()
+    jobs = {name: create_job(f"{name}:src", f"{name}:dst", DOMAIN) for name in ("interrupted", "finished", "live")}
+    checkpoint_job(jobs["interrupted"], 1, "rclone_running", {}, status="INTERRUPTED")
+    checkpoint_job(jobs["finished"], 1, "finished", {}, status="DONE")
+    for name, job_id in jobs.items(): set_entry_job(entries[name], job_id)
+
+    assert requeue_orphans() == 2
+    statuses = {name: entry_status(entry_id) for name, entry_id in entries.items()}
+    assert statuses == {"no_job": "QUEUED", "interrupted": "QUEUED", "finished": "DONE", "live": "RUNNING"}
+    checkpoint_job(jobs["live"], 1, "finished", {}, status="DONE")
+
+def test_cancel_waiting_entry():
+    entry_id, _ = enqueue(pair("a"))
+    assert QueueWorker().cancel(entry_id) is True
+    assert entry_status(entry_id) == "CANCELLED"
+    assert claim_next() is None
+    assert QueueWorker().cancel(entry_id) is False # Already finished
+
+def test_cancel_running_entry_stops_rclone_and_deletes_temp_user(fake_rclone, monkeypatch, tmp_path):
+    sdk = FakeAdminSDK(domain=DOMAIN, users=20, suspended_every=0).start()
+    set_directory_endpoint(sdk.url)
+    try:
+        stamp = tmp_path / "rclone.json"
+        fake_rclone(lines=5, rate=0, hang=600, stamp=stamp)
+        monkeypatch.setattr(isync_queue, "load_config", lambda: dict(CONFIG))
+        entry_id, _ = enqueue(pair("cancelled"))
+        worker = QueueWorker()
+        # The worker's per-entry body, without its never-ending claim loop
+        runner = threading.Thread(target=worker._execute, args=(claim_next(),))
+        runner.start()
+
+        deadline = time.monotonic() + 30
+        while "last_output" not in read_stamp(stamp):
+            assert time.monotonic() < deadline, "rclone never started"
+            time.sleep(0.1)
+        job_id = get_connection().execute("SELECT job_id FROM queue WHERE id = ?", (entry_id,)).fetchone()['job_id']
+        temp_user = get_job(job_id)['state']['user']
+        assert temp_user in sdk.directory.users
+
+        started = time.monotonic()
+        assert worker.cancel(entry_id) is True
+        runner.join(timeout=30)
+        assert not runner.is_alive()
+        assert time.monotonic() - started < 15 # Not the 600 s rclone would otherwise take
+        assert "exit" not in read_stamp(stamp) # Terminated, not exited on its own
+        assert entry_status(entry_id) == "CANCELLED"
+        assert temp_user not in sdk.directory.users
+        assert get_job(job_id)['state']['temp_user_live'] is False
+        assert worker.running() == (None, None)
+    finally:
+        set_directory_endpoint(None)
+        sdk.stop()
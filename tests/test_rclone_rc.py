@@ -0,0 +1,150 @@
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from isync_engine import ISyncEngine
+from isync_rclone import RcloneRcClient, parse_json_stats, summarize_stats, find_free_port
+from isync_status import get_run_registry
+
+# Captured from `rclone copy --use-json-log --stats 1s` (rclone v1.66)
+JSON_LOG_LINES = [
+    '{"level":"info","msg":"Copied (new)","object":"photos/a.jpg","objectType":"*drive.Object","size":5242880,"source":"operations/copy.go:368","time":"2024-05-02T10:14:03.218811+00:00"}',
+    '{"level":"info","msg":"\\nTransferred:   \\t   15.000 MiB / 40.000 MiB, 38%, 5.000 MiB/s, ETA 5s\\nChecks:                 2 / 2, 100%\\nTransferred:            1 / 3, 33%\\nElapsed time:         3.1s\\nTransferring:\\n *                                  photos/b.jpg: 40% /25Mi, 5Mi/s, 3s\\n\\n","source":"accounting/stats.go:498","stats":{"bytes":15728640,"checks":2,"deletedDirs":0,"deletes":0,"elapsedTime":3.104,"errors":0,"eta":5,"fatalError":false,"renames":0,"retryError":false,"serverSideCopies":0,"serverSideCopyBytes":0,"serverSideMoveBytes":0,"serverSideMoves":0,"speed":5242880,"totalBytes":41943040,"totalChecks":2,"totalTransfers":3,"transferTime":3.01,"transferring":[{"bytes":10485760,"eta":3,"group":"global_stats","name":"photos/b.jpg","percentage":40,"size":26214400,"speed":5242880,"speedAvg":5100000}],"transfers":1},"time":"2024-05-02T10:14:04.102317+00:00"}',
+    '{"level":"error","msg":"Failed to copy: googleapi: Error 403: User rate limit exceeded., userRateLimitExceeded","object":"photos/c.jpg","objectType":"*drive.Object","source":"operations/copy.go:80","time":"2024-05-02T10:14:05.001201+00:00"}',
+]
+
+CORE_STATS = {
+    "bytes": 3 * 1024 ** 3 + 17, "checks": 4, "elapsedTime": 12.5, "errors": 0, "eta": 90, "speed": 20971520.0,
+    "totalBytes": 6 * 1024 ** 3, "totalChecks": 4, "totalTransfers": 400, "transfers": 250,
+    "transferring": [{"bytes": 1024 ** 3, "eta": 90, "name": "big.bin", "percentage": 33, "size": 3 * 1024 ** 3, "speed": 20971520.0}],
+}
+
+# What rclone is started with (RCLONE_RC_USER/RCLONE_RC_PASS); requests without it get 401
+RC_AUTH = ("isync", "s3cret")
+
+class RcStub(BaseHTTPRequestHandler):
+    responses = {"core/stats": CORE_STATS, "core/transferred": {"transferred": [{"name": f"f{i}.bin", "size": 1} for i in range(100)]}}
+    calls = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        method = self.path.lstrip("/")
+        self.calls.append(method)
+        if self.headers.get("Authorization") != "Basic " + base64.b64encode(":".join(RC_AUTH).encode()).decode():
+            self.send_response(401)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps(self.responses.get(method, {})).encode()
+        self.send_response(200 if method in self.responses else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def rc_server():
+    RcStub.calls = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RcStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def start_poller(engine, client):
+    state = {'bytes': 0, 'completed': 0, 'checks': 0, 'last_activity': 0.0}
+    done = threading.Event()
+    thread = threading.Thread(target=engine._poll_rc_stats, args=(client, done, state, "rc test", "user@x.com", "Normal"), daemon=True)
+    thread.start()
+    return state, done, thread
+
+def test_parse_json_stats_on_json_log_lines():
+    parsed = [parse_json_stats(line) for line in JSON_LOG_LINES]
+    assert parsed[0] is None and parsed[2] is None
+    summary = summarize_stats(parsed[1])
+    assert summary['bytes'] == 15728640
+    assert summary['total_bytes'] == 41943040
+    assert summary['progress'] == "37%"
+    assert summary['speed'] == "5.000 MiB/s"
+    assert summary['eta'] == "5s"
+    assert (summary['transfers'], summary['checks'], summary['errors']) == (1, 2, 0)
+    assert summary['transferring'] == [{'name': "photos/b.jpg", 'bytes': 10485760, 'size': 26214400, 'percentage': 40, 'speed': 5242880.0, 'eta': 3}]
+
+def test_parse_json_stats_rejects_non_stats():
+    assert parse_json_stats("Transferred:   1.000 MiB / 2.000 MiB, 50%, 1.000 MiB/s, ETA 1s") is None
+    assert parse_json_stats('{"stats": "not an object"}') is None
+    assert parse_json_stats('{"stats": {truncated') is None
+
+def test_rc_client_calls(rc_server):
+    client = RcloneRcClient(rc_server, auth=RC_AUTH)
+    try:
+        assert client.stats() == CORE_STATS
+        assert len(client.transferred()) == 100
+    finally:
+        client.close()
+    assert RcStub.calls == ["core/stats", "core/transferred"]
+
+def test_rc_client_requires_credentials(rc_server):
+    client = RcloneRcClient(rc_server)
+    try:
+        with pytest.raises(requests.HTTPError): client.stats()
+        client.session.auth = ("isync", "guess")
+        with pytest.raises(requests.HTTPError): client.stats()
+    finally:
+        client.close()
+
+def test_rclone_command_has_no_unauthenticated_rc():
+    cmd = ISyncEngine({}).build_rclone_cmd("a:", "b:", "sa.json", "u@x.com", rc_addr="127.0.0.1:5572")
+    assert "--rc" in cmd and "--rc-addr=127.0.0.1:5572" in cmd
+    assert "--rc-no-auth" not in cmd
+
+def test_poll_updates_run_status(rc_server):
+    engine = ISyncEngine({'rclone_rc_poll_interval': 0.05})
+    engine._begin_run("rc test")
+    try:
+        state, done, thread = start_poller(engine, RcloneRcClient(rc_server, auth=RC_AUTH))
+        deadline = time.time() + 5
+        while state['bytes'] == 0 and time.time() < deadline: time.sleep(0.02)
+        done.set()
+        thread.join(5)
+        assert not thread.is_alive()
+        assert state['bytes'] == CORE_STATS['bytes']
+        # Files come from core/stats' transfers counter, not the (capped) core/transferred list
+        assert (state['completed'], state['checks']) == (CORE_STATS['transfers'], 4)
+        assert "core/transferred" not in RcStub.calls
+        assert state['last_activity'] > 0
+        status = get_run_registry().get_run(engine.last_run_id).status
+        assert status['current_user'] == "user@x.com"
+        assert status['total_transferred_bytes'] == CORE_STATS['bytes']
+        assert status['current_progress'] == "50%"
+        assert status['eta'] == "1m30s"
+        assert status['transferring'][0]['name'] == "big.bin"
+        assert status['is_running']
+    finally:
+        engine._end_run()
+
+def test_poll_survives_connection_refused():
+    # Nothing listens on the port: every poll fails and the loop keeps waiting for the run to finish
+    engine = ISyncEngine({'rclone_rc_poll_interval': 0.02})
+    engine._begin_run("rc refused")
+    try:
+        client = RcloneRcClient(f"127.0.0.1:{find_free_port()}", timeout=0.5)
+        with pytest.raises(requests.ConnectionError): client.stats()
+        state, done, thread = start_poller(engine, client)
+        time.sleep(0.2)
+        assert thread.is_alive()
+        done.set()
+        thread.join(5)
+        assert not thread.is_alive()
+        assert state == {'bytes': 0, 'completed': 0, 'checks': 0, 'last_activity': 0.0}
+        assert get_run_registry().get_run(engine.last_run_id).status == {}
+    finally:
+        engine._end_run()
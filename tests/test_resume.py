@@ -0,0 +1,123 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+import isync_engine
+from fake_admin_sdk import FakeAdminSDK
+from isync_auth import set_directory_endpoint
+from isync_db import checkpoint_job, create_job, get_job, jobs_with_status, update_job_status
+from isync_engine import ISyncEngine
+
+REPO_DIR = os.path.dirname(os.path.abspath(isync_engine.__file__))
+DOMAIN = "x.com"
+CONFIG = {
+    'rotation_strategy': 'standard', 'max_users_per_cycle': 3, 'stall_kill_grace_seconds': 2,
+    'domains': [{'domain_name': DOMAIN, 'admin_email': f"admin@{DOMAIN}", 'group_email': f"g@{DOMAIN}", 'sa_json_path': "unused.json"}],
+}
+
+# Runs one job in a separate process, so the test can kill it the way a crash or reboot would
+CHILD = """
+import json, sys
+sys.path[:0] = sys.argv[1:3]
+from isync_auth import set_directory_endpoint
+from isync_engine import ISyncEngine
+set_directory_endpoint(sys.argv[3])
+ISyncEngine(json.loads(sys.argv[4])).execute_job(json.loads(sys.argv[5]))
+"""
+
+@pytest.fixture
+def sdk():
+    sdk = FakeAdminSDK(domain=DOMAIN, users=20, suspended_every=0).start()
+    set_directory_endpoint(sdk.url)
+    yield sdk
+    set_directory_endpoint(None)
+    sdk.stop()
+
+def job_pair(name):
+    return {'source': f"{name}:src", 'dest': f"{name}:dst", 'domain_reference': DOMAIN}
+
+def interrupted_job(pair, step, cycle, user, **state):
+    """A jobs row as reconcile_interrupted_jobs leaves it, with a live temp user from cycle `cycle`."""
+    job_id = create_job(pair['source'], pair['dest'], pair['domain_reference'])
+    checkpoint_job(job_id, cycle, step, dict(pair=pair, strategy='standard', max_users=3, user=user, temp_user_live=True, **state), status="INTERRUPTED")
+    return job_id
+
+def wait_for_step(source, step, child, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert child.poll() is None, "job process exited early"
+        jobs = [j for j in jobs_with_status(("RUNNING",)) if j['source'] == source and j['step'] == step]
+        if jobs: return jobs[0]
+        time.sleep(0.1)
+    raise AssertionError(f"job never reached {step}")
+
+def test_kill_mid_cycle_then_resume(sdk, fake_rclone):
+    pair = job_pair("killed")
+    fake_rclone(lines=5, rate=0, hang=600)
+    child = subprocess.Popen([sys.executable, "-c", CHILD, REPO_DIR, os.path.join(REPO_DIR, "bench"), sdk.url, json.dumps(CONFIG), json.dumps(pair)],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        job = wait_for_step(pair['source'], "rclone_running", child)
+    finally:
+        os.killpg(child.pid, signal.SIGKILL) # The engine and its rclone
+        child.wait() # Reaped, so its pid no longer looks alive
+    temp_user = job['state']['user']
+    assert temp_user in sdk.directory.users
+
+    engine = ISyncEngine(CONFIG)
+    interrupted = [j for j in engine.reconcile_interrupted_jobs() if j['id'] == job['id']]
+    assert len(interrupted) == 1
+    job = get_job(job['id'])
+    assert (job['status'], job['cycle'], job['step']) == ("INTERRUPTED", 1, "rclone_running")
+    assert job['state']['temp_user_live'] is True
+    assert all(j['id'] != job['id'] for j in engine.reconcile_interrupted_jobs()) # Only reported once
+
+    # The cycle's rclone never finished: it reruns with the same temp user, which is then deleted
+    fake_rclone(hang=0)
+    sdk.directory.reset_counters()
+    assert engine.execute_job(pair, resume_job_id=job['id']) == "DONE"
+    assert sdk.directory.calls.get("users.insert", 0) == 0
+    assert temp_user not in sdk.directory.users
+    job = get_job(job['id'])
+    assert (job['status'], job['cycle']) == ("DONE", 1)
+    assert job['state']['temp_user_live'] is False
+
+def test_reconcile_leaves_jobs_of_live_processes_alone():
+    job_id = create_job("live:src", "live:dst", DOMAIN)
+    try:
+        assert all(j['id'] != job_id for j in ISyncEngine(CONFIG).reconcile_interrupted_jobs())
+        assert get_job(job_id)['status'] == "RUNNING"
+    finally:
+        update_job_status(job_id, "DONE")
+
+@pytest.mark.parametrize("result, outcome", [("DONE", "DONE"), ("ERROR", "FAILED")])
+def test_finished_run_is_not_repeated(sdk, result, outcome):
+    # rclone finished before the interruption: resuming only deletes the temp user and settles the job
+    pair = job_pair(f"finished-{result}")
+    temp_user = sdk.directory.emails[1]
+    job_id = interrupted_job(pair, "rclone_done", 2, temp_user, result=result)
+    sdk.directory.reset_counters()
+    assert ISyncEngine(CONFIG).execute_job(pair, resume_job_id=job_id) == outcome
+    assert sdk.directory.calls.get("users.insert", 0) == 0
+    assert temp_user not in sdk.directory.users
+    job = get_job(job_id)
+    assert (job['status'], job['cycle']) == (outcome, 2)
+    assert job['state']['temp_user_live'] is False
+
+def test_pending_user_of_a_finished_cycle_is_deleted_not_reused(sdk, fake_rclone):
+    fake_rclone(lines=5, rate=0)
+    pair = job_pair("rotated")
+    temp_user = sdk.directory.emails[2]
+    job_id = interrupted_job(pair, "rclone_done", 1, temp_user, result="LIMIT_REACHED")
+    sdk.directory.reset_counters()
+    assert ISyncEngine(CONFIG).execute_job(pair, resume_job_id=job_id) == "DONE"
+    # Cycle 1's user is gone; cycle 2 provisioned (and deleted) a fresh one
+    assert temp_user not in sdk.directory.users
+    assert sdk.directory.calls.get("users.insert", 0) == 1
+    assert sdk.directory.calls.get("users.delete", 0) == 2
+    assert get_job(job_id)['cycle'] == 2
@@ -0,0 +1,49 @@
+import isync_engine
+from isync_engine import ISyncEngine
+from isync_metrics import SPEED
+
+MIB = 1024 ** 2
+
+def test_text_mode_samples_carry_the_bytes_line_speed(fake_rclone):
+    # Each text stats block is a bytes line (with the rate) followed by a files line (without one)
+    fake_rclone(lines=40, rate=200, bytes=MIB)
+    engine = ISyncEngine({'rclone_stats_mode': 'text'})
+    speeds = []
+    engine.record_sample = lambda total_bytes, speed_bps, transfers: speeds.append(speed_bps)
+    assert engine.run_rclone("src:", "dst:", "sa.json", "u@x.com", "samples") == "DONE"
+    assert len(speeds) >= 40
+    assert set(speeds) == {10 * MIB}
+
+def test_speed_gauge_ignores_updates_without_a_rate():
+    engine = ISyncEngine({})
+    engine.update_status("gauge", "u@x.com", "10.000 MiB/s", "10%", "1 MiB")
+    assert SPEED.value() == 10 * MIB
+    for placeholder in ("0", "-"):
+        engine.update_status("gauge", "u@x.com", placeholder, "10%", "1 MiB")
+        assert SPEED.value() == 10 * MIB
+    engine.update_status("gauge", "None", "-", "100%", "0", is_running=False)
+    assert SPEED.value() == 0
+
+class CountingWindow(isync_engine.ThroughputWindow):
+    adds = 0
+
+    def add(self, *args, **kwargs):
+        CountingWindow.adds += 1
+        super().add(*args, **kwargs)
+
+def test_rc_mode_samples_throughput_once_per_poll(fake_rclone, monkeypatch):
+    # Lots of verbose output but few polls: the window must grow with polls, not lines
+    fake_rclone(lines=300, rate=300, verbose=20, bytes=MIB)
+    monkeypatch.setattr(isync_engine, "ThroughputWindow", CountingWindow)
+    CountingWindow.adds = 0
+    engine = ISyncEngine({'rclone_stats_mode': 'rc', 'rclone_rc_poll_interval': 0.1})
+    polls = []
+    poll = engine._poll_rc_stats
+    def counting_poll(client, done, state, *args):
+        poll(client, done, state, *args)
+        polls.append(state.get('updates', 0))
+    engine._poll_rc_stats = counting_poll
+    assert engine.run_rclone("src:", "dst:", "sa.json", "u@x.com", "rc window") == "DONE"
+    assert polls and polls[0] > 0 # The authenticated poller reached the fake's rc server
+    assert 0 < CountingWindow.adds <= polls[0]
+    assert 0 < engine.run_files <= 300 # Last poll before exit
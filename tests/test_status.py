@@ -0,0 +1,26 @@
+import json
+import os
+import time
+
+from isync_status import StatusWriter, RunRegistry, get_status_writer, FLUSH_RETRY_SECONDS
+
+def test_failed_forced_write_is_retried(tmp_path):
+    # The directory is missing, so the forced (final) write fails until it appears
+    path = tmp_path / "later" / "status.json"
+    writer = StatusWriter(str(path), max_hz=2)
+    writer.publish({"is_running": False}, force=True)
+    assert writer.flush_count == 0 and writer.timer is not None
+    os.makedirs(path.parent)
+    deadline = time.monotonic() + FLUSH_RETRY_SECONDS * 2 + 2
+    while writer.flush_count == 0 and time.monotonic() < deadline: time.sleep(0.05)
+    assert writer.flush_count == 1
+    assert json.loads(path.read_text()) == {"is_running": False}
+    assert writer.timer is None
+
+def test_registry_keeps_and_sets_flush_rate(tmp_path):
+    path = str(tmp_path / "runs.json")
+    writer = get_status_writer(path, 10)
+    registry = RunRegistry(path)
+    assert registry.writer is writer and writer.min_interval == 0.1
+    registry.set_flush_hz(4)
+    assert get_status_writer(path).min_interval == 0.25
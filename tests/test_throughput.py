@@ -0,0 +1,59 @@
+import pytest
+
+from isync_engine import ISyncEngine
+from isync_rclone import ThroughputWindow
+
+MIB = 1024 ** 2
+
+def feed(window, rate_bps, seconds, files=0, start=0.0, step=1.0):
+    """Adds one sample per step from start, bytes growing at rate_bps; returns the last sample time."""
+    t = start
+    while t <= start + seconds:
+        window.add(int(rate_bps * t), files, now=t)
+        t += step
+    return t - step
+
+def test_needs_a_full_window_of_history():
+    window = ThroughputWindow(60, MIB)
+    last = feed(window, 1024, 30)
+    assert window.stalled(now=last) is False
+    last = feed(window, 1024, 40, start=last + 1)
+    assert window.stalled(now=last) is True
+    assert window.rate(now=last) == pytest.approx(1024, rel=0.05)
+
+def test_fast_enough_or_completing_files_is_not_stalled():
+    fast = ThroughputWindow(60, MIB)
+    assert fast.stalled(now=feed(fast, 2 * MIB, 120)) is False
+    # Slow bytes, but an item finished inside the window (e.g. a large check pass over a copied tree)
+    slow = ThroughputWindow(60, MIB)
+    last = feed(slow, 1024, 100)
+    slow.add(int(1024 * (last + 1)), 1, now=last + 1)
+    assert slow.stalled(now=last + 1) is False
+
+def test_only_the_window_span_is_kept():
+    window = ThroughputWindow(60, MIB)
+    # A burst long ago doesn't hide a stall now
+    window.add(0, now=0)
+    window.add(100 * MIB, now=1)
+    last = feed(window, 0, 120, start=2)
+    assert window.samples[0][0] <= last - 60 < window.samples[1][0]
+    assert window.stalled(now=last) is True
+
+def test_reset_and_disabled_window():
+    window = ThroughputWindow(60, MIB)
+    last = feed(window, 0, 120)
+    assert window.stalled(now=last) is True
+    window.reset()
+    assert window.stalled(now=last) is False
+    disabled = ThroughputWindow(0, MIB)
+    assert disabled.stalled(now=feed(disabled, 0, 120)) is False
+
+def test_slow_byte_rate_trips_stalled(fake_rclone, tmp_path):
+    # rclone keeps printing stats (so the output watchdog is satisfied) but bytes crawl and no file completes
+    replay = tmp_path / "slow.log"
+    replay.write_text("".join(f"Transferred:   \t{i} KiB / 10 GiB, 0%, 1.000 KiB/s, ETA -\n" for i in range(1, 201)))
+    fake_rclone(replay=replay, rate=20)
+    engine = ISyncEngine({'stall_throughput_window_minutes': 0.02, 'stall_min_throughput_mbps': 1, 'stall_kill_grace_seconds': 2})
+    assert engine.run_rclone("src:", "dst:", "sa.json", "u@x.com", "slow") == "STALLED"
+    assert (engine.last_stall_reason, engine.last_stall_phase) == ("low_throughput", "transferring")
+    assert 0 < engine.run_bytes < 200 * 1024 # Ended well before the replay ran out